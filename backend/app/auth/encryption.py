@@ -1,5 +1,5 @@
 """
-Field-level encryption for sensitive data (clave_fiscal).
+Field-level encryption for sensitive data (clave_fiscal, cached ARCA sessions).
 Uses AES-256-GCM — authenticated encryption, tamper-proof.
 
 Key is loaded from FIELD_ENCRYPTION_KEY env var (64 hex chars = 32 bytes).
@@ -7,6 +7,8 @@ Encrypted values are stored as "enc:<base64(nonce+ciphertext+tag)>".
 Plain-text values (legacy/migration) are returned as-is.
 """
 import base64
+import hashlib
+import hmac
 import os
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
@@ -60,3 +62,21 @@ def decrypt_clave(stored: str) -> str:
         # Si falla la desencriptación, devolver el valor tal cual
         # (no debería ocurrir con datos correctamente encriptados)
         return stored
+
+
+def encrypt_bytes(data: bytes) -> bytes:
+    """Encrypt an arbitrary blob (nonce + ciphertext + tag) with the field key."""
+    aesgcm = AESGCM(_get_key())
+    nonce = os.urandom(12)
+    return nonce + aesgcm.encrypt(nonce, data, None)
+
+
+def decrypt_bytes(blob: bytes) -> bytes:
+    """Decrypt a blob produced by encrypt_bytes. Raises if it was tampered with."""
+    aesgcm = AESGCM(_get_key())
+    return aesgcm.decrypt(blob[:12], blob[12:], None)
+
+
+def fingerprint(value: str) -> str:
+    """Keyed hash (HMAC-SHA256 with the field key) to compare secrets without storing them."""
+    return hmac.new(_get_key(), value.encode("utf-8"), hashlib.sha256).hexdigest()
@@ -16,7 +16,12 @@ celery.conf.update(
     enable_utc=True,
     task_track_started=True,
     task_acks_late=True,
-    worker_prefetch_multiplier=1,  # one task at a time (sequential scraping)
+    worker_prefetch_multiplier=1,  # each prefork child reserves one task at a time
+    # Children live across tasks so their browser pool is reused; recycled after N tasks
+    worker_max_tasks_per_child=int(os.environ.get("CELERY_MAX_TASKS_PER_CHILD", "50")),
+    # Lanes alta / normal / baja map to broker priorities 0 / 5 / 9
+    task_default_priority=5,
+    broker_transport_options={"queue_order_strategy": "priority", "priority_steps": list(range(10)), "sep": ":"},
 )
 
 # Auto-discover tasks
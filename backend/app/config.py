@@ -54,6 +54,78 @@ class Settings(BaseSettings):
     MAX_DELAY: float = 3.5
     BROWSER_TIMEOUT: int = 30000
     HEADLESS: bool = True
+    # Browser pool: reciclar el navegador tras N consultas o si supera el RSS (MB)
+    BROWSER_POOL_MAX_JOBS: int = 50
+    BROWSER_POOL_MAX_RSS_MB: int = 1500
+    BROWSER_POOL_MAX_CONTEXTS: int = 4  # contextos simultaneos por navegador
+    # Task runner: workers de scraping concurrentes por proceso (False = este proceso no toma trabajos)
+    SCRAPER_CONCURRENCY: int = 1
+    SCRAPER_RUNNER_ENABLED: bool = True
+    # Quien ejecuta las consultas encoladas: inprocess (workers del runner) o celery (scrape_arca)
+    TASK_BACKEND: str = "inprocess"
+    CELERY_TIME_LIMIT_S: int = 3600  # tope duro por tarea (un grupo de hasta SCRAPER_MAX_GRUPO consultas)
+    CELERY_CONCURRENCY: int = 2  # procesos prefork por worker (lo usa tambien Dockerfile.worker)
+    # Donde corre el navegador: local (event loop de la API) o proceso (hijo supervisado por worker)
+    SCRAPER_EJECUCION: str = "local"
+    SCRAPER_PROCESO_MAX_JOBS: int = 20  # sesiones antes de reciclar el proceso hijo
+    SCRAPER_PROCESO_MAX_RSS_MB: int = 1500  # RSS del arbol del hijo (Chromium incluido)
+    SCRAPER_PROCESO_TIMEOUT_S: float = 600.0  # sin mensajes del hijo por este tiempo = colgado
+    # Cola durable en Postgres: lease renovado por heartbeat, tope de intentos y sondeo de la cola
+    SCRAPER_LEASE_S: int = 120
+    SCRAPER_MAX_INTENTOS: int = 3
+    SCRAPER_QUEUE_POLL_S: float = 5.0
+    SCRAPER_REAPER_S: float = 60.0  # cada cuanto se re-encolan trabajos sin worker
+    # Reparto justo de la cola entre tenants: peso por plan (plan:peso; sin plan listado = 1)
+    SCRAPER_PLAN_PESOS: str = "free:1,basic:2,pro:4,enterprise:8"
+    # Carriles de prioridad: un trabajo de un carril inferior que espero esto pasa primero
+    SCRAPER_PRIORIDAD_AGING_S: float = 900.0
+    # Hasta cuantas consultas por pedido van al carril alta (ejecuciones y reintentos interactivos)
+    SCRAPER_PRIORIDAD_ALTA_MAX: int = 3
+    # Minutos en que una consulta exitosa se reutiliza para el mismo cliente y periodo (0 = nunca; por tenant en Tenant.frescura_min)
+    SCRAPER_FRESCURA_MIN: int = 0
+    SCRAPER_SHUTDOWN_TIMEOUT: float = 20.0
+    # Maximo de consultas (mismo cuit_login) resueltas en una sola sesion ARCA
+    SCRAPER_MAX_GRUPO: int = 20
+    # Limitador de sesiones ARCA: ritmo global adaptativo (sesiones/min) y minimo entre sesiones de un cuit_login.
+    # El estado del limitador y del breaker es de cada proceso: el ritmo global se reparte entre
+    # SCRAPER_PROCESOS_ARCA procesos que abren sesiones (0 = 1 en inprocess, CELERY_CONCURRENCY en celery;
+    # con varias replicas, poner el total).
+    SCRAPER_RATE_MAX: float = 30.0
+    SCRAPER_RATE_MIN: float = 2.0
+    SCRAPER_RATE_CUIT_S: float = 20.0
+    SCRAPER_PROCESOS_ARCA: int = 0
+    # Circuit breaker (por proceso): pausa el despacho si los errores transitorios superan el umbral en la ventana
+    SCRAPER_BREAKER_UMBRAL: float = 0.5
+    SCRAPER_BREAKER_VENTANA: int = 20
+    SCRAPER_BREAKER_PAUSA_S: float = 60.0
+    SCRAPER_BREAKER_PAUSA_MAX_S: float = 900.0
+    # Cache encriptado de sesiones ARCA (storage_state); requiere FIELD_ENCRYPTION_KEY
+    ARCA_SESSION_TTL: int = 900  # segundos; 0 = deshabilitado
+    SESSION_CACHE_DIR: str = "sesiones"
+    SESSION_CACHE_MAX: int = 500
+    # Ritmo por defecto: cautious (esperas fijas), normal o fast (esperas por eventos)
+    SCRAPER_PACING: str = "normal"
+    # Bloqueo de recursos no esenciales (listas separadas por coma, se suman a las por defecto)
+    SCRAPER_BLOCK_RESOURCES: bool = True
+    SCRAPER_BLOCK_TYPES: str = "image,media,font"
+    SCRAPER_BLOCK_PATTERNS: str = ""
+    SCRAPER_ALLOW_PATTERNS: str = ""
+    # Tomar los resultados del XHR de "Ver consulta" (si declara un total que coincide) y generar el CSV en el servidor
+    SCRAPER_CAPTURA_RED: bool = False
+    # Screenshots: ring (en memoria, a disco solo si falla un paso), debug (PNG siempre) u off
+    SCREENSHOT_MODE: str = "ring"
+    SCREENSHOT_RING_SIZE: int = 10
+    SCREENSHOT_MAX_FILES: int = 2000
+    SCREENSHOT_MAX_AGE_DAYS: int = 7
+    # Tabla de exito de estrategias de navegacion a SETI (compartida entre procesos)
+    NAV_STATS_FILE: str = "sesiones/nav_estrategias.json"
+    SETI_URL: str = ""  # acceso directo fijo a SETI; vacio = se aprende
+    # Host unico para login/portal (p.ej. el simulador local: http://127.0.0.1:8765); vacio = ARCA real
+    ARCA_BASE_URL: str = ""
+    # Filas de resultados por lote (extraccion paginada e INSERT masivo)
+    SCRAPER_LOTE_FILAS: int = 500
+    # Tabla en pantalla: siempre (se concilia con el CSV) o respaldo (solo si el CSV no se puede leer)
+    SCRAPER_TABLA_PANTALLA: str = "respaldo"
 
     # App
     APP_ENV: str = "development"
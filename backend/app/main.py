@@ -20,22 +20,70 @@ logging.getLogger("task_runner").setLevel(logging.INFO)
 logger = logging.getLogger("main")
 
 
+# Clave del advisory lock que serializa las migraciones entre procesos que arrancan a la vez
+MIGRACIONES_LOCK = 0x41524341
+
+
+async def migrar(conn):
+    """Create tables and apply the idempotent migrations inside conn's transaction."""
+    from sqlalchemy import text
+    from app.db import Base
+    from app.models import Tenant, User, Cliente, Consulta, FormularioDescripcion, PasoScraping  # noqa: F401
+
+    # Varias replicas/workers pueden arrancar juntos: sin el lock dos deduplicaciones o dos
+    # CREATE INDEX concurrentes chocan. Se libera al terminar la transaccion.
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": MIGRACIONES_LOCK})
+    await conn.run_sync(Base.metadata.create_all)
+    # Add missing columns to existing tables (no-op if already exists)
+    migrations = [
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS tipo_cliente VARCHAR(20) NOT NULL DEFAULT 'no_empleador'",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS error_categoria VARCHAR(30)",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS reintentos INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS ritmo VARCHAR(20)",
+        "ALTER TABLE tenants ADD COLUMN IF NOT EXISTS ritmo VARCHAR(20)",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS filas INTEGER",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS bytes BIGINT",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS encolada_at TIMESTAMPTZ",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS intentos INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(100)",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS lease_hasta TIMESTAMPTZ",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ",
+        "CREATE INDEX IF NOT EXISTS ix_consultas_cola ON consultas (encolada_at, id) WHERE estado = 'pendiente'",
+        "CREATE INDEX IF NOT EXISTS ix_consultas_cola_tenant ON consultas (tenant_id, encolada_at, id) WHERE estado = 'pendiente'",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS prioridad VARCHAR(10) NOT NULL DEFAULT 'normal'",
+        "CREATE INDEX IF NOT EXISTS ix_consultas_cola_prioridad ON consultas (prioridad, tenant_id, encolada_at, id) WHERE estado = 'pendiente'",
+        "CREATE INDEX IF NOT EXISTS ix_consultas_lease ON consultas (lease_hasta) WHERE estado = 'en_proceso'",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS finalizada_at TIMESTAMPTZ",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS recursos_bloqueados INTEGER",
+        "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS bytes_bloqueados BIGINT",
+        "ALTER TABLE tenants ADD COLUMN IF NOT EXISTS frescura_min INTEGER",
+        "ALTER TABLE pasos_scraping ADD COLUMN IF NOT EXISTS esperado_ms INTEGER",
+        "ALTER TABLE pasos_scraping ADD COLUMN IF NOT EXISTS ahorrado_ms INTEGER",
+        # Una sola consulta activa por cliente y periodo: las repetidas se coalescen al encolar.
+        # Solo al crear el indice se marcan como error los duplicados previos (se conserva la
+        # en proceso o la mas vieja); despues el indice impide que vuelvan a existir.
+        "DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'ux_consultas_activa') THEN "
+        "UPDATE consultas c SET estado = 'error', encolada_at = NULL, lease_owner = NULL, lease_hasta = NULL, "
+        "error_detalle = 'Duplicada: el cliente ya tenia otra consulta activa para el periodo' "
+        "WHERE c.estado IN ('pendiente', 'en_proceso') AND EXISTS (SELECT 1 FROM consultas o "
+        "WHERE o.cliente_id = c.cliente_id AND o.periodo = c.periodo AND o.estado IN ('pendiente', 'en_proceso') "
+        "AND ((o.estado = 'en_proceso' AND c.estado = 'pendiente') OR (o.estado = c.estado AND o.id < c.id))); "
+        "CREATE UNIQUE INDEX ux_consultas_activa ON consultas (cliente_id, periodo) "
+        "WHERE estado IN ('pendiente', 'en_proceso'); "
+        "END IF; END $$",
+    ]
+    for sql in migrations:
+        await conn.execute(text(sql))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: create tables if they don't exist
-    from sqlalchemy import select, text
-    from app.db import engine, Base, async_session_maker
-    from app.models import Tenant, User, Cliente, Consulta, FormularioDescripcion  # noqa: F401
+    from sqlalchemy import select
+    from app.db import engine, async_session_maker
+    from app.models import Cliente
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        # Add missing columns to existing tables (no-op if already exists)
-        migrations = [
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS tipo_cliente VARCHAR(20) NOT NULL DEFAULT 'no_empleador'",
-            "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS error_categoria VARCHAR(30)",
-            "ALTER TABLE consultas ADD COLUMN IF NOT EXISTS reintentos INTEGER NOT NULL DEFAULT 0",
-        ]
-        for sql in migrations:
-            await conn.execute(text(sql))
+        await migrar(conn)
 
     # Migrate existing plain-text clave_fiscal values to encrypted format
     if settings.FIELD_ENCRYPTION_KEY:
@@ -53,8 +101,16 @@ async def lifespan(app: FastAPI):
                 logger.info("Migración de credenciales completada.")
 
     os.makedirs(settings.DOWNLOAD_DIR, exist_ok=True)
+
+    # Recover jobs orphaned by a restart, then start the durable-queue workers
+    if settings.SCRAPER_RUNNER_ENABLED:
+        from app.tasks.runner import rehydrate_jobs, start_runner
+        await rehydrate_jobs()
+        start_runner()
     yield
     # Shutdown
+    from app.tasks.runner import shutdown_runner
+    await shutdown_runner()
 
 
 limiter = Limiter(key_func=get_remote_address)
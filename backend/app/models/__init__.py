@@ -3,5 +3,6 @@ from app.models.client import Cliente
 from app.models.consultation import Consulta
 from app.models.download import Descarga
 from app.models.form_dictionary import FormularioDescripcion
+from app.models.scraping_step import PasoScraping
 
-__all__ = ["Tenant", "User", "Cliente", "Consulta", "Descarga", "FormularioDescripcion"]
+__all__ = ["Tenant", "User", "Cliente", "Consulta", "Descarga", "FormularioDescripcion", "PasoScraping"]
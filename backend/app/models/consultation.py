@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import BigInteger, Column, Integer, String, Text, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 
 from app.db import Base
@@ -16,6 +16,19 @@ class Consulta(Base):
     error_categoria = Column(String(30), nullable=True)
     reintentos = Column(Integer, default=0, server_default="0")
     archivo_csv = Column(String(500), nullable=True)
+    ritmo = Column(String(20), nullable=True)
+    filas = Column(Integer, nullable=True)  # filas de resultados extraidas
+    bytes = Column(BigInteger, nullable=True)  # tamano del CSV guardado
+    recursos_bloqueados = Column(Integer, nullable=True)  # requests abortados por el bloqueo de recursos
+    bytes_bloqueados = Column(BigInteger, nullable=True)  # por Content-Length calibrado; NULL = desconocido
+    # Cola durable: en cola = pendiente con encolada_at; lease del worker mientras corre
+    encolada_at = Column(DateTime(timezone=True), nullable=True)
+    prioridad = Column(String(10), default="normal", server_default="normal")  # alta | normal | baja
+    intentos = Column(Integer, default=0, server_default="0")
+    lease_owner = Column(String(100), nullable=True)
+    lease_hasta = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finalizada_at = Column(DateTime(timezone=True), nullable=True)  # fin del scraping (ventana de frescura)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     tenant = relationship("Tenant", back_populates="consultas")
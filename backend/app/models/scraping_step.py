@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, func
+
+from app.db import Base
+
+
+class PasoScraping(Base):
+    """Duracion y resultado de un paso del flujo ARCA dentro de una consulta."""
+
+    __tablename__ = "pasos_scraping"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
+    consulta_id = Column(Integer, ForeignKey("consultas.id", ondelete="CASCADE"), nullable=False, index=True)
+    paso = Column(String(40), nullable=False)
+    inicio = Column(DateTime(timezone=True), nullable=False, index=True)
+    fin = Column(DateTime(timezone=True), nullable=False)
+    duracion_ms = Column(Integer, nullable=False)
+    intentos = Column(Integer, nullable=False, default=1)
+    resultado = Column(String(20), nullable=False)  # ok | error | excepcion
+    error = Column(String(300), nullable=True)
+    # Tiempo en esperas del pacer durante el paso y ahorro frente al perfil cautious
+    esperado_ms = Column(Integer, nullable=True)
+    ahorrado_ms = Column(Integer, nullable=True)
+    # True si el paso es de la sesion (login, navegacion) compartida por varias consultas
+    compartido = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -11,6 +11,8 @@ class Tenant(Base):
     nombre = Column(String(200), nullable=False)
     email = Column(String(200), nullable=False, unique=True)
     plan = Column(String(50), default="free")
+    ritmo = Column(String(20), nullable=True)  # perfil de ritmo del scraper; None = SCRAPER_PACING
+    frescura_min = Column(Integer, nullable=True)  # reutilizar resultados de hasta N minutos; None = SCRAPER_FRESCURA_MIN
     activo = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
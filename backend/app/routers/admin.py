@@ -1,15 +1,17 @@
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.deps import get_superadmin
 from app.db import get_db
 from app.models.client import Cliente
 from app.models.consultation import Consulta
+from app.models.scraping_step import PasoScraping
 from app.models.user import Tenant, User
-from app.schemas.auth import TenantResponse
+from app.schemas.auth import TenantResponse, TenantScraperConfig
 
 router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
 
@@ -81,6 +83,8 @@ async def get_tenant_detail(
         "email": tenant.email,
         "plan": tenant.plan,
         "activo": tenant.activo,
+        "ritmo": tenant.ritmo,
+        "frescura_min": tenant.frescura_min,
         "created_at": tenant.created_at,
         "clientes_count": clients,
         "consultas_count": consultas,
@@ -104,6 +108,25 @@ async def toggle_tenant(
     return {"id": tenant.id, "activo": tenant.activo}
 
 
+@router.put("/tenants/{tenant_id}/scraper")
+async def update_tenant_scraper(
+    tenant_id: int,
+    payload: TenantScraperConfig,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _admin: Annotated[User, Depends(get_superadmin)],
+):
+    """Configurar el ritmo del scraper y la ventana de frescura de resultados para un tenant."""
+    result = await db.execute(select(Tenant).where(Tenant.id == tenant_id))
+    tenant = result.scalar_one_or_none()
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant no encontrado")
+
+    tenant.ritmo = payload.ritmo
+    tenant.frescura_min = payload.frescura_min
+    await db.commit()
+    return {"id": tenant.id, "ritmo": tenant.ritmo, "frescura_min": tenant.frescura_min}
+
+
 @router.get("/consultations")
 async def all_consultations(
     db: Annotated[AsyncSession, Depends(get_db)],
@@ -131,3 +154,119 @@ async def all_consultations(
         }
         for c, cn, tn in rows
     ]
+
+
+@router.get("/scraper/pool")
+async def browser_pool_stats(
+    _admin: Annotated[User, Depends(get_superadmin)],
+):
+    """Estado del pool de navegadores del scraper (solo superadmin)."""
+    from app.services.browser_pool import get_browser_pool
+
+    return get_browser_pool().stats()
+
+
+@router.get("/scraper/sesiones")
+async def session_cache_stats(
+    _admin: Annotated[User, Depends(get_superadmin)],
+):
+    """Estado del cache de sesiones ARCA (solo superadmin)."""
+    from app.services.session_cache import get_session_cache
+
+    return get_session_cache().stats()
+
+
+@router.get("/scraper/navegacion")
+async def nav_strategy_stats(
+    _admin: Annotated[User, Depends(get_superadmin)],
+):
+    """Aciertos y fallos por estrategia de navegacion a SETI y cache de selectores (solo superadmin)."""
+    from app.services.multiselect import caret_cache
+    from app.services.nav_strategy import get_nav_strategies
+
+    return {**get_nav_strategies().stats(), "selectores": caret_cache.stats()}
+
+
+@router.get("/scraper/cola")
+async def scraper_queue_stats(
+    _admin: Annotated[User, Depends(get_superadmin)],
+):
+    """Profundidad y espera maxima por carril de prioridad y estado de los workers (solo superadmin)."""
+    from app.tasks.runner import get_runner_status
+
+    return await get_runner_status()
+
+
+@router.get("/scraper/limitador")
+async def scraper_throttle_stats(
+    _admin: Annotated[User, Depends(get_superadmin)],
+):
+    """Ritmo adaptativo, estado del circuit breaker y logins en espera (solo superadmin)."""
+    from app.tasks.throttle import get_throttle
+
+    return get_throttle().stats(detalle=True)
+
+
+@router.get("/scraper/cache")
+async def scraper_result_cache_stats(
+    _admin: Annotated[User, Depends(get_superadmin)],
+):
+    """Aciertos de la reutilizacion de resultados recientes (solo superadmin)."""
+    from app.services.result_cache import get_result_cache
+
+    return get_result_cache().stats()
+
+
+@router.get("/scraper/pasos")
+async def scraping_step_percentiles(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _admin: Annotated[User, Depends(get_superadmin)],
+    horas: float = Query(24, gt=0, le=24 * 90),
+    tenant_id: int | None = None,
+):
+    """
+    p50/p95/p99 de duracion por paso del scraper en la ventana indicada, con el
+    tiempo en esperas y el ahorrado por el ritmo (solo superadmin).
+    """
+    desde = datetime.now(timezone.utc) - timedelta(hours=horas)
+    duracion = PasoScraping.duracion_ms
+    query = (
+        select(
+            PasoScraping.paso,
+            func.count(PasoScraping.id),
+            func.sum(case((PasoScraping.resultado != "ok", 1), else_=0)),
+            func.avg(PasoScraping.intentos),
+            func.percentile_cont(0.5).within_group(duracion),
+            func.percentile_cont(0.95).within_group(duracion),
+            func.percentile_cont(0.99).within_group(duracion),
+            func.max(duracion),
+            func.sum(PasoScraping.esperado_ms),
+            func.sum(PasoScraping.ahorrado_ms),
+        )
+        .where(PasoScraping.inicio >= desde)
+        .group_by(PasoScraping.paso)
+        .order_by(func.percentile_cont(0.95).within_group(duracion).desc())
+    )
+    if tenant_id is not None:
+        query = query.where(PasoScraping.tenant_id == tenant_id)
+    rows = (await db.execute(query)).all()
+
+    return {
+        "desde": desde,
+        "horas": horas,
+        "pasos": [
+            {
+                "paso": paso,
+                "cantidad": cantidad,
+                "fallidos": fallidos,
+                "intentos_promedio": round(float(intentos), 2),
+                "p50_ms": round(p50),
+                "p95_ms": round(p95),
+                "p99_ms": round(p99),
+                "max_ms": maximo,
+                "esperado_ms": esperado or 0,
+                "ahorrado_ms": ahorrado or 0,
+            }
+            for paso, cantidad, fallidos, intentos, p50, p95, p99, maximo, esperado, ahorrado in rows
+        ],
+    }
@@ -14,6 +14,7 @@ from app.models.client import Cliente
 from app.models.download import Descarga
 from app.models.user import User
 from app.schemas.client import ClienteCreate, ClienteImportRequest, ClienteImportResult, ClienteImportError, ClienteResponse, ClienteUpdate
+from app.services.session_cache import get_session_cache
 
 router = APIRouter(prefix="/api/v1/clients", tags=["clients"])
 
@@ -130,7 +131,8 @@ async def import_clients(
         existing = result.scalar_one_or_none()
 
         if existing:
-            # Update existing
+            # Update existing; its cached ARCA sessions belong to the old credentials
+            get_session_cache().invalidar(tenant_id, existing.cuit_login)
             existing.nombre = row.nombre.strip()
             existing.clave_fiscal = encrypt_clave(row.clave_fiscal.strip())
             existing.cuit_consulta = cuit_consulta_clean
@@ -337,6 +339,9 @@ async def update_client(
     update_data = payload.model_dump(exclude_unset=True)
     if "clave_fiscal" in update_data and update_data["clave_fiscal"]:
         update_data["clave_fiscal"] = encrypt_clave(update_data["clave_fiscal"])
+    if "clave_fiscal" in update_data or "cuit_login" in update_data:
+        # Cached ARCA sessions belong to the old credentials
+        get_session_cache().invalidar(tenant_id, cliente.cuit_login)
     for field, value in update_data.items():
         setattr(cliente, field, value)
 
@@ -360,5 +365,6 @@ async def delete_client(
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
+    get_session_cache().invalidar(tenant_id, cliente.cuit_login)
     await db.delete(cliente)
     await db.commit()
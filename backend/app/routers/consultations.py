@@ -5,15 +5,18 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.deps import get_current_tenant_id, get_current_user
 from app.db import get_db
 from app.models.client import Cliente
 from app.models.consultation import Consulta
-from app.models.user import User
+from app.models.user import Tenant, User
 from app.schemas.consultation import ConsultaCreate, ConsultaResponse
+from app.tasks.scheduler import lane_for
 
 router = APIRouter(prefix="/api/v1/consultations", tags=["consultations"])
 
@@ -33,6 +36,63 @@ _handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %
 logging.getLogger("scraper").addHandler(_handler)
 logging.getLogger("task_runner").addHandler(_handler)
 
+logger = logging.getLogger("task_runner")
+
+# Partial unique index ux_consultas_activa: one active consulta per cliente and periodo
+ESTADOS_ACTIVOS = ("pendiente", "en_proceso")
+_ACTIVA = text("estado IN ('pendiente', 'en_proceso')")
+
+
+async def _consulta_activa(db: AsyncSession, cliente_id: int, periodo: str) -> int | None:
+    return await db.scalar(
+        select(Consulta.id).where(
+            Consulta.cliente_id == cliente_id,
+            Consulta.periodo == periodo,
+            Consulta.estado.in_(ESTADOS_ACTIVOS),
+        )
+    )
+
+
+async def _crear_o_adjuntar(db: AsyncSession, tenant_id: int, cliente_id: int, periodo: str, ritmo: str | None) -> tuple[int, bool]:
+    """
+    Create a pendiente consulta, or attach to the one already pending or
+    running for the same cliente and periodo. Returns (consulta_id, coalesced).
+    """
+    while True:
+        consulta_id = await db.scalar(
+            pg_insert(Consulta)
+            .values(tenant_id=tenant_id, cliente_id=cliente_id, periodo=periodo, estado="pendiente", ritmo=ritmo)
+            .on_conflict_do_nothing(index_elements=[Consulta.cliente_id, Consulta.periodo], index_where=_ACTIVA)
+            .returning(Consulta.id)
+        )
+        if consulta_id is not None:
+            return consulta_id, False
+        activa = await _consulta_activa(db, cliente_id, periodo)
+        if activa is not None:
+            return activa, True
+        # The conflicting consulta finished in between: try again
+
+
+async def _reactivar(db: AsyncSession, consulta: Consulta) -> tuple[int, bool]:
+    """Return a failed consulta to pendiente, or attach to the active one of its cliente and periodo."""
+    activa = await _consulta_activa(db, consulta.cliente_id, consulta.periodo)
+    if activa is not None:
+        return activa, True
+    try:
+        async with db.begin_nested():
+            await db.execute(
+                update(Consulta)
+                .where(Consulta.id == consulta.id)
+                .values(estado="pendiente", error_detalle=None, error_categoria=None, reintentos=0)
+            )
+    except IntegrityError:
+        # Another request activated one concurrently
+        activa = await _consulta_activa(db, consulta.cliente_id, consulta.periodo)
+        if activa is not None:
+            return activa, True
+        raise
+    return consulta.id, False
+
 
 @router.get("/", response_model=list[ConsultaResponse])
 async def list_consultations(
@@ -61,6 +121,10 @@ async def list_consultations(
             error_categoria=c.error_categoria,
             reintentos=c.reintentos or 0,
             archivo_csv=c.archivo_csv,
+            filas=c.filas,
+            bytes=c.bytes,
+            recursos_bloqueados=c.recursos_bloqueados,
+            bytes_bloqueados=c.bytes_bloqueados,
             created_at=c.created_at,
         )
         for c, nombre in rows
@@ -86,14 +150,13 @@ async def retry_consultation(
     if consulta.estado != "error":
         raise HTTPException(status_code=400, detail="Solo se pueden reintentar consultas con error")
 
-    consulta.estado = "pendiente"
-    consulta.error_detalle = None
-    consulta.error_categoria = None
-    consulta.reintentos = 0
+    activa, coalescida = await _reactivar(db, consulta)
     await db.commit()
+    if coalescida:
+        return {"message": "Ya hay una consulta activa para el cliente y periodo", "consulta_id": activa, "coalescidas": 1}
 
     await enqueue_scraping(consulta_id, tenant_id)
-    return {"message": "Consulta re-encolada", "consulta_id": consulta_id}
+    return {"message": "Consulta re-encolada", "consulta_id": consulta_id, "coalescidas": 0}
 
 
 @router.post("/retry-batch", status_code=status.HTTP_202_ACCEPTED)
@@ -104,27 +167,31 @@ async def retry_batch(
     _user: Annotated[User, Depends(get_current_user)],
 ):
     """Reintentar múltiples consultas fallidas."""
-    from app.tasks.runner import enqueue_scraping
+    from app.tasks.runner import enqueue_many
 
     retried = []
+    adjuntadas = []
     for cid in ids:
         result = await db.execute(
             select(Consulta).where(Consulta.id == cid, Consulta.tenant_id == tenant_id)
         )
         consulta = result.scalar_one_or_none()
         if consulta and consulta.estado == "error":
-            consulta.estado = "pendiente"
-            consulta.error_detalle = None
-            consulta.error_categoria = None
-            consulta.reintentos = 0
-            retried.append(cid)
+            activa, coalescida = await _reactivar(db, consulta)
+            if coalescida:
+                adjuntadas.append(activa)
+            else:
+                retried.append(cid)
 
     await db.commit()
 
-    for cid in retried:
-        await enqueue_scraping(cid, tenant_id)
+    await enqueue_many(retried, lane_for(None, len(retried)))
 
-    return {"message": f"{len(retried)} consultas re-encoladas", "consulta_ids": retried}
+    return {
+        "message": f"{len(retried)} consultas re-encoladas",
+        "consulta_ids": list(dict.fromkeys(retried + adjuntadas)),
+        "coalescidas": len(adjuntadas),
+    }
 
 
 @router.post("/execute", status_code=status.HTTP_202_ACCEPTED)
@@ -135,9 +202,16 @@ async def execute_consultations(
     _user: Annotated[User, Depends(get_current_user)],
 ):
     """Encolar consultas ARCA para ejecucion en background."""
-    from app.tasks.runner import enqueue_scraping
+    from app.services.result_cache import frescura_min, get_result_cache
+    from app.tasks.runner import enqueue_many
 
+    cache = get_result_cache()
+    ventana = frescura_min(await db.get(Tenant, tenant_id))
     consulta_ids = []
+    nuevas = []
+    coalescidas = 0
+    reutilizadas = 0
+    derivadas = 0
     for cliente_id in payload.cliente_ids:
         # Verify client belongs to tenant
         result = await db.execute(
@@ -147,23 +221,47 @@ async def execute_consultations(
         if not cliente:
             raise HTTPException(status_code=404, detail=f"Cliente {cliente_id} no encontrado")
 
-        consulta = Consulta(
-            tenant_id=tenant_id,
-            cliente_id=cliente_id,
-            periodo=payload.periodo,
-            estado="pendiente",
-        )
-        db.add(consulta)
-        await db.flush()
-        consulta_ids.append(consulta.id)
+        # A recent successful result for the same cliente and periodo (or one derived
+        # from a wider periodo) answers without ARCA
+        if payload.force:
+            cache.forzada()
+        elif (reciente := await cache.resolver(db, cliente, payload.periodo, ventana)) is not None:
+            reciente_id, derivada = reciente
+            if derivada:
+                derivadas += 1
+            else:
+                reutilizadas += 1
+            if reciente_id not in consulta_ids:
+                consulta_ids.append(reciente_id)
+            continue
+
+        # A repeated request for the same cliente and periodo shares the active consulta
+        consulta_id, coalescida = await _crear_o_adjuntar(db, tenant_id, cliente_id, payload.periodo, payload.ritmo)
+        if coalescida:
+            coalescidas += 1
+        else:
+            nuevas.append(consulta_id)
+        if consulta_id not in consulta_ids:
+            consulta_ids.append(consulta_id)
 
     await db.commit()
+    if coalescidas:
+        logger.info(f"Tenant {tenant_id}: {coalescidas} consultas coalescidas con otras ya activas")
+    if reutilizadas:
+        logger.info(f"Tenant {tenant_id}: {reutilizadas} consultas respondidas con resultados de los ultimos {ventana} min")
+    if derivadas:
+        logger.info(f"Tenant {tenant_id}: {derivadas} consultas derivadas de resultados recientes de un periodo mayor")
 
-    # Enqueue in-process background tasks (sequential execution)
-    for cid in consulta_ids:
-        await enqueue_scraping(cid, tenant_id)
+    # Durable queue in Postgres; only small interactive runs go to the high-priority lane
+    await enqueue_many(nuevas, lane_for(payload.prioridad, len(nuevas)))
 
-    return {"message": f"{len(consulta_ids)} consultas encoladas", "consulta_ids": consulta_ids}
+    return {
+        "message": f"{len(nuevas)} consultas encoladas",
+        "consulta_ids": consulta_ids,
+        "coalescidas": coalescidas,
+        "reutilizadas": reutilizadas,
+        "derivadas": derivadas,
+    }
 
 
 @router.get("/status")
@@ -182,12 +280,11 @@ async def get_execution_status(
     )
     rows = result.all()
 
+    from app.tasks.runner import get_runner_status
+
     en_proceso = any(c.estado in ("pendiente", "en_proceso") for c, _ in rows)
-    detalle = ""
-    for c, nombre in rows:
-        if c.estado == "en_proceso":
-            detalle = f"Procesando: {nombre}"
-            break
+    procesando = [nombre for c, nombre in rows if c.estado == "en_proceso"]
+    detalle = f"Procesando: {', '.join(procesando)}" if procesando else ""
 
     consultas = [
         ConsultaResponse(
@@ -200,11 +297,20 @@ async def get_execution_status(
             error_categoria=c.error_categoria,
             reintentos=c.reintentos or 0,
             archivo_csv=c.archivo_csv,
+            filas=c.filas,
+            bytes=c.bytes,
+            recursos_bloqueados=c.recursos_bloqueados,
+            bytes_bloqueados=c.bytes_bloqueados,
             created_at=c.created_at,
         )
         for c, nombre in rows
     ]
-    return {"corriendo": en_proceso, "detalle": detalle, "consultas": consultas}
+    return {
+        "corriendo": en_proceso,
+        "detalle": detalle,
+        "consultas": consultas,
+        "runner": await get_runner_status(tenant_id),
+    }
 
 
 @router.delete("/{consulta_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+
+from app.schemas.consultation import Ritmo
 
 
 class RegisterRequest(BaseModel):
@@ -29,5 +31,12 @@ class TenantResponse(BaseModel):
     email: str
     plan: str
     activo: bool
+    ritmo: str | None = None
+    frescura_min: int | None = None
 
     model_config = {"from_attributes": True}
+
+
+class TenantScraperConfig(BaseModel):
+    ritmo: Ritmo | None = None  # None = SCRAPER_PACING
+    frescura_min: int | None = Field(None, ge=0)  # None = SCRAPER_FRESCURA_MIN; 0 = no reutilizar
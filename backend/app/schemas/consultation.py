@@ -1,11 +1,21 @@
+from typing import Literal
+
 from pydantic import BaseModel
 from datetime import datetime
 
+Ritmo = Literal["cautious", "normal", "fast"]
+Prioridad = Literal["alta", "normal", "baja"]
+
 
 class ConsultaCreate(BaseModel):
     cliente_ids: list[int]
     periodo: str = "1"
     headless: bool = True
+    ritmo: Ritmo | None = None  # None = ritmo del tenant
+    # alta solo si son pocos clientes (SCRAPER_PRIORIDAD_ALTA_MAX), si no normal; se puede pedir una
+    # prioridad menor (baja = refrescos de fondo), nunca una mayor
+    prioridad: Prioridad | None = None
+    force: bool = False  # True = consultar ARCA aunque haya un resultado dentro de la ventana de frescura
 
 
 class ConsultaResponse(BaseModel):
@@ -18,6 +28,10 @@ class ConsultaResponse(BaseModel):
     error_categoria: str | None = None
     reintentos: int = 0
     archivo_csv: str | None = None
+    filas: int | None = None
+    bytes: int | None = None
+    recursos_bloqueados: int | None = None
+    bytes_bloqueados: int | None = None
     created_at: datetime
 
     model_config = {"from_attributes": True}
@@ -27,3 +41,4 @@ class ConsultaStatusResponse(BaseModel):
     corriendo: bool
     detalle: str
     consultas: list[ConsultaResponse]
+    runner: dict | None = None
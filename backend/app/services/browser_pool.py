@@ -0,0 +1,261 @@
+"""
+Pool de navegadores Chromium de larga vida para el scraper.
+
+Un driver de Playwright (async) por event loop y unos pocos navegadores
+persistentes. Cada consulta recibe un BrowserContext nuevo (cookies, storage y
+descargas aislados). Un navegador se retira despues de N trabajos o si su
+arbol de procesos supera el techo de RSS (se cierra cuando se liberan sus
+contextos activos), y se reemplaza automaticamente si se cayo.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger("scraper")
+
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+
+
+# ─── RSS del arbol de procesos (Linux /proc) ──────────────────────────────────
+
+def _hijos_por_pid() -> dict[int, list[int]]:
+    hijos: dict[int, list[int]] = {}
+    try:
+        entradas = os.listdir("/proc")
+    except OSError:
+        return hijos
+    for entrada in entradas:
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                stat = f.read()
+            # El nombre del proceso va entre parentesis y puede contener espacios
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        hijos.setdefault(ppid, []).append(int(entrada))
+    return hijos
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            residentes = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0.0
+    return residentes * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def rss_arbol_mb(pid: int) -> float:
+    """RSS total (MB) de un proceso y todos sus descendientes."""
+    hijos = _hijos_por_pid()
+    total = 0.0
+    pendientes = [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        total += _rss_mb(actual)
+        pendientes.extend(hijos.get(actual, []))
+    return total
+
+
+def _pids_hijos(pid: int) -> set[int]:
+    return set(_hijos_por_pid().get(pid, []))
+
+
+# ─── Pool ─────────────────────────────────────────────────────────────────────
+
+class _Navegador:
+    def __init__(self, browser, pid: int | None):
+        self.browser = browser
+        self.pid = pid
+        self.trabajos = 0
+        self.contextos_activos = 0
+        self.retirando = False
+        self.motivo = ""
+        self.creado = time.time()
+
+    def rss_mb(self) -> float | None:
+        if self.pid is None:
+            return None
+        return round(rss_arbol_mb(self.pid), 1)
+
+
+class BrowserPool:
+    """
+    Entrega BrowserContexts aislados sobre navegadores reutilizados.
+    Todos los metodos deben llamarse desde el event loop que creo el pool.
+
+    Uso:
+        ctx = await pool.nuevo_contexto(viewport=..., accept_downloads=True)
+        try:
+            ...
+        finally:
+            await pool.liberar_contexto(ctx)
+    """
+
+    def __init__(self, headless=True, max_trabajos=50, max_rss_mb=1500, max_contextos=4):
+        self.headless = headless
+        self.max_trabajos = max_trabajos
+        self.max_rss_mb = max_rss_mb
+        self.max_contextos = max_contextos
+        self._playwright = None
+        self._driver_pid: int | None = None
+        self._lock = asyncio.Lock()
+        self._navegadores: list[_Navegador] = []
+        self._por_contexto: dict[int, _Navegador] = {}
+        self._stats = {
+            "lanzados": 0,
+            "reciclados": 0,
+            "caidos": 0,
+            "contextos_creados": 0,
+        }
+
+    async def _lanzar(self) -> _Navegador:
+        if self._playwright is None:
+            # Import diferido: el proceso padre usa rss_arbol_mb sin cargar Playwright
+            from playwright.async_api import async_playwright
+
+            antes = _pids_hijos(os.getpid())
+            self._playwright = await async_playwright().start()
+            nuevos = _pids_hijos(os.getpid()) - antes
+            self._driver_pid = nuevos.pop() if len(nuevos) == 1 else None
+
+        antes = _pids_hijos(self._driver_pid) if self._driver_pid else set()
+        browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        nuevos = (_pids_hijos(self._driver_pid) - antes) if self._driver_pid else set()
+        nav = _Navegador(browser, nuevos.pop() if len(nuevos) == 1 else None)
+        browser.on("disconnected", lambda _: self._marcar_caido(nav))
+        self._navegadores.append(nav)
+        self._stats["lanzados"] += 1
+        logger.info(f"[POOL] Navegador lanzado (headless={self.headless}, total={len(self._navegadores)})")
+        return nav
+
+    def _marcar_caido(self, nav: _Navegador):
+        if nav in self._navegadores:
+            self._navegadores.remove(nav)
+            if not nav.retirando:
+                self._stats["caidos"] += 1
+                logger.warning(f"[POOL] Navegador caido tras {nav.trabajos} trabajos, se reemplazara")
+
+    async def _retirar(self, nav: _Navegador, motivo: str):
+        logger.info(f"[POOL] Reciclando navegador ({motivo}) tras {nav.trabajos} trabajos")
+        nav.retirando = True
+        if nav in self._navegadores:
+            self._navegadores.remove(nav)
+        self._stats["reciclados"] += 1
+        try:
+            await nav.browser.close()
+        except Exception as e:
+            logger.warning(f"[POOL] Error cerrando navegador: {e}")
+
+    def _elegir(self) -> _Navegador | None:
+        candidatos = [
+            n for n in self._navegadores
+            if not n.retirando and n.browser.is_connected() and n.contextos_activos < self.max_contextos
+        ]
+        return min(candidatos, key=lambda n: n.contextos_activos, default=None)
+
+    async def nuevo_contexto(self, **kwargs):
+        """Crea un BrowserContext nuevo sobre el navegador menos cargado."""
+        for intento in range(2):
+            async with self._lock:
+                nav = self._elegir() or await self._lanzar()
+                nav.contextos_activos += 1
+            try:
+                context = await nav.browser.new_context(**kwargs)
+            except Exception as e:
+                nav.contextos_activos -= 1
+                if intento or nav.browser.is_connected():
+                    raise
+                # El proceso murio entre la eleccion y el new_context
+                logger.warning(f"[POOL] new_context fallo ({e}), relanzando navegador")
+                self._marcar_caido(nav)
+                continue
+            self._por_contexto[id(context)] = nav
+            self._stats["contextos_creados"] += 1
+            return context
+
+    async def liberar_contexto(self, context):
+        """Cierra el contexto y recicla el navegador si corresponde."""
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"[POOL] Error cerrando contexto: {e}")
+
+        nav = self._por_contexto.pop(id(context), None)
+        if nav is None:
+            return
+        nav.contextos_activos = max(0, nav.contextos_activos - 1)
+        nav.trabajos += 1
+
+        if not nav.retirando:
+            if nav.trabajos >= self.max_trabajos:
+                nav.retirando = True
+                nav.motivo = f"{nav.trabajos} trabajos"
+            elif self.max_rss_mb:
+                rss = await asyncio.to_thread(nav.rss_mb)
+                if rss is not None and rss > self.max_rss_mb:
+                    nav.retirando = True
+                    nav.motivo = f"RSS {rss:.0f}MB"
+        if nav.retirando and nav.contextos_activos == 0 and nav.browser.is_connected():
+            await self._retirar(nav, nav.motivo or "retiro")
+
+    async def cerrar(self):
+        """Cierra todos los navegadores y el driver (shutdown)."""
+        for nav in list(self._navegadores):
+            nav.retirando = True
+            try:
+                await nav.browser.close()
+            except Exception:
+                pass
+        self._navegadores.clear()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                logger.warning(f"[POOL] Error deteniendo playwright: {e}")
+            self._playwright = None
+
+    def stats(self) -> dict:
+        navegadores = list(self._navegadores)
+        stats = dict(self._stats)
+        stats["navegadores_activos"] = len(navegadores)
+        stats["contextos_activos"] = sum(n.contextos_activos for n in navegadores)
+        stats["navegadores"] = [
+            {
+                "trabajos": n.trabajos,
+                "contextos_activos": n.contextos_activos,
+                "retirando": n.retirando,
+                "edad_s": round(time.time() - n.creado),
+                "rss_mb": n.rss_mb(),
+            }
+            for n in navegadores
+        ]
+        stats["max_trabajos"] = self.max_trabajos
+        stats["max_rss_mb"] = self.max_rss_mb
+        stats["max_contextos"] = self.max_contextos
+        return stats
+
+
+# Un pool por event loop: los objetos async de Playwright quedan atados al loop
+_pools: dict[int, tuple[asyncio.AbstractEventLoop, BrowserPool]] = {}
+
+
+def get_browser_pool() -> BrowserPool:
+    """Pool del event loop actual, configurado desde settings."""
+    loop = asyncio.get_running_loop()
+    entry = _pools.get(id(loop))
+    if entry is None or entry[0] is not loop:
+        from app.config import settings
+        pool = BrowserPool(
+            headless=settings.HEADLESS,
+            max_trabajos=settings.BROWSER_POOL_MAX_JOBS,
+            max_rss_mb=settings.BROWSER_POOL_MAX_RSS_MB,
+            max_contextos=settings.BROWSER_POOL_MAX_CONTEXTS,
+        )
+        _pools[id(loop)] = (loop, pool)
+        return pool
+    return entry[1]
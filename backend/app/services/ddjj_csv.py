@@ -0,0 +1,193 @@
+"""
+Resultados de Consulta de DDJJ de SETI a partir de la respuesta JSON.
+
+Cuando se hace click en "Ver consulta", la SPA de SETI pide las
+presentaciones por XHR. extraer_filas() busca en ese JSON la lista de
+presentaciones y la normaliza al formato de tabla_datos (mismas claves que
+extrae la tabla del DOM). Solo la acepta si el mismo objeto declara un total
+que coincide con las filas: sin total (respuesta paginada o ajena a la
+consulta) no hay filas y el scraper usa el export. escribir_csv() genera el
+CSV del lado del servidor con esas filas, en lugar de descargar el export
+del navegador.
+
+leer_csv() lee el CSV exportado por ARCA de forma incremental (lotes de filas
+en el mismo formato) y clave_fila() identifica una presentacion para
+conciliarlo con las filas de pantalla.
+"""
+
+import codecs
+import csv
+import os
+import unicodedata
+
+COLUMNAS = ["estado", "cuit_cuil", "formulario", "periodo", "transaccion", "fecha_presentacion"]
+ENCABEZADOS = ["Estado", "CUIT/CUIL", "Formulario", "Período", "Transacción", "Fecha Presentación"]
+
+# Nombres posibles de cada campo en el JSON (comparados en minusculas, sin _)
+_ALIAS = {
+    "estado": ("estado", "descestado", "estadopresentacion"),
+    "cuit_cuil": ("cuit", "cuil", "cuitcuil", "cuitcontribuyente", "cuitpresentante"),
+    "formulario": ("formulario", "nroformulario", "codformulario", "descformulario", "impuesto"),
+    "periodo": ("periodo", "periodofiscal", "periododdjj", "anioperiodo"),
+    "transaccion": ("transaccion", "nrotransaccion", "numerotransaccion", "idtransaccion"),
+    "fecha_presentacion": ("fechapresentacion", "fecpresentacion", "fecha", "fechahora"),
+}
+# Minimo de campos reconocidos para aceptar un objeto como fila
+_MIN_CAMPOS = 4
+# Nombres posibles del total de registros junto a la lista (minusculas, sin _)
+_ALIAS_TOTAL = ("total", "totalregistros", "cantidad", "cantidadregistros", "count", "totalelements", "totalitems", "recordstotal")
+
+
+def _clave(nombre: str) -> str:
+    return nombre.lower().replace("_", "")
+
+
+def _mapear(item: dict) -> dict | None:
+    por_clave = {_clave(k): v for k, v in item.items() if not isinstance(v, (dict, list))}
+    fila = {}
+    for columna, alias in _ALIAS.items():
+        for a in alias:
+            if a in por_clave and por_clave[a] is not None:
+                fila[columna] = str(por_clave[a]).strip()
+                break
+    if len(fila) < _MIN_CAMPOS:
+        return None
+    return {c: fila.get(c, "") for c in COLUMNAS}
+
+
+def _listas(nodo, padre=None):
+    """Recorre el JSON y devuelve (lista de objetos, objeto que la contiene)."""
+    if isinstance(nodo, list):
+        if nodo and all(isinstance(x, dict) for x in nodo):
+            yield nodo, padre
+        for x in nodo:
+            yield from _listas(x)
+    elif isinstance(nodo, dict):
+        for v in nodo.values():
+            yield from _listas(v, nodo)
+
+
+def _total(padre: dict | None) -> int | None:
+    if not padre:
+        return None
+    por_clave = {_clave(k): v for k, v in padre.items()}
+    for alias in _ALIAS_TOTAL:
+        valor = por_clave.get(alias)
+        if isinstance(valor, bool):
+            continue
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def extraer_filas(payload) -> list[dict] | None:
+    """
+    Filas de presentaciones en formato tabla_datos, o None si el JSON no es
+    una respuesta completa de la consulta: todos los objetos de la lista deben
+    ser presentaciones y el objeto que la contiene debe declarar un total igual.
+    """
+    for lista, padre in _listas(payload):
+        filas = [f for f in (_mapear(x) for x in lista) if f is not None]
+        if len(filas) == len(lista) and _total(padre) == len(filas):
+            return filas
+    return None
+
+
+def escribir_csv(filas: list[dict], destino: str) -> int:
+    """Escribe el CSV (separador ;, UTF-8 con BOM para Excel). Devuelve los bytes escritos."""
+    with open(destino, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(ENCABEZADOS)
+        for fila in filas:
+            writer.writerow([fila.get(c, "") for c in COLUMNAS])
+    return os.path.getsize(destino)
+
+
+# Encabezados del CSV de ARCA (normalizados: sin tildes, minusculas, solo letras)
+_ENCABEZADOS_CSV = {
+    "estado": "estado",
+    "cuitcuil": "cuit_cuil",
+    "cuit": "cuit_cuil",
+    "cuil": "cuit_cuil",
+    "formulario": "formulario",
+    "periodo": "periodo",
+    "periodofiscal": "periodo",
+    "transaccion": "transaccion",
+    "nrotransaccion": "transaccion",
+    "numerotransaccion": "transaccion",
+    "fechapresentacion": "fecha_presentacion",
+    "fecha": "fecha_presentacion",
+}
+
+
+def _normalizar(texto: str) -> str:
+    sin_tildes = unicodedata.normalize("NFD", texto).encode("ascii", "ignore").decode()
+    return "".join(c for c in sin_tildes.lower() if c.isalnum())
+
+
+def _abrir(ruta: str):
+    """El export de ARCA viene en UTF-8 (con o sin BOM) o en Latin-1."""
+    with open(ruta, "rb") as f:
+        inicio = f.read(4096)
+    try:
+        # Incremental: un caracter multibyte cortado al final de la muestra no es un error
+        codecs.getincrementaldecoder("utf-8")().decode(inicio, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+    return open(ruta, newline="", encoding=encoding)
+
+
+def leer_csv(ruta: str, tamano_lote: int = 500):
+    """
+    Lee el CSV exportado por lotes de filas en formato tabla_datos, sin
+    cargar el archivo completo. Lanza ValueError si no reconoce las columnas.
+    """
+    with _abrir(ruta) as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            delimitador = csv.Sniffer().sniff(muestra, delimiters=";,\t").delimiter
+        except csv.Error:
+            delimitador = ";"
+        reader = csv.reader(f, delimiter=delimitador)
+        encabezado = next(reader, None)
+        if encabezado is None:
+            return
+        indices = {}
+        for i, nombre in enumerate(encabezado):
+            columna = _ENCABEZADOS_CSV.get(_normalizar(nombre))
+            if columna and columna not in indices:
+                indices[columna] = i
+        if len(indices) < _MIN_CAMPOS:
+            raise ValueError(f"Columnas del CSV no reconocidas: {encabezado}")
+
+        lote = []
+        for registro in reader:
+            if not any(c.strip() for c in registro):
+                continue
+            lote.append({
+                c: (registro[indices[c]].strip() if c in indices and indices[c] < len(registro) else "")
+                for c in COLUMNAS
+            })
+            if len(lote) >= tamano_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+
+def clave_fila(fila: dict) -> tuple:
+    """Identidad de una presentacion: la transaccion, o los demas campos si no la hay."""
+    transaccion = (fila.get("transaccion") or "").strip()
+    if transaccion:
+        return ("t", transaccion)
+    return (
+        "f",
+        (fila.get("cuit_cuil") or "").replace("-", "").strip(),
+        (fila.get("formulario") or "").strip(),
+        (fila.get("periodo") or "").strip(),
+        (fila.get("fecha_presentacion") or "").strip(),
+    )
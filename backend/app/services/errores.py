@@ -0,0 +1,45 @@
+"""
+Clasificacion de errores de scraping (sin dependencias de Playwright: la usan
+el runner y la API aunque el navegador corra en otro proceso).
+"""
+
+ERROR_PATTERNS = {
+    "credenciales": [
+        "login fallido", "contrasena", "password", "clave fiscal",
+        "credencial", "acceso denegado", "usuario no", "cuit incorrecto",
+    ],
+    "cuit_no_encontrado": [
+        "cuit", "no encontrado", "no se encontro el campo",
+        "opciones:", "no aparecio",
+    ],
+    "timeout": [
+        "timeout", "expirad", "timed out",
+    ],
+    "sin_resultados": [
+        "no se encontraron", "sin resultados", "sin ddjj",
+    ],
+    "arca_error": [
+        "error en plataforma", "error en consulta", "navegar a",
+        "no se pudo", "no hay boton",
+    ],
+}
+
+TRANSIENT_CATEGORIES = {"timeout", "arca_error"}
+
+ERROR_LABELS = {
+    "credenciales": "Credenciales incorrectas",
+    "cuit_no_encontrado": "CUIT de consulta no encontrado",
+    "timeout": "Sesión expirada o timeout",
+    "sin_resultados": "Sin resultados para el período",
+    "arca_error": "Error en plataforma ARCA",
+    "desconocido": "Error desconocido",
+}
+
+
+def clasificar_error(msg: str) -> str:
+    """Classify a raw error message into a known category."""
+    lower = msg.lower()
+    for category, keywords in ERROR_PATTERNS.items():
+        if any(kw in lower for kw in keywords):
+            return category
+    return "desconocido"
@@ -0,0 +1,175 @@
+"""
+Seleccion en los multi-select de SETI con un solo page.evaluate.
+
+SELECCIONAR_JS resuelve el multi-select por su label, lo abre, espera las
+opciones, selecciona la del valor pedido y devuelve un resultado estructurado
+(con el motivo preciso si falla). El id del caret resuelto se cachea por
+version de la pagina de SETI (hash de los <script src>) y campo: con un hit
+el TreeWalker no se ejecuta, solo se valida que el caret siga asociado al label.
+
+La seleccion se hace con eventos sinteticos; VERIFICAR_JS confirma despues que
+tomo (opcion marcada o valor visible en el multi-select) y, si no, el scraper
+vuelve al click de Playwright sobre la opcion.
+"""
+
+import threading
+
+SELECCIONAR_JS = """async ({campo, valor, candidatos, timeoutMs}) => {
+    const CARET = '[id*="multi-select"][id*="caret"]';
+    const fuentes = Array.from(document.scripts).map(s => s.src).filter(Boolean).join('|');
+    let h = 0;
+    for (let i = 0; i < fuentes.length; i++) h = (h * 31 + fuentes.charCodeAt(i)) | 0;
+    const version = (h >>> 0).toString(16);
+
+    const marca = campo === 'cuit' ? 'ontribuyente' : 'meses';
+    const asociado = (caret) => {
+        // El menor ancestro con el texto del label debe contener solo este caret
+        let el = caret.parentElement;
+        for (let i = 0; i < 12 && el; i++, el = el.parentElement) {
+            if ((el.textContent || '').includes(marca)) {
+                return el.querySelectorAll(CARET).length === 1;
+            }
+        }
+        return false;
+    };
+
+    const buscarCuit = () => {
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        while (walker.nextNode()) {
+            const text = walker.currentNode.textContent.trim();
+            if (text.includes('Cuit del Contribuyente') || text.includes('CUIT del Contribuyente')) {
+                let el = walker.currentNode.parentElement;
+                for (let i = 0; i < 10 && el; i++) {
+                    const caret = el.querySelector(CARET);
+                    if (caret) return caret;
+                    el = el.parentElement;
+                }
+            }
+        }
+        return null;
+    };
+    const buscarMeses = () => {
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        while (walker.nextNode()) {
+            if (walker.currentNode.textContent.trim() !== 'meses') continue;
+            const mesesEl = walker.currentNode.parentElement;
+            if (!mesesEl || !mesesEl.parentElement) continue;
+            let sibling = mesesEl.previousElementSibling;
+            while (sibling) {
+                const caret = sibling.querySelector('[id*="caret"]');
+                if (caret && caret.id.includes('multi-select')) return caret;
+                sibling = sibling.previousElementSibling;
+            }
+            const caretInParent = mesesEl.parentElement.querySelector(CARET);
+            if (caretInParent) return caretInParent;
+        }
+        return null;
+    };
+
+    let caret = null;
+    let cacheHit = false;
+    const cacheado = candidatos[version];
+    if (cacheado) {
+        const el = document.getElementById(cacheado);
+        if (el && asociado(el)) { caret = el; cacheHit = true; }
+    }
+    if (!caret) caret = campo === 'cuit' ? buscarCuit() : buscarMeses();
+    if (!caret) return {ok: false, motivo: 'sin_label', version, cacheHit};
+
+    const baseId = caret.id.replace('_caret', '');
+    const selOpciones = `[id^="${baseId}-multiselect-option-"]`;
+    const clickear = (el) => {
+        for (const tipo of ['mousedown', 'mouseup', 'click']) {
+            el.dispatchEvent(new MouseEvent(tipo, {bubbles: true, cancelable: true, view: window}));
+        }
+    };
+    const esperar = async (cond) => {
+        const fin = performance.now() + timeoutMs;
+        while (performance.now() < fin) {
+            const r = cond();
+            if (r) return r;
+            await new Promise(res => setTimeout(res, 50));
+        }
+        return null;
+    };
+    const seleccionada = (o) => o.getAttribute('aria-selected') === 'true'
+        || o.classList.contains('is-selected') || o.getAttribute('data-selected') === 'true';
+
+    caret.click();
+    const opciones = await esperar(() => {
+        const opts = document.querySelectorAll(selOpciones);
+        return opts.length ? Array.from(opts) : null;
+    });
+    if (!opciones) return {ok: false, motivo: 'sin_opciones', caretId: caret.id, version, cacheHit};
+    const textos = opciones.map(o => o.textContent.trim());
+
+    const valorSinGuiones = valor.replace(/-/g, '');
+    const opcion = document.getElementById(`${baseId}-multiselect-option-${valor}`)
+        || opciones.find(o => {
+            const t = o.textContent.trim();
+            return t === valor || t.replace(/-/g, '') === valorSinGuiones;
+        });
+    if (!opcion) {
+        caret.click();
+        return {ok: false, motivo: 'opcion_no_encontrada', opciones: textos, caretId: caret.id, version, cacheHit};
+    }
+
+    const yaSeleccionada = seleccionada(opcion);
+    if (yaSeleccionada) {
+        caret.click();  // cerrar el dropdown sin tocar la seleccion
+    } else {
+        clickear(opcion);
+    }
+    const verificada = yaSeleccionada || !!(await esperar(() => {
+        const o = document.getElementById(opcion.id);
+        return (!o || seleccionada(o)) ? true : null;
+    }));
+    return {ok: true, caretId: caret.id, opcionId: opcion.id, opciones: textos, version, cacheHit, yaSeleccionada, verificada};
+}"""
+
+VERIFICAR_JS = """({caretId, opcionId, valor}) => {
+    const normalizar = (t) => t.replace(/-/g, '').trim();
+    const opcion = document.getElementById(opcionId);
+    if (opcion) {
+        return opcion.getAttribute('aria-selected') === 'true'
+            || opcion.classList.contains('is-selected') || opcion.getAttribute('data-selected') === 'true';
+    }
+    // Dropdown cerrado: el valor tiene que figurar entre los mostrados por el multi-select
+    const caret = document.getElementById(caretId);
+    const raiz = document.getElementById(caretId.replace('_caret', '')) || (caret && caret.parentElement);
+    if (!raiz) return false;
+    const copia = raiz.cloneNode(true);
+    copia.querySelectorAll('[id*="-multiselect-option-"]').forEach(o => o.remove());
+    return (copia.textContent || '').split(/[,;\s]+/).some(t => t && normalizar(t) === normalizar(valor));
+}"""
+
+
+class CaretCache:
+    """campo -> {version de SETI -> id del caret}, compartido por las sesiones del proceso."""
+
+    def __init__(self, max_versiones: int = 5):
+        self.max_versiones = max_versiones
+        self._lock = threading.Lock()
+        self._ids: dict[str, dict[str, str]] = {}
+        self._stats = {"hits": 0, "misses": 0}
+
+    def candidatos(self, campo: str) -> dict[str, str]:
+        with self._lock:
+            return dict(self._ids.get(campo, {}))
+
+    def registrar(self, campo: str, resultado: dict):
+        with self._lock:
+            self._stats["hits" if resultado.get("cacheHit") else "misses"] += 1
+            if resultado.get("caretId") and resultado.get("version"):
+                versiones = self._ids.setdefault(campo, {})
+                versiones.pop(resultado["version"], None)
+                versiones[resultado["version"]] = resultado["caretId"]
+                while len(versiones) > self.max_versiones:
+                    versiones.pop(next(iter(versiones)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "campos": {c: dict(v) for c, v in self._ids.items()}}
+
+
+caret_cache = CaretCache()
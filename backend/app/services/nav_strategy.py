@@ -0,0 +1,134 @@
+"""
+Orden aprendido de las estrategias para llegar a SETI desde el portal.
+
+Cada intento de navegar_a_ddjj registra que estrategia (y selector) funciono o
+fallo. orden() devuelve las estrategias de mayor a menor tasa de exito sobre
+una ventana movil de intentos; las que no tienen datos conservan el orden por
+defecto. La tabla se persiste en un JSON (NAV_STATS_FILE) para compartirla
+entre workers, procesos y reinicios.
+
+Tambien guarda la ultima URL de SETI alcanzada (sin query ni fragmento), que
+se usa como acceso directo ("seti_directo") en la siguiente sesion.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger("scraper")
+
+GUARDAR_CADA_S = 30
+
+
+def url_base(url: str) -> str:
+    """URL sin query ni fragmento (descarta tokens de SSO)."""
+    partes = urlsplit(url)
+    return urlunsplit((partes.scheme, partes.netloc, partes.path, "", ""))
+
+
+class EstrategiasNavegacion:
+    def __init__(self, archivo: str | None, ventana: int = 50):
+        self.archivo = archivo
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        # nombre -> deque de (exito, segundos)
+        self._intentos: dict[str, deque] = {}
+        self._totales: dict[str, dict] = {}
+        self.url_seti: str | None = None
+        self._mtime = 0.0
+        self._guardado = 0.0
+        self._cargar()
+
+    def _cargar(self):
+        if not self.archivo:
+            return
+        try:
+            mtime = os.path.getmtime(self.archivo)
+            if mtime <= self._mtime:
+                return
+            with open(self.archivo) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._mtime = mtime
+        self.url_seti = data.get("url_seti") or self.url_seti
+        for nombre, e in data.get("estrategias", {}).items():
+            self._intentos[nombre] = deque((tuple(x) for x in e.get("ventana", [])), maxlen=self.ventana)
+            self._totales[nombre] = {"hits": e.get("hits", 0), "misses": e.get("misses", 0)}
+
+    def _guardar(self, forzar=False):
+        if not self.archivo or (not forzar and time.time() - self._guardado < GUARDAR_CADA_S):
+            return
+        data = {
+            "url_seti": self.url_seti,
+            "estrategias": {
+                nombre: {**self._totales[nombre], "ventana": list(v)}
+                for nombre, v in self._intentos.items()
+            },
+        }
+        tmp = f"{self.archivo}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.archivo) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.archivo)
+            self._guardado = time.time()
+            self._mtime = os.path.getmtime(self.archivo)
+        except OSError as e:
+            logger.warning(f"[NAV] No se pudo guardar la tabla de estrategias: {e}")
+
+    def _tasa(self, nombre: str) -> float | None:
+        v = self._intentos.get(nombre)
+        if not v:
+            return None
+        # Suavizado de Laplace: pocas muestras no dominan el orden
+        return (sum(1 for exito, _ in v if exito) + 1) / (len(v) + 2)
+
+    def orden(self, nombres: list[str]) -> list[str]:
+        """Estrategias ordenadas por exito reciente; sin datos = orden por defecto (0.5)."""
+        with self._lock:
+            self._cargar()
+            tasas = {n: self._tasa(n) for n in nombres}
+        return sorted(nombres, key=lambda n: -(tasas[n] if tasas[n] is not None else 0.5))
+
+    def registrar(self, nombre: str, exito: bool, segundos: float, url_seti: str | None = None):
+        with self._lock:
+            self._intentos.setdefault(nombre, deque(maxlen=self.ventana)).append((exito, round(segundos, 2)))
+            t = self._totales.setdefault(nombre, {"hits": 0, "misses": 0})
+            t["hits" if exito else "misses"] += 1
+            nueva_url = url_base(url_seti) if url_seti else None
+            cambio_url = bool(nueva_url) and nueva_url != self.url_seti
+            if cambio_url:
+                self.url_seti = nueva_url
+            self._guardar(forzar=cambio_url)
+
+    def stats(self) -> dict:
+        with self._lock:
+            estrategias = {}
+            for nombre, v in self._intentos.items():
+                exitos = [s for ok, s in v if ok]
+                estrategias[nombre] = {
+                    **self._totales.get(nombre, {}),
+                    "ventana": len(v),
+                    "tasa_exito": round(self._tasa(nombre) or 0, 3),
+                    "segundos_exito_promedio": round(sum(exitos) / len(exitos), 2) if exitos else None,
+                }
+            return {"url_seti": self.url_seti, "estrategias": estrategias}
+
+
+_estrategias: EstrategiasNavegacion | None = None
+
+
+def get_nav_strategies() -> EstrategiasNavegacion:
+    """Tabla compartida del proceso, configurada desde settings."""
+    global _estrategias
+    if _estrategias is None:
+        from app.config import settings
+        _estrategias = EstrategiasNavegacion(settings.NAV_STATS_FILE or None)
+        if settings.SETI_URL:
+            _estrategias.url_seti = settings.SETI_URL
+    return _estrategias
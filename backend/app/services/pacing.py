@@ -0,0 +1,100 @@
+"""
+Ritmo del scraper: perfiles de espera entre acciones en ARCA.
+
+Hay dos tipos de espera en el flujo:
+- pausa(): jitter "humano" entre acciones (tipear, clickear). Se escala segun
+  el perfil a partir de la ventana historica (min_s, max_s).
+- esperar(): espera a una condicion concreta del DOM/red (un selector visible,
+  una opcion renderizada) en lugar de dormir la ventana fija. En el perfil
+  "cautious" se sigue durmiendo la ventana completa como antes.
+
+Cada paso acumula el tiempo efectivamente esperado y el "nominal" (la media de
+la ventana que se habria dormido con el perfil cautious) para medir el ahorro.
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PacingProfile:
+    nombre: str
+    factor: float  # escala de las ventanas de pausa historicas
+    por_eventos: bool  # True: esperar() espera la condicion, no la ventana
+    jitter: tuple[float, float]  # pausa minima tras una condicion cumplida
+    carga: str  # wait_until para page.goto
+
+
+PROFILES = {
+    "cautious": PacingProfile("cautious", 1.0, False, (0.0, 0.0), "networkidle"),
+    "normal": PacingProfile("normal", 0.4, True, (0.2, 0.6), "domcontentloaded"),
+    "fast": PacingProfile("fast", 0.1, True, (0.05, 0.2), "domcontentloaded"),
+}
+
+
+def get_profile(nombre: str | None) -> PacingProfile:
+    from app.config import settings
+    return PROFILES.get(nombre or settings.SCRAPER_PACING) or PROFILES["normal"]
+
+
+class Pacer:
+    def __init__(self, perfil: PacingProfile, min_delay=1.5, max_delay=3.5):
+        self.perfil = perfil
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._pasos: dict[str, dict] = {}
+        # Totales de la sesion: _medir toma la diferencia para cada span de PasoScraping
+        self.nominal_s = 0.0
+        self.esperado_s = 0.0
+
+    def _ventana(self, min_s, max_s) -> tuple[float, float]:
+        mn = min_s if min_s is not None else self.min_delay
+        mx = max_s if max_s is not None else self.max_delay
+        return mn, mx
+
+    def _registrar(self, paso: str, nominal: float, real: float):
+        p = self._pasos.setdefault(paso, {"esperas": 0, "nominal_s": 0.0, "esperado_s": 0.0})
+        p["esperas"] += 1
+        p["nominal_s"] += nominal
+        p["esperado_s"] += real
+        self.nominal_s += nominal
+        self.esperado_s += real
+
+    async def pausa(self, paso: str, min_s=None, max_s=None):
+        """Jitter humano entre acciones, escalado por el perfil."""
+        mn, mx = self._ventana(min_s, max_s)
+        segundos = random.uniform(mn * self.perfil.factor, mx * self.perfil.factor)
+        await asyncio.sleep(segundos)
+        self._registrar(paso, (mn + mx) / 2, segundos)
+
+    async def esperar(self, paso: str, condicion, min_s=None, max_s=None):
+        """
+        Espera a que se cumpla `condicion` (callable que devuelve un awaitable,
+        p.ej. lambda: locator.wait_for(...)). Si la condicion vence, no se
+        propaga el error: el paso verifica el estado como antes.
+        """
+        if not self.perfil.por_eventos:
+            await self.pausa(paso, min_s, max_s)
+            return
+        mn, mx = self._ventana(min_s, max_s)
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        try:
+            await condicion()
+        except Exception:
+            pass
+        await asyncio.sleep(random.uniform(*self.perfil.jitter))
+        self._registrar(paso, (mn + mx) / 2, loop.time() - inicio)
+
+    def resumen(self) -> dict:
+        """Por paso: esperas, segundos nominales, esperados y ahorrados."""
+        return {
+            paso: {
+                "esperas": p["esperas"],
+                "nominal_s": round(p["nominal_s"], 2),
+                "esperado_s": round(p["esperado_s"], 2),
+                "ahorrado_s": round(p["nominal_s"] - p["esperado_s"], 2),
+            }
+            for paso, p in self._pasos.items()
+        }
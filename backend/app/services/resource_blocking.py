@@ -0,0 +1,122 @@
+"""
+Bloqueo de recursos no esenciales de ARCA (imagenes, fuentes, analytics, banners).
+
+Se instala con context.route("**/*") sobre el BrowserContext de cada sesion:
+- patrones permitidos: siempre pasan (tienen prioridad).
+- tipos bloqueados (resource_type de Playwright) y patrones bloqueados: se abortan.
+- todo lo demas (document, script, xhr/fetch, stylesheet) pasa.
+
+Las hojas de estilo no se bloquean: is_visible() y los dropdowns de SETI
+dependen del CSS. Los bytes bloqueados se estiman con el Content-Length visto
+para esa URL cuando se cargo sin bloqueo en el mismo proceso (una corrida de
+calibracion con SCRAPER_BLOCK_RESOURCES=false). Una URL bloqueada sin tamano
+conocido cuenta en sin_tamano y los bytes de esa consulta quedan en None
+(desconocidos) en lugar de subestimarse como 0.
+"""
+
+import fnmatch
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("scraper")
+
+# Lista segura por defecto, validada contra el flujo login -> SETI -> Consulta -> CSV
+TIPOS_BLOQUEADOS = ("image", "media", "font")
+PATRONES_BLOQUEADOS = (
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*hotjar.com*",
+    "*facebook.net*",
+    "*/banners/*",
+)
+# Recursos que el flujo necesita aunque su tipo este bloqueado
+PATRONES_PERMITIDOS = (
+    "*captcha*",
+)
+
+# URL -> Content-Length visto sin bloqueo, para estimar lo ahorrado
+_tamanos: OrderedDict[str, int] = OrderedDict()
+_MAX_TAMANOS = 2000
+
+
+def _lista(valor: str) -> tuple[str, ...]:
+    return tuple(v.strip() for v in valor.split(",") if v.strip())
+
+
+def _recordar_tamano(url: str, tamano: int):
+    _tamanos[url] = tamano
+    _tamanos.move_to_end(url)
+    while len(_tamanos) > _MAX_TAMANOS:
+        _tamanos.popitem(last=False)
+
+
+class ResourceBlocker:
+    def __init__(self, tipos=TIPOS_BLOQUEADOS, bloqueados=PATRONES_BLOQUEADOS, permitidos=PATRONES_PERMITIDOS, habilitado=True):
+        self.tipos = set(tipos)
+        self.bloqueados = tuple(bloqueados)
+        self.permitidos = tuple(permitidos)
+        self.habilitado = habilitado
+        self._stats = {"bloqueadas": 0, "sin_tamano": 0, "permitidas": 0, "bytes_bloqueados": 0, "bytes_recibidos": 0}
+        self._por_tipo: dict[str, int] = {}
+        self._imputado = dict(self._stats)
+
+    def debe_bloquear(self, url: str, tipo: str) -> bool:
+        if any(fnmatch.fnmatch(url, p) for p in self.permitidos):
+            return False
+        return tipo in self.tipos or any(fnmatch.fnmatch(url, p) for p in self.bloqueados)
+
+    async def instalar(self, context):
+        """Registra el route y el contador de bytes en el contexto."""
+        context.on("response", self._al_responder)
+        if self.habilitado:
+            await context.route("**/*", self._rutear)
+
+    async def _rutear(self, route):
+        request = route.request
+        if self.debe_bloquear(request.url, request.resource_type):
+            self._stats["bloqueadas"] += 1
+            tamano = _tamanos.get(request.url)
+            if tamano is None:
+                self._stats["sin_tamano"] += 1
+            else:
+                self._stats["bytes_bloqueados"] += tamano
+            self._por_tipo[request.resource_type] = self._por_tipo.get(request.resource_type, 0) + 1
+            await route.abort("blockedbyclient")
+        else:
+            self._stats["permitidas"] += 1
+            await route.continue_()
+
+    def _al_responder(self, response):
+        try:
+            tamano = int(response.headers.get("content-length", 0))
+        except ValueError:
+            return
+        self._stats["bytes_recibidos"] += tamano
+        if tamano:
+            _recordar_tamano(response.url, tamano)
+
+    def stats(self) -> dict:
+        return {**self._stats, "bloqueadas_por_tipo": dict(self._por_tipo), "habilitado": self.habilitado}
+
+    def parcial(self) -> dict:
+        """
+        Contadores desde la llamada anterior (lo que corresponde a una consulta
+        de la sesion). bytes_bloqueados es None si algun bloqueo no tenia tamano.
+        """
+        delta = {k: v - self._imputado[k] for k, v in self._stats.items()}
+        self._imputado = dict(self._stats)
+        if delta["sin_tamano"]:
+            delta["bytes_bloqueados"] = None
+        return {**delta, "habilitado": self.habilitado}
+
+
+def get_resource_blocker() -> ResourceBlocker:
+    """Bloqueador nuevo por sesion (contadores propios), configurado desde settings."""
+    from app.config import settings
+    return ResourceBlocker(
+        tipos=_lista(settings.SCRAPER_BLOCK_TYPES),
+        bloqueados=PATRONES_BLOQUEADOS + _lista(settings.SCRAPER_BLOCK_PATTERNS),
+        permitidos=PATRONES_PERMITIDOS + _lista(settings.SCRAPER_ALLOW_PATTERNS),
+        habilitado=settings.SCRAPER_BLOCK_RESOURCES,
+    )
@@ -0,0 +1,211 @@
+"""
+Reutilizacion de resultados recientes (ventana de frescura).
+
+Si un cliente tiene una consulta exitosa para el mismo periodo terminada hace
+menos de la ventana de frescura del tenant (Tenant.frescura_min, si no
+SCRAPER_FRESCURA_MIN; 0 = deshabilitado), un pedido nuevo se responde con esa
+consulta y sus filas de Descarga sin abrir ARCA. force=true en /execute
+ignora la ventana.
+
+Si no la hay pero existe una consulta fresca de un periodo mas amplio (p. ej.
+12 meses para un pedido de 3), el resultado se deriva de sus filas filtrando
+por fecha de presentacion en SQL: se crea una consulta exitosa con esas filas
+y su CSV, sin scraping. Los contadores son por proceso.
+"""
+
+import asyncio
+import calendar
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, case, func, insert, literal, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.client import Cliente
+from app.models.consultation import Consulta
+from app.models.download import Descarga
+from app.models.user import Tenant
+from app.services.ddjj_csv import COLUMNAS, escribir_csv
+
+logger = logging.getLogger("task_runner")
+
+# Valores de "Presentadas en los ultimos X meses" de ARCA
+PERIODOS = ("1", "2", "3", "6", "12")
+
+# ARCA cuenta los meses desde el dia de la consulta en hora argentina
+ZONA_ARCA = ZoneInfo("America/Argentina/Buenos_Aires")
+
+# Fecha de presentacion en SQL (ARCA: dd/mm/aaaa [hh:mm:ss]; JSON: ISO; tambien
+# dd-mm-aaaa); NULL si no se puede interpretar.
+_TEXTO_FECHA = func.split_part(func.split_part(func.trim(Descarga.fecha_presentacion), " ", 1), "T", 1)
+FECHA_PRESENTACION = case(
+    (_TEXTO_FECHA.regexp_match(r"^\d{1,2}/\d{1,2}/\d{4}$"), func.to_date(_TEXTO_FECHA, "DD/MM/YYYY", type_=Date)),
+    (_TEXTO_FECHA.regexp_match(r"^\d{4}-\d{1,2}-\d{1,2}$"), func.to_date(_TEXTO_FECHA, "YYYY-MM-DD", type_=Date)),
+    (_TEXTO_FECHA.regexp_match(r"^\d{1,2}-\d{1,2}-\d{4}$"), func.to_date(_TEXTO_FECHA, "DD-MM-YYYY", type_=Date)),
+)
+
+
+def frescura_min(tenant: Tenant | None) -> int:
+    if tenant is not None and tenant.frescura_min is not None:
+        return tenant.frescura_min
+    return settings.SCRAPER_FRESCURA_MIN
+
+
+def restar_meses(dia: date, meses: int) -> date:
+    anio, mes = divmod(dia.year * 12 + dia.month - 1 - meses, 12)
+    return date(anio, mes + 1, min(dia.day, calendar.monthrange(anio, mes + 1)[1]))
+
+
+class ResultCache:
+    def __init__(self):
+        self.counts = {"aciertos": 0, "derivadas": 0, "fallos": 0, "forzadas": 0}
+
+    async def resolver(self, db: AsyncSession, cliente: Cliente, periodo: str, ventana_min: int) -> tuple[int, bool] | None:
+        """
+        Consulta que responde el pedido sin scraping: (id, derivada), o None
+        si hay que consultar ARCA. Una derivada se crea en db (el llamador hace commit).
+        """
+        if ventana_min <= 0:
+            return None
+        desde = datetime.now(timezone.utc) - timedelta(minutes=ventana_min)
+        consulta_id = await self.buscar(db, cliente.id, periodo, desde)
+        if consulta_id is not None:
+            self.counts["aciertos"] += 1
+            return consulta_id, False
+        consulta_id = await self.derivar(db, cliente, periodo, desde)
+        if consulta_id is not None:
+            self.counts["derivadas"] += 1
+            return consulta_id, True
+        self.counts["fallos"] += 1
+        return None
+
+    def forzada(self):
+        self.counts["forzadas"] += 1
+
+    async def buscar(self, db: AsyncSession, cliente_id: int, periodo: str, desde: datetime) -> int | None:
+        """Id de la ultima consulta exitosa del cliente y periodo terminada desde `desde`."""
+        terminada = func.coalesce(Consulta.finalizada_at, Consulta.created_at)
+        return await db.scalar(
+            select(Consulta.id)
+            .where(
+                Consulta.cliente_id == cliente_id,
+                Consulta.periodo == periodo,
+                Consulta.estado == "exitoso",
+                terminada >= desde,
+            )
+            .order_by(terminada.desc())
+            .limit(1)
+        )
+
+    async def derivar(self, db: AsyncSession, cliente: Cliente, periodo: str, desde: datetime) -> int | None:
+        """
+        Crear el resultado de `periodo` meses a partir de la consulta fresca mas
+        angosta de un periodo mayor, filtrando sus filas por fecha de
+        presentacion. None si no hay fuente o alguna fecha no se puede leer.
+        """
+        if periodo not in PERIODOS:
+            return None
+        mayores = [p for p in PERIODOS if int(p) > int(periodo)]
+        terminada = func.coalesce(Consulta.finalizada_at, Consulta.created_at)
+        candidatas = (await db.execute(
+            select(Consulta.id, Consulta.periodo, Consulta.filas, terminada)
+            .where(
+                Consulta.cliente_id == cliente.id,
+                Consulta.periodo.in_(mayores),
+                Consulta.estado == "exitoso",
+                terminada >= desde,
+            )
+        )).all()
+        if not candidatas:
+            return None
+        fuente_id, fuente_periodo, fuente_filas, fuente_fin = min(candidatas, key=lambda c: (int(c[1]), -c[3].timestamp()))
+        corte = restar_meses(fuente_fin.astimezone(ZONA_ARCA).date(), int(periodo))
+
+        de_fuente = Descarga.consulta_id == fuente_id
+        en_ventana = FECHA_PRESENTACION >= corte
+        try:
+            async with db.begin_nested():
+                total, ilegibles = (await db.execute(
+                    select(func.count(), func.count().filter(FECHA_PRESENTACION.is_(None))).where(de_fuente)
+                )).one()
+                derivadas = [
+                    dict(fila._mapping)
+                    for fila in await db.execute(
+                        select(*(getattr(Descarga, c) for c in COLUMNAS))
+                        .where(de_fuente, en_ventana)
+                        .order_by(Descarga.id)
+                    )
+                ]
+        except DBAPIError as e:
+            # to_date rechaza fechas con el formato correcto pero fuera de rango (p. ej. 31/02)
+            logger.info(f"Consulta {fuente_id}: fecha de presentacion invalida, no se deriva ({e.orig})")
+            return None
+        if fuente_filas is not None and total != fuente_filas:
+            # Filas incompletas en la base (p. ej. consultas anteriores al guardado de descargas)
+            return None
+        if ilegibles:
+            logger.info(f"Consulta {fuente_id}: {ilegibles} fechas de presentacion no interpretables, no se deriva")
+            return None
+
+        destino = _destino_csv(cliente.tenant_id, cliente.cuit_consulta, periodo)
+        tamano = await asyncio.to_thread(escribir_csv, derivadas, destino)
+        consulta = Consulta(
+            tenant_id=cliente.tenant_id,
+            cliente_id=cliente.id,
+            periodo=periodo,
+            estado="exitoso",
+            archivo_csv=os.path.relpath(destino, settings.DOWNLOAD_DIR),
+            filas=len(derivadas),
+            bytes=tamano,
+            finalizada_at=fuente_fin,  # la frescura sigue siendo la del scraping real
+        )
+        db.add(consulta)
+        await db.flush()
+        if derivadas:
+            # Copia de las filas dentro de la base, sin reenviarlas desde el proceso
+            await db.execute(
+                insert(Descarga).from_select(
+                    ["tenant_id", "consulta_id", "cliente_id", *COLUMNAS],
+                    select(
+                        literal(cliente.tenant_id), literal(consulta.id), literal(cliente.id),
+                        *(getattr(Descarga, c) for c in COLUMNAS),
+                    )
+                    .where(de_fuente, en_ventana)
+                    .order_by(Descarga.id),
+                )
+            )
+        logger.info(
+            f"Consulta {consulta.id} ({periodo} meses) derivada de la consulta {fuente_id} "
+            f"({fuente_periodo} meses): {len(derivadas)} de {total} filas"
+        )
+        return consulta.id
+
+    def stats(self) -> dict:
+        pedidos = self.counts["aciertos"] + self.counts["derivadas"] + self.counts["fallos"]
+        return {
+            **self.counts,
+            "tasa_aciertos": round((self.counts["aciertos"] + self.counts["derivadas"]) / pedidos, 3) if pedidos else 0.0,
+            "frescura_min": settings.SCRAPER_FRESCURA_MIN,
+        }
+
+
+def _destino_csv(tenant_id: int, cuit_consulta: str, meses: str) -> str:
+    """Misma organizacion que los CSV del scraper (tenant / CUIT / mes)."""
+    ahora = datetime.now()
+    destino_dir = os.path.join(settings.DOWNLOAD_DIR, f"tenant_{tenant_id}", f"CUIT_{cuit_consulta}", ahora.strftime("%Y-%m"))
+    os.makedirs(destino_dir, exist_ok=True)
+    return os.path.join(destino_dir, f"ddjj_meses{meses}_{ahora.strftime('%Y%m%d_%H%M%S')}.csv")
+
+
+_cache: ResultCache | None = None
+
+
+def get_result_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
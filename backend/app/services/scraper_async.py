@@ -0,0 +1,1091 @@
+import asyncio
+import csv
+import os
+import shutil
+import logging
+import time
+from datetime import datetime, timezone
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
+from app.services.browser_pool import LAUNCH_ARGS
+from app.services.ddjj_csv import clave_fila, escribir_csv, extraer_filas, leer_csv
+from app.services.multiselect import SELECCIONAR_JS, VERIFICAR_JS, caret_cache
+from app.services.nav_strategy import get_nav_strategies
+from app.services.pacing import Pacer, get_profile
+from app.services.resource_blocking import get_resource_blocker
+from app.services.screenshots import get_screenshot_buffer
+
+logger = logging.getLogger("scraper")
+
+# Tope para terminar de leer las respuestas XHR capturadas en "Ver consulta"
+CAPTURA_LECTURA_S = 10.0
+
+
+class AsyncARCAScraper:
+    """
+    Motor asyncio del flujo ARCA (playwright.async_api):
+    1. Login en auth.afip.gob.ar
+    2. Navegar a "Presentacion de DDJJ y Pagos" (SETI)
+    3. Aceptar juramento
+    4. Ir a Consulta (sidebar)
+    5. Seleccionar "Cuit del Contribuyente" (por label, NO por posicion)
+    6. Seleccionar "Presentadas en los ultimos X meses" (por label, NO por posicion)
+    7. Click "Ver consulta"
+    8. Click "EXPORTAR" -> "CSV"
+    9. Cerrar sesion
+
+    Muchas sesiones pueden correr concurrentemente en un mismo event loop.
+
+    IMPORTANTE: No se modifica "Presentada por el Usuario" ni ningun otro campo
+    que no sea los dos indicados arriba.
+    """
+
+    ARCA_LOGIN_URL = "https://auth.afip.gob.ar/contribuyente_/login.xhtml"
+    ARCA_LOGOUT_URL = "https://auth.afip.gob.ar/contribuyente_/logout.xhtml"
+    ARCA_PORTAL_URL = "https://portalcf.cloud.afip.gob.ar/portal/app/"
+
+    def __init__(self, headless=True, min_delay=1.5, max_delay=3.5, browser_timeout=30000, download_base_dir="descargas", pool=None, sesiones=None, ritmo=None, bloqueo=None, captura_red=None, base_url=None):
+        from app.config import settings
+
+        base_url = settings.ARCA_BASE_URL if base_url is None else base_url
+        if base_url:
+            # Simulador local u otro entorno: mismas rutas bajo un solo host
+            base_url = base_url.rstrip("/")
+            self.ARCA_LOGIN_URL = f"{base_url}/contribuyente_/login.xhtml"
+            self.ARCA_LOGOUT_URL = f"{base_url}/contribuyente_/logout.xhtml"
+            self.ARCA_PORTAL_URL = f"{base_url}/portal/app/"
+        self.headless = headless
+        self.captura_red = settings.SCRAPER_CAPTURA_RED if captura_red is None else captura_red
+        self.lote_filas = settings.SCRAPER_LOTE_FILAS
+        self.tabla_pantalla = settings.SCRAPER_TABLA_PANTALLA
+        self._filas_red: list[dict] | None = None
+        self.bloqueo = bloqueo if bloqueo is not None else get_resource_blocker()
+        self.pool = pool
+        self.sesiones = sesiones
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.pacer = Pacer(get_profile(ritmo), min_delay, max_delay)
+        self.nav = get_nav_strategies()
+        self._paso = "inicio"
+        self._intentos = 0
+        self._pasos_sesion: list[dict] = []
+        self._pasos_objetivo: list[dict] = []
+        self.browser_timeout = browser_timeout
+        self.download_base_dir = download_base_dir
+        self.capturas = get_screenshot_buffer(os.path.join(download_base_dir, "..", "screenshots"))
+        self.browser = None
+        self.page = None
+        self.context = None
+        self.playwright = None
+
+    async def _delay(self, min_s=None, max_s=None):
+        await self.pacer.pausa(self._paso, min_s, max_s)
+
+    async def _esperar(self, condicion, min_s=None, max_s=None):
+        """Espera una condicion del DOM en vez de la ventana fija (segun el perfil)."""
+        await self.pacer.esperar(self._paso, condicion, min_s, max_s)
+
+    def _visible(self, selector, timeout):
+        return lambda: self.page.locator(selector).first.wait_for(state="visible", timeout=timeout)
+
+    def _multiselect_listo(self):
+        return self.page.wait_for_selector("[id*='multi-select']", timeout=15000)
+
+    async def _medir(self, paso, awaitable, destino=None):
+        """Ejecuta un paso registrando inicio, fin, duracion, intentos y resultado."""
+        destino = self._pasos_objetivo if destino is None else destino
+        self._intentos = 0
+        inicio = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+        nominal0, esperado0 = self.pacer.nominal_s, self.pacer.esperado_s
+        span = {"paso": paso, "inicio": inicio, "resultado": "excepcion", "error": None}
+        try:
+            r = await awaitable
+            if r is False or (isinstance(r, dict) and not r.get("exito", True)):
+                span["resultado"] = "error"
+                span["error"] = (r.get("error") or "")[:300] if r else None
+            else:
+                span["resultado"] = "ok"
+            return r
+        except Exception as e:
+            span["error"] = str(e)[:300]
+            raise
+        finally:
+            span["duracion_ms"] = int((time.perf_counter() - t0) * 1000)
+            span["fin"] = datetime.now(timezone.utc)
+            span["intentos"] = max(1, self._intentos)
+            esperado = self.pacer.esperado_s - esperado0
+            span["esperado_ms"] = int(esperado * 1000)
+            span["ahorrado_ms"] = int((self.pacer.nominal_s - nominal0 - esperado) * 1000)
+            destino.append(span)
+
+    async def _screenshot(self, nombre):
+        await self.capturas.capturar(self.page, nombre)
+
+    async def _screenshot_fallo(self, nombre):
+        """Captura el estado del fallo y escribe a disco el buffer de capturas previas."""
+        await self.capturas.capturar(self.page, nombre)
+        await self.capturas.volcar()
+
+    async def _iniciar_browser(self, storage_state=None):
+        context_kwargs = {"viewport": {"width": 1366, "height": 768}, "accept_downloads": True}
+        if storage_state:
+            context_kwargs["storage_state"] = storage_state
+        if self.bloqueo.habilitado:
+            # Los service workers esquivan context.route
+            context_kwargs["service_workers"] = "block"
+        if self.pool is not None:
+            # Navegador persistente del pool: solo el contexto es nuevo por consulta
+            self.context = await self.pool.nuevo_contexto(**context_kwargs)
+        else:
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+            self.context = await self.browser.new_context(**context_kwargs)
+        await self.bloqueo.instalar(self.context)
+        self.page = await self.context.new_page()
+        self.page.set_default_timeout(self.browser_timeout)
+        logger.info(f"Browser iniciado (headless={self.headless}, pool={self.pool is not None})")
+
+    async def _cerrar_browser(self):
+        try:
+            if self.pool is not None:
+                if self.context:
+                    await self.pool.liberar_contexto(self.context)
+            else:
+                if self.context:
+                    await self.context.close()
+                if self.browser:
+                    await self.browser.close()
+                if self.playwright:
+                    await self.playwright.stop()
+            logger.info("Browser cerrado")
+        except Exception as e:
+            logger.warning(f"Error cerrando browser: {e}")
+        finally:
+            self.context = None
+            self.page = None
+
+    # ========== PASO 1: LOGIN ==========
+
+    async def login(self, cuit, clave_fiscal):
+        self._paso = "login"
+        logger.info(f"[LOGIN] CUIT {cuit}...")
+        await self.page.goto(self.ARCA_LOGIN_URL, wait_until=self.pacer.perfil.carga)
+        await self._esperar(self._visible("#F1\\:username", 10000))
+
+        campo_cuit = self.page.locator("#F1\\:username")
+        await campo_cuit.click()
+        await self._delay(0.3, 0.8)
+        await campo_cuit.fill(cuit)
+        await self._delay()
+
+        await self.page.locator("#F1\\:btnSiguiente").click()
+        await self._esperar(self._visible("#F1\\:password, .form-error, .error-message, .msg-error", 10000), 1.5, 3.0)
+
+        try:
+            err = self.page.locator(".form-error, .error-message, .msg-error").first
+            if await err.is_visible(timeout=2000):
+                msg = await err.text_content()
+                logger.error(f"[LOGIN] Error CUIT: {msg}")
+                await self._screenshot_fallo("login_error_cuit")
+                return {"exito": False, "error": f"Error en CUIT: {msg}"}
+        except Exception:
+            pass
+
+        try:
+            await self.page.wait_for_selector("#F1\\:password", state="visible", timeout=10000)
+        except PlaywrightTimeout:
+            await self._screenshot_fallo("login_no_password")
+            return {"exito": False, "error": "No aparecio el campo de contrasena."}
+
+        campo_pass = self.page.locator("#F1\\:password")
+        await campo_pass.click()
+        await self._delay(0.3, 0.8)
+        await campo_pass.fill(clave_fiscal)
+        await self._delay()
+
+        await self.page.locator("#F1\\:btnIngresar").click()
+        await self._esperar(self._visible("#buscadorInput, .form-error, .error-message, .msg-error, .alert-danger", 15000), 2.0, 4.0)
+
+        try:
+            await self.page.wait_for_selector("#buscadorInput", state="visible", timeout=15000)
+            logger.info("[LOGIN] OK")
+            return {"exito": True}
+        except PlaywrightTimeout:
+            try:
+                err = self.page.locator(".form-error, .error-message, .msg-error, .alert-danger").first
+                if await err.is_visible(timeout=3000):
+                    msg = (await err.text_content()).strip()
+                    await self._screenshot_fallo("login_fallido")
+                    return {"exito": False, "error": f"Login fallido: {msg}"}
+            except Exception:
+                pass
+            await self._screenshot_fallo("login_fallido")
+            return {"exito": False, "error": "Login fallido: no se pudo acceder al portal."}
+
+    async def _sesion_valida(self):
+        """Chequeo barato de una sesion cacheada: el portal carga sin pedir login."""
+        try:
+            await self.page.goto(self.ARCA_PORTAL_URL, wait_until="domcontentloaded")
+            await self.page.wait_for_selector("#buscadorInput", state="visible", timeout=8000)
+            return True
+        except Exception:
+            return False
+
+    async def _guardar_sesion(self, tenant_id, cuit_login, clave_fiscal):
+        try:
+            state = await self.context.storage_state()
+            await asyncio.to_thread(self.sesiones.guardar, tenant_id, cuit_login, clave_fiscal, state)
+        except Exception as e:
+            logger.warning(f"[SESION] No se pudo leer storage_state: {e}")
+
+    # ========== PASO 2: NAVEGAR A SETI (DDJJ) ==========
+
+    async def _esperar_seti(self, timeout=15):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            for p in self.context.pages:
+                if "seti" in p.url:
+                    self.page = p
+                    try:
+                        await p.wait_for_load_state("domcontentloaded", timeout=5000)
+                    except Exception:
+                        pass
+                    logger.info(f"[NAV] En SETI: {p.url}")
+                    return True
+            await asyncio.sleep(1)
+        return False
+
+    async def _click_y_esperar_seti(self, elemento):
+        """Click en un elemento y esperar que se abra SETI (nueva pestaña o misma)."""
+        self._intentos += 1
+        try:
+            async with self.context.expect_page(timeout=10000) as new_page_info:
+                await elemento.click()
+            new_page = await new_page_info.value
+            await new_page.wait_for_load_state("domcontentloaded", timeout=15000)
+            if "seti" in new_page.url:
+                self.page = new_page
+                self.page.set_default_timeout(self.browser_timeout)
+                logger.info(f"[NAV] En SETI (nueva pestana): {self.page.url}")
+                return True
+        except Exception:
+            if await self._esperar_seti(timeout=8):
+                return True
+        return False
+
+    # Variantes de cada estrategia, en el orden por defecto (sin datos aprendidos)
+    NAV_ACCESOS = ["Presentación de DDJJ y Pagos", "Presentacion de DDJJ y Pagos", "DDJJ y Pagos"]
+    # Buscar "Presentacion de DDJJ" para obtener el resultado correcto
+    # (buscar solo "DDJJ" retorna otros servicios como "DDJJ Ley 17.250")
+    NAV_BUSQUEDAS = ["Presentacion de DDJJ", "DDJJ y Pagos"]
+    NAV_LINKS_SERVICIOS = [
+        "a:has-text('DDJJ y Pagos')",
+        "a:has-text('Presentación de DDJJ')",
+        "a:has-text('Presentacion de DDJJ')",
+    ]
+
+    async def _nav_seti_directo(self, url):
+        """Entrada directa a SETI con la URL aprendida; si no queda en SETI vuelve al portal."""
+        self._intentos += 1
+        try:
+            await self.page.goto(url, wait_until="domcontentloaded", timeout=15000)
+            if "seti" in self.page.url:
+                await self.page.locator("button:has-text('Aceptar'), a:has-text('Consulta')").first.wait_for(
+                    state="visible", timeout=8000
+                )
+                logger.info(f"[NAV] En SETI (acceso directo): {self.page.url}")
+                return True
+        except Exception as e:
+            logger.info(f"[NAV] Acceso directo a SETI fallo: {e}")
+        try:
+            await self.page.goto(self.ARCA_PORTAL_URL, wait_until="domcontentloaded")
+        except Exception as e:
+            # Las estrategias siguientes parten de donde quedo la pagina
+            logger.info(f"[NAV] Volver al portal fallo: {e}")
+        return False
+
+    async def _nav_acceso(self, texto_buscar):
+        """Acceso directo en "Servicios | Mas utilizados"."""
+        try:
+            acceso = self.page.locator(f"text={texto_buscar}").first
+            if await acceso.is_visible(timeout=3000):
+                logger.info(f"[NAV] Click acceso directo: '{texto_buscar}'...")
+                return await self._click_y_esperar_seti(acceso)
+        except Exception as e:
+            logger.info(f"[NAV] Acceso directo '{texto_buscar}' fallo: {e}")
+        return False
+
+    async def _nav_buscador(self, termino_busqueda):
+        """Buscador typeahead del portal."""
+        try:
+            buscador = self.page.locator("#buscadorInput")
+            if not await buscador.is_visible(timeout=3000):
+                buscador = self.page.locator("input[placeholder*='necesit'], input[placeholder*='Busc']").first
+            await buscador.click()
+            await self._delay(0.3, 0.5)
+            await buscador.fill("")
+            await self._delay(0.2, 0.4)
+            await buscador.fill(termino_busqueda)
+            await self._esperar(self._visible("[id*='rbt-menu-item']", 5000), 2.0, 3.0)
+            await self._screenshot("buscador")
+
+            # Recorrer TODOS los resultados, no solo el primero
+            resultados = self.page.locator("[id*='rbt-menu-item']")
+            count = await resultados.count()
+            logger.info(f"[NAV] Buscador '{termino_busqueda}': {count} resultados")
+
+            for i in range(min(count, 5)):
+                texto = (await resultados.nth(i).text_content())[:120]
+                logger.info(f"[NAV]   Resultado {i}: {texto}")
+                # Solo clickear si contiene "resentaci" (Presentación/Presentacion)
+                # y "Pagos" para asegurar que es el servicio SETI correcto
+                if "resentaci" in texto and "agos" in texto:
+                    logger.info(f"[NAV] Clickeando resultado {i}...")
+                    return await self._click_y_esperar_seti(resultados.nth(i))
+        except Exception as e:
+            logger.warning(f"[NAV] Buscador '{termino_busqueda}' fallo: {e}")
+        return False
+
+    async def _nav_servicios(self, selector):
+        """Scroll y link con texto especifico en la lista de servicios."""
+        try:
+            await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await self._delay(0.3, 0.6)
+            link = self.page.locator(selector).first
+            if await link.is_visible(timeout=2000):
+                return await self._click_y_esperar_seti(link)
+        except Exception:
+            pass
+        return False
+
+    async def navegar_a_ddjj(self):
+        self._paso = "navegar_a_ddjj"
+        logger.info("[NAV] Buscando servicio DDJJ...")
+        await self._screenshot("portal")
+
+        estrategias = {}
+        if self.nav.url_seti:
+            estrategias["seti_directo"] = lambda: self._nav_seti_directo(self.nav.url_seti)
+        for texto in self.NAV_ACCESOS:
+            estrategias[f"acceso:{texto}"] = lambda t=texto: self._nav_acceso(t)
+        for termino in self.NAV_BUSQUEDAS:
+            estrategias[f"buscador:{termino}"] = lambda t=termino: self._nav_buscador(t)
+        for selector in self.NAV_LINKS_SERVICIOS:
+            estrategias[f"servicios:{selector}"] = lambda s=selector: self._nav_servicios(s)
+
+        loop = asyncio.get_running_loop()
+        for nombre in self.nav.orden(list(estrategias)):
+            inicio = loop.time()
+            exito = await estrategias[nombre]()
+            self.nav.registrar(nombre, exito, loop.time() - inicio, url_seti=self.page.url if exito else None)
+            if exito:
+                logger.info(f"[NAV] Estrategia '{nombre}' OK en {loop.time() - inicio:.1f}s")
+                return {"exito": True, "estrategia": nombre}
+
+        await self._screenshot_fallo("nav_fallido")
+        return {"exito": False, "error": "No se pudo navegar a 'Presentacion de DDJJ y Pagos'."}
+
+    # ========== PASO 3: JURAMENTO ==========
+
+    async def aceptar_juramento(self):
+        self._paso = "aceptar_juramento"
+        logger.info("[JURAMENTO] Verificando...")
+        if self.pacer.perfil.por_eventos:
+            # SETI listo: aparece el juramento o ya esta el menu de Consulta
+            await self._esperar(self._visible("button:has-text('Aceptar'), a:has-text('Consulta')", 10000), 2.0, 3.0)
+        else:
+            await self._delay(2.0, 3.0)
+            try:
+                await self.page.wait_for_load_state("networkidle", timeout=10000)
+            except Exception:
+                pass
+
+        try:
+            btn = self.page.locator("button:has-text('Aceptar')").first
+            if await btn.is_visible(timeout=5000):
+                logger.info("[JURAMENTO] Aceptando...")
+                await btn.click()
+                await self._esperar(lambda: btn.wait_for(state="hidden", timeout=10000), 2.0, 3.0)
+                logger.info(f"[JURAMENTO] OK. URL: {self.page.url}")
+        except Exception:
+            logger.info("[JURAMENTO] No hay juramento, continuando...")
+
+        await self._screenshot("post_juramento")
+        return {"exito": True}
+
+    # ========== PASO 4: IR A CONSULTA ==========
+
+    async def ir_a_consulta(self):
+        self._paso = "ir_a_consulta"
+        logger.info("[CONSULTA] Navegando a Consulta via sidebar...")
+        await self._delay(1.0, 2.0)
+
+        try:
+            sidebar_consulta = self.page.locator("a:has-text('Consulta')").first
+            if await sidebar_consulta.is_visible(timeout=5000):
+                await sidebar_consulta.click()
+                await self._esperar(self._multiselect_listo, 2.0, 3.0)
+                logger.info(f"[CONSULTA] URL: {self.page.url}")
+        except Exception:
+            await self.page.evaluate("window.location.hash = '#/presentacion/consulta'")
+            await self._esperar(self._multiselect_listo, 2.0, 3.0)
+
+        try:
+            await self.page.wait_for_selector("[id*='multi-select']", timeout=15000)
+            logger.info("[CONSULTA] Componentes cargados")
+        except PlaywrightTimeout:
+            logger.warning("[CONSULTA] Timeout esperando componentes")
+
+        await self._screenshot("consulta_page")
+        return {"exito": True}
+
+    # ========== PASO 5: SELECCIONAR CUIT DEL CONTRIBUYENTE ==========
+
+    async def _seleccionar_opcion(self, campo, valor):
+        """Resuelve, abre y selecciona en un multi-select de SETI en un solo round trip."""
+        r = await self.page.evaluate(SELECCIONAR_JS, {
+            "campo": campo,
+            "valor": valor,
+            "candidatos": caret_cache.candidatos(campo),
+            "timeoutMs": 5000,
+        })
+        caret_cache.registrar(campo, r)
+        logger.info(
+            f"[{campo.upper()}] caret={r.get('caretId')} (cache {'hit' if r.get('cacheHit') else 'miss'}), "
+            f"opciones={r.get('opciones')}"
+        )
+        if r["ok"] and not r["yaSeleccionada"]:
+            verificar = {"caretId": r["caretId"], "opcionId": r["opcionId"], "valor": valor}
+            r["verificada"] = await self.page.evaluate(VERIFICAR_JS, verificar)
+            if not r["verificada"]:
+                logger.info(f"[{campo.upper()}] El evento sintetico no selecciono {r['opcionId']}, click con Playwright")
+                r["verificada"] = await self._click_opcion(campo, verificar)
+        return r
+
+    async def _click_opcion(self, campo, verificar):
+        """Seleccion con click(force=True) de Playwright sobre la opcion; True si quedo confirmada."""
+        opcion = self.page.locator(f"[id='{verificar['opcionId']}']")
+        try:
+            if not await opcion.count():
+                await self.page.locator(f"[id='{verificar['caretId']}']").click()
+                await opcion.first.wait_for(state="attached", timeout=5000)
+            # Puede haber tomado al reabrir (p. ej. multi-select que marca al cerrar)
+            if not await self.page.evaluate(VERIFICAR_JS, verificar):
+                await opcion.first.click(force=True)
+                await self._delay(0.8, 1.5)
+            return await self.page.evaluate(VERIFICAR_JS, verificar)
+        except Exception as e:
+            logger.warning(f"[{campo.upper()}] Click force fallo: {e}")
+            return False
+
+    async def seleccionar_cuit(self, cuit_consulta):
+        self._paso = "seleccionar_cuit"
+        logger.info(f"[CUIT] Seleccionando: {cuit_consulta}...")
+        await self._delay(1.0, 2.0)
+
+        try:
+            r = await self._seleccionar_opcion("cuit", cuit_consulta)
+            if not r["ok"]:
+                if r["motivo"] == "sin_label":
+                    await self._screenshot_fallo("cuit_no_label")
+                    return {"exito": False, "error": "No se encontro el campo 'Cuit del Contribuyente'."}
+                if r["motivo"] == "sin_opciones":
+                    await self._screenshot_fallo("cuit_sin_opciones")
+                    return {"exito": False, "error": "El selector de CUIT no mostro opciones."}
+                await self._screenshot_fallo("cuit_not_found")
+                return {"exito": False, "error": f"CUIT {cuit_consulta} no encontrado. Opciones: {r.get('opciones', [])}"}
+
+            if r["yaSeleccionada"]:
+                logger.info(f"[CUIT] {cuit_consulta} ya esta seleccionado")
+            elif not r["verificada"]:
+                logger.warning(f"[CUIT] Click en {r['opcionId']} sin confirmacion de seleccion")
+            await self._delay(0.5, 1.0)
+
+            await self._screenshot("cuit_ok")
+            logger.info(f"[CUIT] Seleccion de {cuit_consulta} completada")
+            return {"exito": True}
+
+        except Exception as e:
+            await self._screenshot_fallo("cuit_error")
+            return {"exito": False, "error": f"Error seleccionando CUIT: {str(e)}"}
+
+    # ========== PASO 6: SELECCIONAR MESES ==========
+
+    async def seleccionar_meses(self, meses):
+        self._paso = "seleccionar_meses"
+        logger.info(f"[MESES] Seleccionando: ultimos {meses} meses...")
+        await self._delay(0.5, 1.0)
+        meses_str = str(meses)
+
+        try:
+            await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await self._delay(0.3, 0.6)
+
+            r = await self._seleccionar_opcion("meses", meses_str)
+            if not r["ok"]:
+                if r["motivo"] == "sin_label":
+                    await self._screenshot_fallo("meses_no_label")
+                    return {"exito": False, "error": "No se encontro el campo 'Presentadas en los ultimos X meses'."}
+                if r["motivo"] == "sin_opciones":
+                    await self._screenshot_fallo("meses_sin_opciones")
+                    return {"exito": False, "error": "El selector de meses no mostro opciones."}
+                await self._screenshot_fallo("meses_not_found")
+                return {"exito": False, "error": f"Valor '{meses_str}' no encontrado. Validos: {r.get('opciones') or '1, 2, 3, 6, 12'}."}
+
+            if not r["yaSeleccionada"] and not r["verificada"]:
+                logger.warning(f"[MESES] Click en {r['opcionId']} sin confirmacion de seleccion")
+            await self._delay(0.5, 1.0)
+
+            await self._screenshot("meses_ok")
+            logger.info(f"[MESES] Seleccion de '{meses_str}' completada")
+            return {"exito": True}
+
+        except Exception as e:
+            await self._screenshot_fallo("meses_error")
+            return {"exito": False, "error": f"Error seleccionando meses: {str(e)}"}
+
+    # ========== PASO 7: VER CONSULTA ==========
+
+    async def ver_consulta(self):
+        self._paso = "ver_consulta"
+        logger.info("[VER] Buscando boton 'Ver consulta'...")
+        await self._delay(0.5, 1.0)
+
+        try:
+            try:
+                modal_btn = self.page.locator("button:has-text('Aceptar')").first
+                if await modal_btn.is_visible(timeout=1000):
+                    await modal_btn.click()
+                    await self._delay(1.0, 2.0)
+            except Exception:
+                pass
+
+            await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await self._delay(0.5, 1.0)
+
+            btn = self.page.locator("button:has-text('Ver consulta')").first
+            await btn.scroll_into_view_if_needed()
+            await self._delay(0.3, 0.5)
+            self._filas_red = None
+            lecturas: list[asyncio.Future] = []
+
+            def capturar(response):
+                lecturas.append(asyncio.ensure_future(self._capturar_respuesta(response)))
+
+            if self.captura_red:
+                self.page.on("response", capturar)
+            try:
+                await btn.click()
+                await self._esperar(
+                    self._visible("button:has-text('EXPORTAR'), div:has-text('Debe seleccionar'), text=No se encontraron", 25000),
+                    3.0, 5.0,
+                )
+            finally:
+                if self.captura_red:
+                    self.page.remove_listener("response", capturar)
+                # Las respuestas llegadas antes del resultado se terminan de leer siempre,
+                # asi usar o no la captura no depende de que JSON o DOM llegue primero
+                if lecturas:
+                    await asyncio.wait(lecturas, timeout=CAPTURA_LECTURA_S)
+
+            if self._filas_red:
+                logger.info(f"[VER] Resultados capturados de la respuesta XHR ({len(self._filas_red)} filas, total declarado)")
+
+            try:
+                modal_err = self.page.locator("div:has-text('Debe seleccionar')").first
+                if await modal_err.is_visible(timeout=2000):
+                    msg = (await modal_err.text_content()).strip()[:100]
+                    logger.error(f"[VER] Modal de error: {msg}")
+                    await self._screenshot_fallo("ver_modal_error")
+                    try:
+                        await self.page.locator("button:has-text('Aceptar')").first.click()
+                    except Exception:
+                        pass
+                    return {"exito": False, "error": f"Error en consulta: {msg}"}
+            except Exception:
+                pass
+
+            await self.page.locator("button:has-text('EXPORTAR')").first.wait_for(
+                state="visible", timeout=25000
+            )
+            await self._screenshot("resultados")
+            logger.info("[VER] Resultados cargados")
+            return {"exito": True}
+
+        except PlaywrightTimeout:
+            await self._screenshot_fallo("ver_timeout")
+            try:
+                no_results = self.page.locator("text=No se encontraron").first
+                if await no_results.is_visible(timeout=2000):
+                    return {"exito": False, "error": "No se encontraron DDJJ para los filtros seleccionados."}
+            except Exception:
+                pass
+            return {"exito": False, "error": "Timeout esperando resultados."}
+
+    async def _capturar_respuesta(self, response):
+        """Guarda las filas de la primera respuesta JSON de SETI con forma de consulta."""
+        if self._filas_red or response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if "json" not in response.headers.get("content-type", ""):
+            return
+        try:
+            filas = extraer_filas(await response.json())
+        except Exception:
+            return
+        if filas:
+            self._filas_red = filas
+
+    def _destino_csv(self, cuit_consulta, meses, tenant_id=None) -> str:
+        # Organize by tenant
+        fecha = datetime.now().strftime("%Y-%m")
+        if tenant_id:
+            destino_dir = os.path.join(self.download_base_dir, f"tenant_{tenant_id}", f"CUIT_{cuit_consulta}", fecha)
+        else:
+            destino_dir = os.path.join(self.download_base_dir, f"CUIT_{cuit_consulta}", fecha)
+        os.makedirs(destino_dir, exist_ok=True)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(destino_dir, f"ddjj_meses{meses}_{timestamp}.csv")
+
+    async def guardar_csv_capturado(self, filas, cuit_consulta, meses, tenant_id=None):
+        """Genera el CSV del lado del servidor con las filas capturadas (sin descarga)."""
+        self._paso = "exportar_csv"
+        destino = self._destino_csv(cuit_consulta, meses, tenant_id)
+        tamano = await asyncio.to_thread(escribir_csv, filas, destino)
+        ruta_relativa = os.path.relpath(destino, self.download_base_dir)
+        logger.info(f"[EXPORTAR] CSV generado desde la respuesta: {ruta_relativa} ({tamano} bytes)")
+        return {"exito": True, "archivo": ruta_relativa, "bytes": tamano}
+
+    # ========== PASO 8: EXPORTAR CSV ==========
+
+    async def exportar_csv(self, cuit_consulta, meses, tenant_id=None):
+        self._paso = "exportar_csv"
+        logger.info("[EXPORTAR] Exportando CSV...")
+        await self._delay(0.5, 1.0)
+
+        try:
+            btn_exportar = self.page.locator("button:has-text('EXPORTAR')").first
+            if not await btn_exportar.is_visible(timeout=5000):
+                await self._screenshot_fallo("no_exportar")
+                return {"exito": False, "error": "No hay boton EXPORTAR."}
+
+            await btn_exportar.click()
+            await self._esperar(self._visible("a:has-text('CSV'), span:has-text('CSV')", 5000), 0.8, 1.5)
+
+            async with self.page.expect_download(timeout=30000) as download_info:
+                csv_link = self.page.locator("a:has-text('CSV'), span:has-text('CSV')").first
+                await csv_link.click()
+
+            download = await download_info.value
+            logger.info(f"[EXPORTAR] Archivo: {download.suggested_filename}")
+
+            download_dir = os.path.join(self.download_base_dir, f"CUIT_{cuit_consulta}", "_temp")
+            os.makedirs(download_dir, exist_ok=True)
+            temp_path = os.path.join(download_dir, download.suggested_filename or "ddjj.csv")
+            await download.save_as(temp_path)
+            await self._delay(0.5, 1.0)
+
+            destino = self._destino_csv(cuit_consulta, meses, tenant_id)
+            await asyncio.to_thread(shutil.move, temp_path, destino)
+
+            try:
+                os.rmdir(download_dir)
+            except OSError:
+                pass
+
+            ruta_relativa = os.path.relpath(destino, self.download_base_dir)
+            logger.info(f"[EXPORTAR] Guardado: {ruta_relativa}")
+            return {"exito": True, "archivo": ruta_relativa, "bytes": os.path.getsize(destino)}
+
+        except PlaywrightTimeout:
+            await self._screenshot_fallo("exportar_timeout")
+            return {"exito": False, "error": "Timeout al exportar CSV."}
+        except Exception as e:
+            await self._screenshot_fallo("exportar_error")
+            return {"exito": False, "error": f"Error exportando CSV: {str(e)}"}
+
+    # ========== PASO 9: CERRAR SESION ==========
+
+    async def cerrar_sesion(self):
+        self._paso = "cerrar_sesion"
+        logger.info("[LOGOUT] Cerrando sesion...")
+        try:
+            dropdown = self.page.locator("div.dropdown span").last
+            if await dropdown.is_visible(timeout=3000):
+                await dropdown.click()
+                await self._delay(0.5, 1.0)
+                btn_si = self.page.locator("button:has-text('Si')").first
+                if await btn_si.is_visible(timeout=3000):
+                    await btn_si.click()
+                    await self._delay(1.0, 2.0)
+                    logger.info("[LOGOUT] OK")
+                    return
+        except Exception:
+            pass
+
+        try:
+            await self.page.goto(self.ARCA_LOGOUT_URL, timeout=10000)
+            await self._delay(1.0, 2.0)
+            logger.info("[LOGOUT] OK (redirect)")
+        except Exception as e:
+            logger.warning(f"[LOGOUT] Error: {e}")
+
+    # ========== EXTRAER DATOS DE TABLA ==========
+
+    FILAS_JS = """() => {
+        const tables = document.querySelectorAll('table');
+        if (tables.length === 0) return [];
+        // Use the last table (results table)
+        const table = tables[tables.length - 1];
+        const rows = table.querySelectorAll('tbody tr');
+        const result = [];
+        for (const row of rows) {
+            const cells = row.querySelectorAll('td');
+            if (cells.length >= 6) {
+                result.push({
+                    estado: (cells[0] && cells[0].textContent || '').trim(),
+                    cuit_cuil: (cells[1] && cells[1].textContent || '').trim(),
+                    formulario: (cells[2] && cells[2].textContent || '').trim(),
+                    periodo: (cells[3] && cells[3].textContent || '').trim(),
+                    transaccion: (cells[4] && cells[4].textContent || '').trim(),
+                    fecha_presentacion: (cells[5] && cells[5].textContent || '').trim(),
+                });
+            }
+        }
+        return result;
+    }"""
+    # Boton "pagina siguiente" habilitado del paginador de resultados
+    PAGINA_SIGUIENTE = (
+        "li.page-item:not(.disabled) > a[aria-label='Next'], "
+        "li.next:not(.disabled) > a, "
+        "button[aria-label='Next']:not([disabled])"
+    )
+
+    # Huella de la pagina visible: numero de pagina activa del paginador (si lo
+    # marca) y el texto completo de la primera fila. Cambia al cargar otra pagina
+    # aunque alguna celda venga vacia o se repita entre paginas.
+    HUELLA_JS = """() => {
+        const tables = document.querySelectorAll('table');
+        const tabla = tables.length ? tables[tables.length - 1] : null;
+        const fila = tabla && tabla.querySelector('tbody tr');
+        const activa = document.querySelector(
+            ".pagination .active, .pagination [aria-current='page'], li.page-item.active"
+        );
+        return (activa ? activa.textContent.trim() : '') + '#' +
+            (fila ? Array.from(fila.querySelectorAll('td'), (c) => c.textContent.trim()).join('|') : '');
+    }"""
+
+    async def iterar_tabla(self, tamano_lote=500, max_paginas=200):
+        """
+        Recorre la tabla de resultados pagina por pagina y entrega las filas en
+        lotes de hasta tamano_lote, sin acumular el resultado completo.
+        """
+        self._paso = "extraer_tabla"
+        logger.info("[TABLA] Extrayendo datos de la tabla de resultados...")
+        table = self.page.locator("table").last
+        if not await table.is_visible(timeout=5000):
+            logger.warning("[TABLA] No se encontro tabla visible")
+            return
+
+        lote: list[dict] = []
+        total = 0
+        for pagina in range(1, max_paginas + 1):
+            filas = await self.page.evaluate(self.FILAS_JS)
+            total += len(filas)
+            for r in filas:
+                logger.debug(f"  {r['estado']} | {r['cuit_cuil']} | {r['formulario']} | {r['periodo']}")
+            lote.extend(filas)
+            while len(lote) >= tamano_lote:
+                yield lote[:tamano_lote]
+                lote = lote[tamano_lote:]
+
+            siguiente = self.page.locator(self.PAGINA_SIGUIENTE).first
+            if not filas or not await siguiente.is_visible():
+                break
+            huella = await self.page.evaluate(self.HUELLA_JS)
+            await siguiente.click()
+            try:
+                # La pagina cambio cuando cambia la huella (pagina activa o primera fila)
+                await self.page.wait_for_function(
+                    f"(previa) => ({self.HUELLA_JS})() !== previa",
+                    arg=huella,
+                    timeout=10000,
+                )
+            except PlaywrightTimeout:
+                logger.warning(f"[TABLA] La pagina {pagina + 1} no cargo, se corta la paginacion")
+                break
+        if lote:
+            yield lote
+        logger.info(f"[TABLA] Extraidos {total} registros")
+
+    async def extraer_tabla(self):
+        """Extrae los datos de la tabla de resultados visible en pantalla (todas las paginas)."""
+        filas = []
+        try:
+            async for lote in self.iterar_tabla():
+                filas.extend(lote)
+        except Exception as e:
+            logger.warning(f"[TABLA] Error extrayendo datos: {e}")
+        return filas
+
+    async def _entregar_tabla(self, al_filas, tamano_lote):
+        """Entrega las filas de la tabla a al_filas(lote) por lotes. Devuelve la cantidad."""
+        total = 0
+        try:
+            async for lote in self.iterar_tabla(tamano_lote):
+                await al_filas(lote)
+                total += len(lote)
+        except Exception as e:
+            logger.warning(f"[TABLA] Error extrayendo datos: {e}")
+        return total
+
+    async def _entregar_csv(self, archivo, al_filas, tamano_lote):
+        """
+        Lee el CSV exportado por lotes y los entrega a al_filas(lote).
+        Devuelve {"exito", "filas"} o {"exito": False, "error"} si el CSV no se
+        pudo interpretar (el span del paso queda como error).
+        """
+        lotes = leer_csv(os.path.join(self.download_base_dir, archivo), tamano_lote)
+        total = 0
+        try:
+            while (lote := await asyncio.to_thread(next, lotes, None)) is not None:
+                await al_filas(lote)
+                total += len(lote)
+        except (OSError, ValueError, csv.Error) as e:
+            logger.warning(f"[CSV] No se pudo leer {archivo}: {e}")
+            return {"exito": False, "error": f"CSV no interpretable: {e}"}
+        finally:
+            lotes.close()
+        logger.info(f"[CSV] Leidos {total} registros de {archivo}")
+        return {"exito": True, "filas": total}
+
+    # ========== FLUJO COMPLETO ==========
+
+    async def _reiniciar_formulario(self):
+        """Vuelve al formulario de Consulta limpio entre objetivos de una misma sesion."""
+        self._paso = "reiniciar_formulario"
+        logger.info("[SESION] Reiniciando formulario de consulta...")
+        await self.page.reload(wait_until="domcontentloaded")
+        try:
+            # El juramento puede reaparecer tras recargar SETI
+            btn = self.page.locator("button:has-text('Aceptar')").first
+            if await btn.is_visible(timeout=3000):
+                await btn.click()
+                await self._delay(1.0, 2.0)
+        except Exception:
+            pass
+        return await self.ir_a_consulta()
+
+    async def _consultar_objetivo(self, cuit_consulta, periodo, tenant_id=None, al_filas=None):
+        """
+        Pasos 5-8 para un CUIT representado, con la sesion ya en el formulario de Consulta.
+        Con al_filas(lote) las filas se entregan por lotes y no quedan en el resultado.
+        """
+        r = await self._medir("seleccionar_cuit", self.seleccionar_cuit(cuit_consulta))
+        if not r["exito"]:
+            return r
+
+        r = await self._medir("seleccionar_meses", self.seleccionar_meses(periodo))
+        if not r["exito"]:
+            return r
+
+        r = await self._medir("ver_consulta", self.ver_consulta())
+        if not r["exito"]:
+            return r
+
+        # El CSV es la fuente de verdad: el exportado por ARCA, o el generado en el
+        # servidor con las filas capturadas del XHR (solo si declaran su total).
+        # La tabla en pantalla se recorre antes (tabla_pantalla="siempre") o solo si
+        # el CSV no sirve ("respaldo"). Las filas se concilian por clave_fila y se
+        # entrega la union sin duplicados.
+        tabla_datos = []
+        vistas = set()
+        claves = {"pantalla": set(), "csv": set()}
+
+        def entregar(origen):
+            async def _entregar(lote):
+                nuevas = []
+                for fila in lote:
+                    clave = clave_fila(fila)
+                    claves[origen].add(clave)
+                    if clave not in vistas:
+                        vistas.add(clave)
+                        nuevas.append(fila)
+                if not nuevas:
+                    return
+                if al_filas is None:
+                    tabla_datos.extend(nuevas)
+                else:
+                    await al_filas(nuevas)
+            return _entregar
+
+        if self.tabla_pantalla == "siempre":
+            await self._medir("extraer_tabla", self._entregar_tabla(entregar("pantalla"), self.lote_filas))
+
+        r = None
+        capturadas, self._filas_red = self._filas_red, None
+        if capturadas:
+            try:
+                r = await self._medir("exportar_csv", self.guardar_csv_capturado(capturadas, cuit_consulta, periodo, tenant_id=tenant_id))
+            except Exception as e:
+                logger.warning(f"[EXPORTAR] No se pudo generar el CSV capturado ({e}), exportando desde ARCA")
+            else:
+                r["origen_datos"] = "red"
+                for i in range(0, len(capturadas), self.lote_filas):
+                    await entregar("csv")(capturadas[i:i + self.lote_filas])
+
+        if r is None:
+            r = await self._medir("exportar_csv", self.exportar_csv(cuit_consulta, periodo, tenant_id=tenant_id))
+            if r["exito"]:
+                await self._medir("leer_csv", self._entregar_csv(r["archivo"], entregar("csv"), self.lote_filas))
+
+        if r["exito"]:
+            if not claves["csv"] and self.tabla_pantalla != "siempre":
+                await self._medir("extraer_tabla", self._entregar_tabla(entregar("pantalla"), self.lote_filas))
+            r["conciliacion"] = {
+                "pantalla": len(claves["pantalla"]),
+                "csv": len(claves["csv"]),
+                "solo_pantalla": len(claves["pantalla"] - claves["csv"]),
+                "solo_csv": len(claves["csv"] - claves["pantalla"]),
+            }
+            logger.info(f"[CSV] Conciliacion ({r.get('origen_datos', 'export')}): {r['conciliacion']}")
+
+        if al_filas is None:
+            r["tabla_datos"] = tabla_datos
+        else:
+            r["filas"] = len(vistas)
+        return r
+
+    async def ejecutar_sesion(self, cuit_login, clave_fiscal, objetivos, tenant_id=None, al_terminar=None, al_filas=None):
+        """
+        Un solo login para varios CUIT representados.
+
+        objetivos: lista de dicts con "cuit_consulta" y "periodo" (se devuelven
+        tal cual al callback). al_terminar(objetivo, resultado) es un callback
+        async que se llama apenas termina cada objetivo. Con al_filas(objetivo, lote)
+        las filas extraidas se entregan por lotes en vez de ir en tabla_datos.
+        Devuelve la lista de resultados en el mismo orden que objetivos.
+        """
+        logger.info(f"{'='*60}")
+        logger.info(f"INICIO SESION: Login={cuit_login}, Objetivos={len(objetivos)}, Ritmo={self.pacer.perfil.nombre}")
+        logger.info(f"{'='*60}")
+
+        resultados = []
+
+        async def registrar(objetivo, r):
+            r["ritmo"] = self.pacer.perfil.nombre
+            # Como los pasos: lo de login y navegacion se imputa a la primera consulta
+            r["recursos"] = self.bloqueo.parcial()
+            if not r["exito"]:
+                await self.capturas.volcar()
+            # Los pasos de sesion (login, navegacion) se imputan a la primera consulta
+            r["pasos"] = [dict(p, compartido=True) for p in self._pasos_sesion] + self._pasos_objetivo
+            self._pasos_sesion = []
+            self._pasos_objetivo = []
+            resultados.append(r)
+            logger.info(
+                f"FIN {objetivo['cuit_consulta']} ({len(resultados)}/{len(objetivos)}): "
+                f"{'EXITOSO' if r['exito'] else 'ERROR - ' + r.get('error', '')}"
+            )
+            if al_terminar is not None:
+                await al_terminar(objetivo, r)
+
+        async def fallar_restantes(r):
+            for objetivo in objetivos[len(resultados):]:
+                await registrar(objetivo, dict(r))
+
+        cache = self.sesiones if self.sesiones is not None and self.sesiones.habilitada else None
+        logueado = False
+        desde_cache = False
+        try:
+            state = await asyncio.to_thread(cache.obtener, tenant_id, cuit_login, clave_fiscal) if cache else None
+            await self._iniciar_browser(storage_state=state)
+
+            if state and await self._medir("sesion_cacheada", self._sesion_valida(), self._pasos_sesion):
+                logger.info("[SESION] Sesion cacheada vigente, se omite el login")
+                desde_cache = True
+            else:
+                if state:
+                    logger.info("[SESION] Sesion cacheada expirada, login completo")
+                    await asyncio.to_thread(cache.invalidar, tenant_id, cuit_login)
+                    await self.context.clear_cookies()
+                r = await self._medir("login", self.login(cuit_login, clave_fiscal), self._pasos_sesion)
+                if not r["exito"]:
+                    await fallar_restantes(r)
+                    return resultados
+                if cache:
+                    await self._guardar_sesion(tenant_id, cuit_login, clave_fiscal)
+            logueado = True
+
+            for paso in (self.navegar_a_ddjj, self.aceptar_juramento, self.ir_a_consulta):
+                r = await self._medir(paso.__name__, paso(), self._pasos_sesion)
+                if not r["exito"]:
+                    if desde_cache:
+                        # Puede ser la sesion reutilizada: que el reintento haga login completo
+                        await asyncio.to_thread(cache.invalidar, tenant_id, cuit_login)
+                        cache = None
+                    await fallar_restantes(r)
+                    return resultados
+
+            for i, objetivo in enumerate(objetivos):
+                self._pasos_objetivo = []
+                if i > 0:
+                    r = await self._medir("reiniciar_formulario", self._reiniciar_formulario())
+                    if not r["exito"]:
+                        await fallar_restantes(r)
+                        return resultados
+                logger.info(f"[SESION] Objetivo {i + 1}/{len(objetivos)}: {objetivo['cuit_consulta']}, Meses={objetivo['periodo']}")
+                try:
+                    r = await self._consultar_objetivo(
+                        objetivo["cuit_consulta"], objetivo["periodo"], tenant_id=tenant_id,
+                        al_filas=(lambda lote, o=objetivo: al_filas(o, lote)) if al_filas else None,
+                    )
+                except Exception as e:
+                    logger.error(f"Error inesperado en {objetivo['cuit_consulta']}: {e}", exc_info=True)
+                    await self._screenshot_fallo("error_inesperado")
+                    r = {"exito": False, "error": f"Error inesperado: {str(e)}"}
+                await registrar(objetivo, r)
+
+            return resultados
+
+        except Exception as e:
+            logger.error(f"Error inesperado: {e}", exc_info=True)
+            await self._screenshot_fallo("error_inesperado")
+            await fallar_restantes({"exito": False, "error": f"Error inesperado: {str(e)}"})
+            return resultados
+        finally:
+            if logueado and self.page is not None:
+                if cache:
+                    # Sin logout: la sesion queda viva para reutilizarla hasta el TTL
+                    await self._guardar_sesion(tenant_id, cuit_login, clave_fiscal)
+                else:
+                    await self.cerrar_sesion()
+            await self._cerrar_browser()
+            self._log_ritmo()
+            s = self.bloqueo.stats()
+            logger.info(
+                f"[RECURSOS] {s['bloqueadas']} bloqueadas (~{s['bytes_bloqueados'] // 1024} KB, "
+                f"{s['sin_tamano']} sin tamano conocido), "
+                f"{s['permitidas']} permitidas, {s['bytes_recibidos'] // 1024} KB recibidos"
+            )
+
+    def _log_ritmo(self):
+        resumen = self.pacer.resumen()
+        if not resumen:
+            return
+        esperado = sum(p["esperado_s"] for p in resumen.values())
+        ahorrado = sum(p["ahorrado_s"] for p in resumen.values())
+        logger.info(f"[RITMO] {self.pacer.perfil.nombre}: {esperado:.1f}s en esperas, {ahorrado:.1f}s ahorrados vs cautious")
+        for paso, p in resumen.items():
+            logger.info(f"[RITMO]   {paso}: {p['esperas']} esperas, {p['esperado_s']}s (nominal {p['nominal_s']}s)")
+
+    async def ejecutar_consulta(self, cuit_login, clave_fiscal, cuit_consulta, periodo, tenant_id=None):
+        resultados = await self.ejecutar_sesion(
+            cuit_login,
+            clave_fiscal,
+            [{"cuit_consulta": cuit_consulta, "periodo": periodo}],
+            tenant_id=tenant_id,
+        )
+        return resultados[0]
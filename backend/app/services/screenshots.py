@@ -0,0 +1,121 @@
+"""
+Politica de screenshots del scraper.
+
+Modos (SCREENSHOT_MODE):
+- "ring" (default): JPEG del viewport en un buffer circular en memoria; solo
+  se escriben a disco (en un thread) cuando un paso falla.
+- "debug": PNG de pagina completa escrito en cada captura (comportamiento original).
+- "off": sin capturas.
+
+limpiar_directorio() mantiene acotado el directorio de screenshots (por
+cantidad y antiguedad); se ejecuta como mucho cada SWEEP_INTERVAL segundos.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger("scraper")
+
+SWEEP_INTERVAL = 600
+_ultimo_barrido = 0.0
+
+
+def limpiar_directorio(directorio: str, max_archivos: int, max_edad_s: float) -> int:
+    """Borra los screenshots vencidos y los mas viejos por encima del tope. Devuelve cuantos borro."""
+    try:
+        rutas = [os.path.join(directorio, n) for n in os.listdir(directorio)]
+    except OSError:
+        return 0
+    archivos = []
+    for ruta in rutas:
+        try:
+            archivos.append((os.path.getmtime(ruta), ruta))
+        except OSError:
+            continue
+    archivos.sort()
+    limite = time.time() - max_edad_s
+    sobrantes = len(archivos) - max_archivos
+    borrados = 0
+    for i, (mtime, ruta) in enumerate(archivos):
+        if mtime >= limite and i >= sobrantes:
+            break
+        try:
+            os.remove(ruta)
+            borrados += 1
+        except OSError:
+            pass
+    return borrados
+
+
+def _escribir(capturas: list[tuple[str, str, bytes]]):
+    for ruta, _, datos in capturas:
+        with open(ruta, "wb") as f:
+            f.write(datos)
+
+
+class ScreenshotBuffer:
+    def __init__(self, directorio: str, modo="ring", capacidad=10, calidad=60, max_archivos=2000, max_edad_s=7 * 86400):
+        self.directorio = directorio
+        self.modo = modo
+        self.calidad = calidad
+        self.max_archivos = max_archivos
+        self.max_edad_s = max_edad_s
+        self._ring: deque[tuple[str, bytes]] = deque(maxlen=max(1, capacidad))
+
+    def _ruta(self, nombre: str, extension: str) -> str:
+        return os.path.join(self.directorio, f"{nombre}_{datetime.now().strftime('%H%M%S')}.{extension}")
+
+    async def capturar(self, page, nombre: str):
+        if self.modo == "off" or page is None:
+            return
+        try:
+            if self.modo == "debug":
+                os.makedirs(self.directorio, exist_ok=True)
+                path = self._ruta(nombre, "png")
+                await page.screenshot(path=path, full_page=True)
+                logger.info(f"Screenshot: {path}")
+                await self._barrer()
+            else:
+                datos = await page.screenshot(type="jpeg", quality=self.calidad)
+                self._ring.append((nombre, datos))
+        except Exception as e:
+            logger.warning(f"Screenshot error: {e}")
+
+    async def volcar(self):
+        """Escribe a disco las capturas del buffer (fallo de un paso) y lo vacia."""
+        if self.modo != "ring" or not self._ring:
+            return
+        capturas = [(self._ruta(f"{i:02d}_{nombre}", "jpg"), nombre, datos) for i, (nombre, datos) in enumerate(self._ring)]
+        self._ring.clear()
+        try:
+            await asyncio.to_thread(os.makedirs, self.directorio, exist_ok=True)
+            await asyncio.to_thread(_escribir, capturas)
+            logger.info(f"Screenshots del fallo ({len(capturas)}): {capturas[-1][0]}")
+        except Exception as e:
+            logger.warning(f"Screenshot error: {e}")
+        await self._barrer()
+
+    async def _barrer(self):
+        global _ultimo_barrido
+        if time.time() - _ultimo_barrido < SWEEP_INTERVAL:
+            return
+        _ultimo_barrido = time.time()
+        borrados = await asyncio.to_thread(limpiar_directorio, self.directorio, self.max_archivos, self.max_edad_s)
+        if borrados:
+            logger.info(f"[SCREENSHOTS] Retencion: {borrados} archivos borrados")
+
+
+def get_screenshot_buffer(directorio: str) -> ScreenshotBuffer:
+    """Buffer nuevo por sesion, configurado desde settings."""
+    from app.config import settings
+    return ScreenshotBuffer(
+        directorio,
+        modo=settings.SCREENSHOT_MODE,
+        capacidad=settings.SCREENSHOT_RING_SIZE,
+        max_archivos=settings.SCREENSHOT_MAX_FILES,
+        max_edad_s=settings.SCREENSHOT_MAX_AGE_DAYS * 86400,
+    )
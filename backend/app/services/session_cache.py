@@ -0,0 +1,149 @@
+"""
+Cache encriptado de sesiones ARCA (Playwright storage_state) por tenant,
+cuit_login y clave fiscal.
+
+Cada entrada es un archivo en SESSION_CACHE_DIR con el storage_state en JSON
+encriptado con AES-256-GCM (misma clave que clave_fiscal). Al estar en disco,
+la comparten los workers, los reintentos y otros procesos del mismo host.
+Las entradas vencen a los ARCA_SESSION_TTL segundos y se desalojan las mas
+viejas cuando se supera SESSION_CACHE_MAX.
+
+Una sesion cacheada omite el login, asi que solo se reutiliza con las mismas
+credenciales que la crearon: la entrada se identifica por tenant_id y
+cuit_login mas un HMAC de la clave descifrada. Otro tenant, o una clave
+distinta o cambiada, no la encuentra y hace login completo. Al editar las
+credenciales de un cliente se invalidan todas las entradas de su login.
+
+Sin FIELD_ENCRYPTION_KEY el cache queda deshabilitado: las cookies de sesion
+equivalen a credenciales y no se guardan en texto plano.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+from app.auth.encryption import decrypt_bytes, encrypt_bytes, fingerprint
+
+logger = logging.getLogger("scraper")
+
+
+class SessionCache:
+    def __init__(self, directorio: str, ttl_s: float, max_entradas: int = 500, habilitada: bool = True):
+        self.directorio = directorio
+        self.ttl_s = ttl_s
+        self.max_entradas = max_entradas
+        self.habilitada = habilitada and ttl_s > 0
+        self._stats = {"hits": 0, "misses": 0, "guardadas": 0, "invalidadas": 0, "desalojadas": 0}
+
+    @staticmethod
+    def _prefijo(tenant_id: int | None, cuit_login: str) -> str:
+        return hashlib.sha256(f"{tenant_id}:{cuit_login}".encode("utf-8")).hexdigest()[:32]
+
+    def _ruta(self, tenant_id: int | None, cuit_login: str, clave_fiscal: str) -> str:
+        credencial = fingerprint(f"{tenant_id}:{cuit_login}:{clave_fiscal}")[:32]
+        return os.path.join(self.directorio, f"{self._prefijo(tenant_id, cuit_login)}_{credencial}.bin")
+
+    def _vencida(self, ruta: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(ruta) > self.ttl_s
+        except OSError:
+            return True
+
+    def obtener(self, tenant_id: int | None, cuit_login: str, clave_fiscal: str) -> dict | None:
+        """storage_state vigente para estas credenciales del tenant, o None."""
+        if not self.habilitada:
+            return None
+        ruta = self._ruta(tenant_id, cuit_login, clave_fiscal)
+        if not os.path.exists(ruta) or self._vencida(ruta):
+            self._borrar(ruta)
+            self._stats["misses"] += 1
+            return None
+        try:
+            with open(ruta, "rb") as f:
+                state = json.loads(decrypt_bytes(f.read()))
+        except Exception as e:
+            logger.warning(f"[SESION] Cache ilegible, descartando: {e}")
+            self._borrar(ruta)
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return state
+
+    def guardar(self, tenant_id: int | None, cuit_login: str, clave_fiscal: str, state: dict):
+        if not self.habilitada:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self._ruta(tenant_id, cuit_login, clave_fiscal)
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(encrypt_bytes(json.dumps(state).encode("utf-8")))
+            os.replace(tmp, ruta)
+            self._stats["guardadas"] += 1
+        except Exception as e:
+            logger.warning(f"[SESION] No se pudo guardar la sesion: {e}")
+            self._borrar(tmp)
+            return
+        self._desalojar()
+
+    def invalidar(self, tenant_id: int | None, cuit_login: str):
+        """Borra las sesiones del login en el tenant, con cualquier clave."""
+        prefijo = f"{self._prefijo(tenant_id, cuit_login)}_"
+        try:
+            nombres = [n for n in os.listdir(self.directorio) if n.startswith(prefijo) and n.endswith(".bin")]
+        except OSError:
+            return
+        for nombre in nombres:
+            if self._borrar(os.path.join(self.directorio, nombre)):
+                self._stats["invalidadas"] += 1
+
+    def _borrar(self, ruta: str) -> bool:
+        try:
+            os.remove(ruta)
+            return True
+        except OSError:
+            return False
+
+    def _desalojar(self):
+        """Borra las entradas vencidas y, si sobran, las mas viejas."""
+        try:
+            rutas = [
+                os.path.join(self.directorio, n)
+                for n in os.listdir(self.directorio) if n.endswith(".bin")
+            ]
+        except OSError:
+            return
+        vigentes = []
+        for ruta in rutas:
+            if self._vencida(ruta):
+                if self._borrar(ruta):
+                    self._stats["desalojadas"] += 1
+            else:
+                vigentes.append(ruta)
+        if len(vigentes) > self.max_entradas:
+            vigentes.sort(key=lambda r: os.path.getmtime(r) if os.path.exists(r) else 0)
+            for ruta in vigentes[:len(vigentes) - self.max_entradas]:
+                if self._borrar(ruta):
+                    self._stats["desalojadas"] += 1
+
+    def stats(self) -> dict:
+        return {**self._stats, "habilitada": self.habilitada, "ttl_s": self.ttl_s}
+
+
+_cache: SessionCache | None = None
+
+
+def get_session_cache() -> SessionCache:
+    """Cache compartido del proceso, configurado desde settings."""
+    global _cache
+    if _cache is None:
+        from app.config import settings
+        _cache = SessionCache(
+            directorio=settings.SESSION_CACHE_DIR,
+            ttl_s=settings.ARCA_SESSION_TTL,
+            max_entradas=settings.SESSION_CACHE_MAX,
+            habilitada=bool(settings.FIELD_ENCRYPTION_KEY),
+        )
+    return _cache
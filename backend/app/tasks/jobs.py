@@ -0,0 +1,387 @@
+"""
+Scrape-job core shared by the execution backends (TASK_BACKEND).
+
+inprocess: app/tasks/runner.py claims groups from the durable queue and
+runs them on its event loop (or in child processes). celery: one
+scrape_arca task per consulta (app/tasks/scraping.py) claims it, plus its
+queued same-credential siblings, and runs them on the worker's persistent
+loop. Both go through the same steps here: lease and heartbeat, decrypted
+login, one ARCA session per group, streamed Descarga rows, per-step spans,
+error categories and transient retries.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, create_engine, delete, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.client import Cliente
+from app.models.consultation import Consulta
+from app.models.download import Descarga
+from app.models.scraping_step import PasoScraping
+from app.models.user import Tenant
+
+logger = logging.getLogger("task_runner")
+
+# Sync DB for job bookkeeping (runs in threads via asyncio.to_thread)
+_sync_db_url = settings.DATABASE_URL.replace("+asyncpg", "+psycopg2")
+sync_engine = create_engine(_sync_db_url, pool_size=max(5, settings.SCRAPER_CONCURRENCY + 2))
+SyncSession = sessionmaker(sync_engine)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def queued():
+    """Claimable queued consultas."""
+    return and_(Consulta.estado == "pendiente", Consulta.encolada_at.is_not(None))
+
+
+def lease_group(db, cabeza, owner: str, now: datetime) -> list[int]:
+    """
+    Lease cabeza (an already locked queued consulta with its cuit_login and
+    clave_fiscal) plus queued consultas of the same tenant that log in with
+    the same credentials. The caller commits.
+    """
+    from app.auth.encryption import decrypt_clave
+
+    consulta_ids = [cabeza.id]
+    if settings.SCRAPER_MAX_GRUPO > 1:
+        rows = db.execute(
+            select(Consulta.id, Cliente.clave_fiscal)
+            .join(Cliente, Consulta.cliente_id == Cliente.id)
+            .where(
+                queued(),
+                Consulta.tenant_id == cabeza.tenant_id,
+                Consulta.id != cabeza.id,
+                Cliente.cuit_login == cabeza.cuit_login,
+            )
+            .order_by(Consulta.encolada_at, Consulta.id)
+            .limit(settings.SCRAPER_MAX_GRUPO * 2)
+            .with_for_update(of=Consulta, skip_locked=True)
+        ).all()
+        clave = decrypt_clave(cabeza.clave_fiscal)
+        hermanos = [cid for cid, clave_h in rows if decrypt_clave(clave_h) == clave]
+        consulta_ids += hermanos[:settings.SCRAPER_MAX_GRUPO - 1]
+
+    db.execute(
+        update(Consulta)
+        .where(Consulta.id.in_(consulta_ids))
+        .values(
+            estado="en_proceso",
+            lease_owner=owner,
+            lease_hasta=now + timedelta(seconds=settings.SCRAPER_LEASE_S),
+            heartbeat_at=now,
+            intentos=Consulta.intentos + 1,
+        )
+    )
+    return consulta_ids
+
+
+def claim_consulta(consulta_id: int, owner: str) -> dict | None:
+    """Claim one specific queued consulta (and its siblings); None if it is gone or taken."""
+    now = utcnow()
+    with SyncSession() as db:
+        cabeza = db.execute(
+            select(Consulta.id, Consulta.tenant_id, Cliente.cuit_login, Cliente.clave_fiscal)
+            .join(Cliente, Consulta.cliente_id == Cliente.id)
+            .where(queued(), Consulta.id == consulta_id)
+            .with_for_update(of=Consulta, skip_locked=True)
+        ).first()
+        if cabeza is None:
+            db.commit()
+            return None
+        consulta_ids = lease_group(db, cabeza, owner, now)
+        db.commit()
+    return {"consulta_ids": consulta_ids, "tenant_id": cabeza.tenant_id, "cuit_login": cabeza.cuit_login}
+
+
+async def heartbeat(owner: str, consulta_ids: list[int]):
+    """Renew the lease of the claimed consultas while they run."""
+    while True:
+        await asyncio.sleep(max(1.0, settings.SCRAPER_LEASE_S / 3))
+        try:
+            await asyncio.to_thread(_renew_lease, owner, consulta_ids)
+        except Exception as e:
+            logger.warning(f"No se pudo renovar el lease de {consulta_ids}: {e}")
+
+
+def _renew_lease(owner: str, consulta_ids: list[int]):
+    now = utcnow()
+    with SyncSession() as db:
+        db.execute(
+            update(Consulta)
+            .where(Consulta.id.in_(consulta_ids), Consulta.lease_owner == owner, Consulta.estado == "en_proceso")
+            .values(heartbeat_at=now, lease_hasta=now + timedelta(seconds=settings.SCRAPER_LEASE_S))
+        )
+        db.commit()
+
+
+async def run_group(claim: dict, owner: str, throttle, ejecutar=None) -> dict | None:
+    """
+    Run a claimed group of consultas (same tenant and credentials) in one ARCA
+    session. Each result is persisted separately as soon as its target
+    finishes. ejecutar(job, tenant_id, al_filas, al_terminar) runs the session
+    (default: run_session_inline). Returns the re-enqueued consulta ids and
+    the seconds per consulta, or None if nothing ran.
+    """
+    from app.services.errores import TRANSIENT_CATEGORIES, clasificar_error
+
+    consulta_ids, tenant_id = claim["consulta_ids"], claim["tenant_id"]
+    job = await asyncio.to_thread(start_group, consulta_ids, tenant_id)
+    if job is None:
+        throttle.cancel()
+        return None
+
+    reencoladas: list[int] = []
+    guardadas: set[int] = set()
+    con_filas: set[int] = set()
+    sin_lease: set[int] = set()
+
+    async def al_filas(objetivo: dict, lote: list[dict]):
+        cid = objetivo["consulta_id"]
+        if cid in sin_lease:
+            return
+        # El primer lote reemplaza lo que hubiera dejado un intento anterior
+        if not await asyncio.to_thread(insert_rows, cid, tenant_id, objetivo["cliente_id"], lote, cid not in con_filas, owner):
+            # Otro worker la tomo: sus filas no se tocan y el resultado se descarta en save_result
+            sin_lease.add(cid)
+            return
+        con_filas.add(cid)
+
+    async def al_terminar(objetivo: dict, resultado: dict):
+        cid = objetivo["consulta_id"]
+        guardadas.add(cid)
+        throttle.record(not resultado["exito"] and clasificar_error(resultado.get("error", "")) in TRANSIENT_CATEGORIES)
+        if await asyncio.to_thread(save_result, cid, tenant_id, resultado, owner):
+            reencoladas.append(cid)
+
+    inicio = asyncio.get_running_loop().time()
+    try:
+        await (ejecutar or run_session_inline)(job, tenant_id, al_filas, al_terminar)
+    except Exception as e:
+        logger.error(f"Error en sesion de scraping {consulta_ids}: {e}", exc_info=True)
+        for objetivo in job["objetivos"]:
+            if objetivo["consulta_id"] not in guardadas:
+                await al_terminar(objetivo, {"exito": False, "error": str(e)[:500]})
+
+    return {
+        "reencoladas": reencoladas,
+        "segundos_por_consulta": (asyncio.get_running_loop().time() - inicio) / len(job["objetivos"]),
+    }
+
+
+async def run_session_inline(job: dict, tenant_id: int, al_filas, al_terminar):
+    """Run the ARCA session on the current event loop with the process-wide browser pool."""
+    from app.services.browser_pool import get_browser_pool
+    from app.services.scraper_async import AsyncARCAScraper
+    from app.services.session_cache import get_session_cache
+
+    scraper = AsyncARCAScraper(
+        headless=settings.HEADLESS,
+        min_delay=settings.MIN_DELAY,
+        max_delay=settings.MAX_DELAY,
+        browser_timeout=settings.BROWSER_TIMEOUT,
+        download_base_dir=settings.DOWNLOAD_DIR,
+        pool=get_browser_pool(),
+        sesiones=get_session_cache(),
+        ritmo=job["ritmo"],
+    )
+    await scraper.ejecutar_sesion(
+        cuit_login=job["cuit_login"],
+        clave_fiscal=job["clave_fiscal"],
+        objetivos=job["objetivos"],
+        tenant_id=tenant_id,
+        al_terminar=al_terminar,
+        al_filas=al_filas,
+    )
+
+
+def start_group(consulta_ids: list[int], tenant_id: int) -> dict | None:
+    """Return the session login plus the targets of a claimed group."""
+    from app.auth.encryption import decrypt_clave
+
+    job = None
+    with SyncSession() as db:
+        for consulta_id in consulta_ids:
+            consulta = db.get(Consulta, consulta_id)
+            if not consulta or consulta.tenant_id != tenant_id:
+                logger.error(f"Consulta {consulta_id} no encontrada")
+                continue
+
+            cliente = db.get(Cliente, consulta.cliente_id)
+            if not cliente:
+                consulta.estado = "error"
+                consulta.error_detalle = "Cliente no encontrado"
+                consulta.lease_owner = None
+                consulta.lease_hasta = None
+                db.commit()
+                continue
+
+            logger.info(f"Scraping: {cliente.nombre} (CUIT: {cliente.cuit_consulta})")
+            if job is None:
+                # El ritmo lo define la primera consulta del grupo, si no el del tenant
+                tenant = db.get(Tenant, tenant_id)
+                job = {
+                    "cuit_login": cliente.cuit_login,
+                    "clave_fiscal": decrypt_clave(cliente.clave_fiscal),
+                    "ritmo": consulta.ritmo or (tenant.ritmo if tenant else None),
+                    "objetivos": [],
+                }
+            job["objetivos"].append({
+                "consulta_id": consulta_id,
+                "cliente_id": consulta.cliente_id,
+                "cuit_consulta": cliente.cuit_consulta,
+                "periodo": consulta.periodo,
+            })
+    if job and len(job["objetivos"]) > 1:
+        logger.info(f"Sesion agrupada para login {job['cuit_login']}: {len(job['objetivos'])} consultas")
+    return job
+
+
+def save_result(consulta_id: int, tenant_id: int, resultado: dict, owner: str | None = None) -> bool:
+    """Persist a scraping result. Returns True if the job was re-enqueued."""
+    with SyncSession() as db:
+        consulta = db.get(Consulta, consulta_id, with_for_update=True)
+        if not consulta:
+            return False
+        if owner and consulta.lease_owner != owner:
+            # The lease expired and another worker claimed the job
+            logger.warning(f"Consulta {consulta_id}: lease perdido ({consulta.lease_owner}), descartando resultado")
+            return False
+        consulta.lease_owner = None
+        consulta.lease_hasta = None
+
+        save_steps(db, consulta_id, tenant_id, resultado.get("pasos", []))
+        recursos = resultado.get("recursos") or {}
+        if "bloqueadas" in recursos:
+            consulta.recursos_bloqueados = recursos["bloqueadas"]
+            consulta.bytes_bloqueados = recursos.get("bytes_bloqueados")
+
+        if resultado["exito"]:
+            consulta.estado = "exitoso"
+            consulta.finalizada_at = utcnow()
+            consulta.archivo_csv = resultado.get("archivo")
+            consulta.error_categoria = None
+            consulta.bytes = resultado.get("bytes")
+            logger.info(f"Consulta {consulta_id} exitosa: {resultado.get('archivo')}")
+            conciliacion = resultado.get("conciliacion") or {}
+            if conciliacion.get("csv") and conciliacion.get("solo_pantalla"):
+                logger.warning(f"Consulta {consulta_id}: {conciliacion['solo_pantalla']} filas de pantalla no estan en el CSV")
+
+            # Rows are normally streamed by insert_rows; tabla_datos only when not streamed
+            tabla_datos = resultado.get("tabla_datos", [])
+            consulta.filas = resultado.get("filas", len(tabla_datos))
+            if tabla_datos:
+                existing = db.scalar(select(Descarga.id).where(Descarga.consulta_id == consulta_id).limit(1))
+                if existing:
+                    logger.info(f"Consulta {consulta_id} ya tiene registros en descargas, omitiendo inserción")
+                else:
+                    bulk_insert_rows(db, consulta_id, tenant_id, consulta.cliente_id, tabla_datos)
+                    logger.info(f"Guardados {len(tabla_datos)} registros de tabla ARCA en DB")
+        else:
+            from app.services.errores import clasificar_error, TRANSIENT_CATEGORIES
+
+            error_msg = resultado.get("error", "Error desconocido")
+            categoria = clasificar_error(error_msg)
+            consulta.error_detalle = error_msg
+            consulta.error_categoria = categoria
+            # Drop rows streamed by a run that failed after extracting
+            db.execute(delete(Descarga).where(Descarga.consulta_id == consulta_id))
+
+            # Auto-retry for transient errors (max 1 retry)
+            if categoria in TRANSIENT_CATEGORIES and consulta.reintentos < 1:
+                consulta.reintentos += 1
+                consulta.estado = "pendiente"
+                consulta.encolada_at = datetime.now(timezone.utc)
+                db.commit()
+                logger.info(f"Consulta {consulta_id} error transitorio ({categoria}), reintento #{consulta.reintentos}")
+                return True
+            consulta.estado = "error"
+            consulta.finalizada_at = utcnow()
+            logger.warning(f"Consulta {consulta_id} error definitivo ({categoria}): {error_msg}")
+
+        db.commit()
+
+        # Check if batch complete and notify
+        check_and_notify_batch_complete(db, tenant_id)
+        return False
+
+
+def bulk_insert_rows(db, consulta_id: int, tenant_id: int, cliente_id: int, filas: list[dict]):
+    """INSERT the result rows in fixed-size executemany batches."""
+    lote = max(1, settings.SCRAPER_LOTE_FILAS)
+    for i in range(0, len(filas), lote):
+        db.execute(insert(Descarga), [
+            {
+                "tenant_id": tenant_id,
+                "consulta_id": consulta_id,
+                "cliente_id": cliente_id,
+                "estado": row.get("estado", ""),
+                "cuit_cuil": row.get("cuit_cuil", ""),
+                "formulario": row.get("formulario", ""),
+                "periodo": row.get("periodo", ""),
+                "transaccion": row.get("transaccion", ""),
+                "fecha_presentacion": row.get("fecha_presentacion", ""),
+            }
+            for row in filas[i:i + lote]
+        ])
+
+
+def insert_rows(consulta_id: int, tenant_id: int, cliente_id: int, filas: list[dict], reemplazar: bool,
+                owner: str | None = None) -> bool:
+    """
+    Persist one streamed chunk of result rows (the first chunk replaces earlier
+    rows). With owner, the consulta row is locked and nothing is written unless
+    owner still holds its lease; returns False in that case.
+    """
+    with SyncSession() as db:
+        if owner:
+            actual = db.scalar(select(Consulta.lease_owner).where(Consulta.id == consulta_id).with_for_update())
+            if actual != owner:
+                logger.warning(f"Consulta {consulta_id}: lease perdido ({actual}), descartando filas")
+                return False
+        if reemplazar:
+            db.execute(delete(Descarga).where(Descarga.consulta_id == consulta_id))
+        bulk_insert_rows(db, consulta_id, tenant_id, cliente_id, filas)
+        db.commit()
+    return True
+
+
+def save_steps(db, consulta_id: int, tenant_id: int, pasos: list[dict]):
+    """Persist the per-step timing spans of a scraping run."""
+    for p in pasos:
+        db.add(PasoScraping(
+            tenant_id=tenant_id,
+            consulta_id=consulta_id,
+            paso=p["paso"],
+            inicio=p["inicio"],
+            fin=p["fin"],
+            duracion_ms=p["duracion_ms"],
+            intentos=p["intentos"],
+            resultado=p["resultado"],
+            error=p.get("error"),
+            esperado_ms=p.get("esperado_ms"),
+            ahorrado_ms=p.get("ahorrado_ms"),
+            compartido=p.get("compartido", False),
+        ))
+
+
+def check_and_notify_batch_complete(db, tenant_id: int):
+    """Check if all pending consultations are done and send notification."""
+    pending = db.scalar(
+        select(Consulta).where(
+            Consulta.tenant_id == tenant_id,
+            Consulta.estado.in_(["pendiente", "en_proceso"]),
+        )
+    )
+    if pending is None:
+        try:
+            from app.services.email import notify_batch_complete
+            notify_batch_complete(db, tenant_id)
+        except Exception as e:
+            logger.warning(f"Error enviando notificacion: {e}")
@@ -0,0 +1,214 @@
+"""
+Process-isolated scrape execution (SCRAPER_EJECUCION="proceso").
+
+Each runner worker slot owns a supervised child process (spawn) with its own
+event loop and browser pool. The parent sends one ARCA session per job over a
+Pipe and the child streams back row chunks and per-target results, which the
+parent persists as usual. Children are recycled after
+SCRAPER_PROCESO_MAX_JOBS sessions or when their process tree (Chromium
+included) exceeds SCRAPER_PROCESO_MAX_RSS_MB, and killed with their whole
+process group if they go SCRAPER_PROCESO_TIMEOUT_S without a message. The API
+process never loads Playwright, so its memory stays flat.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+
+from app.config import settings
+
+logger = logging.getLogger("task_runner")
+
+STOP_TIMEOUT_S = 10.0
+
+
+# ─── Child side ───────────────────────────────────────────────────────────────
+
+def _child_main(conn):
+    if hasattr(os, "setsid"):
+        # Own process group: a kill also takes down Chromium and the driver
+        os.setsid()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    asyncio.run(_child_loop(conn))
+
+
+async def _child_loop(conn):
+    from app.services.browser_pool import get_browser_pool
+    from app.services.scraper_async import AsyncARCAScraper
+    from app.services.session_cache import get_session_cache
+
+    try:
+        while True:
+            job = await asyncio.to_thread(conn.recv)
+            if job is None:
+                break
+
+            scraper = AsyncARCAScraper(
+                headless=settings.HEADLESS,
+                min_delay=settings.MIN_DELAY,
+                max_delay=settings.MAX_DELAY,
+                browser_timeout=settings.BROWSER_TIMEOUT,
+                download_base_dir=settings.DOWNLOAD_DIR,
+                pool=get_browser_pool(),
+                sesiones=get_session_cache(),
+                ritmo=job["ritmo"],
+            )
+
+            async def al_filas(objetivo, lote):
+                conn.send(("filas", objetivo["consulta_id"], lote))
+
+            async def al_terminar(objetivo, resultado):
+                conn.send(("resultado", objetivo["consulta_id"], resultado))
+
+            try:
+                await scraper.ejecutar_sesion(
+                    cuit_login=job["cuit_login"],
+                    clave_fiscal=job["clave_fiscal"],
+                    objetivos=job["objetivos"],
+                    tenant_id=job["tenant_id"],
+                    al_terminar=al_terminar,
+                    al_filas=al_filas,
+                )
+                conn.send(("fin", None))
+            except Exception as e:
+                conn.send(("fin", str(e)[:500]))
+    except (EOFError, OSError):
+        pass  # parent gone
+    finally:
+        await get_browser_pool().cerrar()
+
+
+# ─── Parent side ──────────────────────────────────────────────────────────────
+
+class ScrapeProcess:
+    """One supervised child process, reused across sessions until recycled."""
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.proc = None
+        self.conn = None
+        self.jobs = 0
+
+    def _start(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(target=_child_main, args=(child_conn,), name=f"scraper-{self.slot}", daemon=True)
+        self.proc.start()
+        child_conn.close()
+        self.jobs = 0
+        logger.info(f"Proceso de scraping {self.slot} iniciado (pid {self.proc.pid})")
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.is_alive()
+
+    async def run_session(self, job: dict, al_filas, al_terminar):
+        """
+        Run one ARCA session in the child. Raises RuntimeError if the child
+        hangs or dies; results already delivered through al_terminar stand.
+        """
+        if not self.alive():
+            self._start()
+        objetivos = {o["consulta_id"]: o for o in job["objetivos"]}
+        self.conn.send(job)
+        try:
+            while True:
+                if not await asyncio.to_thread(self.conn.poll, settings.SCRAPER_PROCESO_TIMEOUT_S):
+                    self.kill()
+                    raise RuntimeError(f"Timeout: el proceso de scraping no respondio en {settings.SCRAPER_PROCESO_TIMEOUT_S:.0f}s")
+                tipo, *datos = self.conn.recv()
+                if tipo == "filas":
+                    await al_filas(objetivos[datos[0]], datos[1])
+                elif tipo == "resultado":
+                    await al_terminar(objetivos[datos[0]], datos[1])
+                elif tipo == "fin":
+                    if datos[0]:
+                        raise RuntimeError(datos[0])
+                    break
+        except (EOFError, OSError):
+            codigo = self.proc.exitcode if self.proc else None
+            self.kill()
+            raise RuntimeError(f"Timeout: el proceso de scraping termino inesperadamente (codigo {codigo})")
+        finally:
+            self.jobs += 1
+
+        await self._recycle_if_needed()
+
+    async def _recycle_if_needed(self):
+        from app.services.browser_pool import rss_arbol_mb
+
+        rss = await asyncio.to_thread(rss_arbol_mb, self.proc.pid)
+        motivo = None
+        if self.jobs >= settings.SCRAPER_PROCESO_MAX_JOBS:
+            motivo = f"{self.jobs} sesiones"
+        elif rss > settings.SCRAPER_PROCESO_MAX_RSS_MB:
+            motivo = f"RSS {rss:.0f} MB"
+        if motivo:
+            logger.info(f"Reciclando proceso de scraping {self.slot} ({motivo})")
+            await self.stop()
+
+    async def stop(self):
+        """Ask the child to close its browsers and exit; kill it if it does not."""
+        if not self.alive():
+            self.proc = None
+            return
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        await asyncio.to_thread(self.proc.join, STOP_TIMEOUT_S)
+        self.kill()
+
+    def kill(self):
+        if self.proc is None:
+            return
+        if self.proc.is_alive():
+            logger.warning(f"Matando proceso de scraping {self.slot} (pid {self.proc.pid})")
+        try:
+            if not hasattr(os, "killpg"):
+                raise ProcessLookupError
+            # Also whatever the child left behind in its group (Chromium, driver)
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            # No group yet (the child had not reached setsid) or not ours: kill the child itself
+            try:
+                self.proc.kill()
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.proc.join(1)
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        self.proc = None
+        self.conn = None
+
+
+class ProcessPool:
+    def __init__(self):
+        self._slots: dict[int, ScrapeProcess] = {}
+
+    def slot(self, worker_id: int) -> ScrapeProcess:
+        if worker_id not in self._slots:
+            self._slots[worker_id] = ScrapeProcess(worker_id)
+        return self._slots[worker_id]
+
+    def stats(self) -> list[dict]:
+        return [
+            {"slot": s.slot, "pid": s.proc.pid if s.alive() else None, "sesiones": s.jobs}
+            for s in self._slots.values()
+        ]
+
+    async def close(self):
+        await asyncio.gather(*(s.stop() for s in self._slots.values()), return_exceptions=True)
+
+
+_pool: ProcessPool | None = None
+
+
+def get_process_pool() -> ProcessPool:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPool()
+    return _pool
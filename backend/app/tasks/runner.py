@@ -1,194 +1,490 @@
 """
 In-process async task runner for scraping.
-Replaces Celery for MVP deployment - runs scraping sequentially
-in a background thread within the FastAPI process.
+Replaces Celery for MVP deployment - supervises SCRAPER_CONCURRENCY scrape
+workers inside the FastAPI process. Workers drive the async Playwright engine
+directly on the event loop (one browser context each); DB work runs in
+threads with its own sync session per job.
+
+The queue is durable and lives in Postgres: a consulta is queued while it is
+'pendiente' with encolada_at set. Workers claim jobs with SELECT ... FOR UPDATE
+SKIP LOCKED and hold a lease (lease_owner / lease_hasta) renewed by a
+heartbeat. On startup and every SCRAPER_REAPER_S a reaper requeues jobs
+whose worker died (lease expired / stale heartbeat), up to
+SCRAPER_MAX_INTENTOS claims. Any number of processes can run workers (also
+standalone: python -m app.tasks.runner).
+
+Queued consultas of the same tenant whose clients share a cuit_login/clave
+are grouped and run in a single ARCA session (one login, N targets).
+
+With TASK_BACKEND=celery this process runs no workers: every queued consulta
+is sent as a scrape_arca task (app/tasks/scraping.py) and only the reaper
+runs here. Both backends share the job core in app/tasks/jobs.py.
 """
 
 import asyncio
 import logging
 import os
-from datetime import datetime, timezone
+import socket
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import and_, func, or_, select, update
 
 from app.config import settings
 from app.models.client import Cliente
 from app.models.consultation import Consulta
-from app.models.download import Descarga
+from app.models.user import Tenant
+from app.services.result_cache import get_result_cache
+from app.tasks.jobs import SyncSession, heartbeat, lease_group, queued, run_group, utcnow
+from app.tasks.scheduler import PRIORIDADES, estimate_position, lanes, plan_weights, schedulers, weight_of
+from app.tasks.throttle import get_throttle
 
 logger = logging.getLogger("task_runner")
 
-# Sync DB for scraping thread (Playwright is sync)
-_sync_db_url = settings.DATABASE_URL.replace("+asyncpg", "+psycopg2")
-sync_engine = create_engine(_sync_db_url)
-SyncSession = sessionmaker(sync_engine)
+# Lease owner prefix of this process
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Global state
+_workers: dict[int, asyncio.Task] = {}
+_worker_state: dict[int, dict] = {}
+_wakeup: asyncio.Condition | None = None
+_reaper: asyncio.Task | None = None
+# Moving average of seconds per consulta (ETA in /status)
+_segundos_por_consulta = 60.0
+_stopping = False
+
+
+def _owner(worker_id: int) -> str:
+    return f"{PROCESS_ID}:{worker_id}"
+
+
+def _dead(now: datetime):
+    """en_proceso jobs whose worker is gone: lease expired, or no lease and no recent heartbeat."""
+    limite = now - timedelta(seconds=settings.SCRAPER_LEASE_S)
+    return and_(
+        Consulta.estado == "en_proceso",
+        or_(
+            Consulta.lease_hasta < now,
+            and_(Consulta.lease_hasta.is_(None), func.coalesce(Consulta.heartbeat_at, Consulta.created_at) < limite),
+        ),
+    )
+
+
+async def _notify_workers():
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Condition()
+    async with _wakeup:
+        _wakeup.notify_all()
 
-# Global queue and state
-_queue: asyncio.Queue | None = None
-_processor_task: asyncio.Task | None = None
+
+async def _wait_for_work():
+    """Sleep until a local enqueue or SCRAPER_QUEUE_POLL_S (other processes enqueue too)."""
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Condition()
+    async with _wakeup:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.SCRAPER_QUEUE_POLL_S)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def enqueue_scraping(consulta_id: int, tenant_id: int, prioridad: str = "alta"):
+    """Add a scraping job to the queue. Starts workers if not running."""
+    await enqueue_many([consulta_id], prioridad)
+    logger.info(f"Encolada consulta {consulta_id} para tenant {tenant_id} (prioridad {prioridad})")
+
+
+async def enqueue_many(consulta_ids: list[int], prioridad: str = "normal"):
+    """Queue several 'pendiente' consultas in one UPDATE, in the given priority lane."""
+    if not consulta_ids:
+        return
+    await asyncio.to_thread(_mark_queued, consulta_ids, prioridad)
+    await _dispatch(consulta_ids)
+
+
+async def _dispatch(consulta_ids: list[int]):
+    """Hand newly queued consultas to the TASK_BACKEND (celery task or local workers)."""
+    if not consulta_ids:
+        return
+    if settings.TASK_BACKEND == "celery":
+        from app.tasks.scraping import dispatch_consultas
+        await asyncio.to_thread(dispatch_consultas, consulta_ids)
+    elif settings.SCRAPER_RUNNER_ENABLED and not _stopping:
+        _ensure_workers_running()
+        await _notify_workers()
+
+
+def _mark_queued(consulta_ids: list[int], prioridad: str):
+    with SyncSession() as db:
+        db.execute(
+            update(Consulta)
+            .where(Consulta.id.in_(consulta_ids), Consulta.estado == "pendiente")
+            .values(encolada_at=utcnow(), prioridad=prioridad, lease_owner=None, lease_hasta=None, intentos=0)
+        )
+        db.commit()
+
+
+def start_runner(force: bool = False):
+    """Start the local workers and the stale-job reaper (app startup). With Celery, only the reaper."""
+    global _reaper
+    if not (force or settings.SCRAPER_RUNNER_ENABLED):
+        return
+    if settings.TASK_BACKEND != "celery":
+        _ensure_workers_running()
+    if _reaper is None or _reaper.done():
+        _reaper = asyncio.create_task(_reap_forever())
+
+
+async def rehydrate_jobs():
+    """
+    Startup recovery: queue 'pendiente' consultas that never reached the queue
+    and requeue en_proceso consultas whose worker died (per lease / heartbeat).
+    """
+    encoladas = await asyncio.to_thread(_enqueue_orphans)
+    recuperadas, agotadas = await asyncio.to_thread(_reap_stale)
+    if encoladas or recuperadas or agotadas:
+        logger.warning(
+            f"Recuperacion al iniciar: {len(encoladas)} pendientes encoladas, "
+            f"{len(recuperadas)} en proceso re-encoladas, {agotadas} sin intentos restantes"
+        )
+    if settings.TASK_BACKEND == "celery":
+        # Tasks lost with a broker restart; duplicates skip the claim
+        await asyncio.to_thread(_dispatch_queued)
+
+
+def _enqueue_orphans() -> list[int]:
+    with SyncSession() as db:
+        encoladas = db.execute(
+            update(Consulta)
+            .where(Consulta.estado == "pendiente", Consulta.encolada_at.is_(None))
+            .values(encolada_at=func.coalesce(Consulta.created_at, func.now()), intentos=0)
+            .returning(Consulta.id)
+        ).scalars().all()
+        db.commit()
+    return encoladas
+
+
+def _reap_stale() -> tuple[list[int], int]:
+    """Requeue dead en_proceso jobs; the ones out of attempts become errors."""
+    now = utcnow()
+    with SyncSession() as db:
+        agotadas = db.execute(
+            update(Consulta)
+            .where(_dead(now), Consulta.intentos >= settings.SCRAPER_MAX_INTENTOS)
+            .values(
+                estado="error",
+                error_categoria="timeout",
+                error_detalle="El trabajo se interrumpio en todos sus intentos. Reintentar.",
+                lease_owner=None,
+                lease_hasta=None,
+            )
+            .returning(Consulta.id)
+        ).scalars().all()
+        recuperadas = db.execute(
+            update(Consulta)
+            .where(_dead(now))
+            .values(
+                estado="pendiente",
+                encolada_at=func.coalesce(Consulta.encolada_at, Consulta.created_at, func.now()),
+                lease_owner=None,
+                lease_hasta=None,
+            )
+            .returning(Consulta.id)
+        ).scalars().all()
+        db.commit()
+    if agotadas:
+        logger.warning(f"Consultas {agotadas} sin worker tras {settings.SCRAPER_MAX_INTENTOS} intentos: error")
+    if recuperadas:
+        logger.warning(f"Consultas {recuperadas} sin worker (lease vencido), re-encoladas")
+    return recuperadas, len(agotadas)
+
+
+def _dispatch_queued():
+    """Celery: send a task for every queued consulta."""
+    from app.tasks.scraping import dispatch_consultas
+
+    with SyncSession() as db:
+        consulta_ids = db.execute(select(Consulta.id).where(queued()).order_by(Consulta.encolada_at)).scalars().all()
+    dispatch_consultas(list(consulta_ids))
 
 
-async def get_queue() -> asyncio.Queue:
-    global _queue
-    if _queue is None:
-        _queue = asyncio.Queue()
-    return _queue
+async def _reap_forever():
+    """Periodic stale-job reaper."""
+    while not _stopping:
+        await asyncio.sleep(settings.SCRAPER_REAPER_S)
+        try:
+            recuperadas, _ = await asyncio.to_thread(_reap_stale)
+        except Exception as e:
+            logger.warning(f"Error en el reaper de consultas: {e}")
+            continue
+        await _dispatch(recuperadas)
 
 
-async def enqueue_scraping(consulta_id: int, tenant_id: int):
-    """Add a scraping job to the queue. Starts processor if not running."""
-    q = await get_queue()
-    await q.put((consulta_id, tenant_id))
-    logger.info(f"Encolada consulta {consulta_id} para tenant {tenant_id} (queue size: {q.qsize()})")
-    await _ensure_processor_running()
+def _ensure_workers_running():
+    for worker_id in range(settings.SCRAPER_CONCURRENCY):
+        task = _workers.get(worker_id)
+        if task is None or task.done():
+            _workers[worker_id] = asyncio.create_task(_worker(worker_id))
 
 
-async def _ensure_processor_running():
-    global _processor_task
-    if _processor_task is None or _processor_task.done():
-        _processor_task = asyncio.create_task(_process_queue())
+def _set_state(worker_id: int, estado: str, consulta_ids: list[int] | None = None, tenant_id: int | None = None):
+    _worker_state[worker_id] = {
+        "worker": worker_id,
+        "estado": estado,
+        "consulta_ids": consulta_ids or [],
+        "tenant_id": tenant_id,
+        "desde": datetime.now(timezone.utc).isoformat(),
+    }
 
 
-async def _process_queue():
-    """Process scraping jobs one by one (sequential execution)."""
-    q = await get_queue()
-    logger.info("Iniciando procesador de scraping")
+async def _worker(worker_id: int):
+    """Claim jobs from the durable queue until the runner stops."""
+    owner = _owner(worker_id)
+    logger.info(f"Iniciando worker de scraping {worker_id} ({owner})")
     try:
-        while True:
+        while not _stopping:
+            _set_state(worker_id, "ocioso")
             try:
-                consulta_id, tenant_id = await asyncio.wait_for(q.get(), timeout=30.0)
-            except asyncio.TimeoutError:
-                logger.info("Cola vacia por 30s, deteniendo procesador")
-                break
+                claim = await asyncio.to_thread(_claim_group, owner)
+            except Exception as e:
+                logger.error(f"Worker {worker_id}: error tomando trabajo de la cola: {e}")
+                claim = None
+            if claim is None:
+                await _wait_for_work()
+                continue
 
-            logger.info(f"Procesando consulta {consulta_id}")
+            _set_state(worker_id, "procesando", claim["consulta_ids"], claim["tenant_id"])
+            logger.info(f"Worker {worker_id} procesando consultas {claim['consulta_ids']}")
+            latido = asyncio.create_task(heartbeat(owner, claim["consulta_ids"]))
             try:
-                await asyncio.to_thread(_sync_scrape, consulta_id, tenant_id)
+                await _scrape_group(worker_id, owner, claim)
             except Exception as e:
-                logger.error(f"Error procesando consulta {consulta_id}: {e}", exc_info=True)
+                logger.error(f"Error procesando consultas {claim['consulta_ids']}: {e}", exc_info=True)
             finally:
-                q.task_done()
+                latido.cancel()
     except Exception as e:
-        logger.error(f"Error fatal en procesador: {e}", exc_info=True)
+        logger.error(f"Error fatal en worker {worker_id}: {e}", exc_info=True)
     finally:
-        logger.info("Procesador de scraping detenido")
+        _set_state(worker_id, "detenido")
+        logger.info(f"Worker de scraping {worker_id} detenido")
 
 
-def _sync_scrape(consulta_id: int, tenant_id: int):
-    """Run a single scraping job (runs in thread)."""
+def _claim_group(owner: str) -> dict | None:
+    """
+    Claim the oldest queued consulta of the tenant whose turn it is (fair
+    scheduler) in the lane to serve, plus queued consultas of the same tenant
+    that log in with the same credentials, under one lease.
+    """
+    now = utcnow()
     with SyncSession() as db:
-        consulta = db.get(Consulta, consulta_id)
-        if not consulta or consulta.tenant_id != tenant_id:
-            logger.error(f"Consulta {consulta_id} no encontrada")
-            return
-
-        cliente = db.get(Cliente, consulta.cliente_id)
-        if not cliente:
-            consulta.estado = "error"
-            consulta.error_detalle = "Cliente no encontrado"
+        cola = _queue_by_lane(db)
+        cabeza = None
+        for prioridad in lanes.order({p: (now - c["mas_antigua"]).total_seconds() for p, c in cola.items()}):
+            tenants = cola[prioridad]["tenants"]
+            for tenant_id in schedulers[prioridad].order({t: peso for t, (_, peso) in tenants.items()}):
+                cabeza = db.execute(
+                    select(Consulta.id, Consulta.tenant_id, Cliente.cuit_login, Cliente.clave_fiscal)
+                    .join(Cliente, Consulta.cliente_id == Cliente.id)
+                    .where(queued(), Consulta.prioridad == prioridad, Consulta.tenant_id == tenant_id)
+                    .order_by(Consulta.encolada_at, Consulta.id)
+                    .limit(1)
+                    .with_for_update(of=Consulta, skip_locked=True)
+                ).first()
+                if cabeza is not None:
+                    break
+            if cabeza is not None:
+                break
+        if cabeza is None:
             db.commit()
-            return
+            return None
 
-        # Update status
-        consulta.estado = "en_proceso"
+        consulta_ids = lease_group(db, cabeza, owner, now)
         db.commit()
-        logger.info(f"Scraping: {cliente.nombre} (CUIT: {cliente.cuit_consulta})")
+    lanes.served(prioridad)
+    schedulers[prioridad].charge(cabeza.tenant_id, len(consulta_ids))
+    return {"consulta_ids": consulta_ids, "tenant_id": cabeza.tenant_id, "cuit_login": cabeza.cuit_login}
 
-        try:
-            from app.auth.encryption import decrypt_clave
-            from app.services.scraper import ARCAScraper
-
-            scraper = ARCAScraper(
-                headless=settings.HEADLESS,
-                min_delay=settings.MIN_DELAY,
-                max_delay=settings.MAX_DELAY,
-                download_base_dir=settings.DOWNLOAD_DIR,
-            )
 
-            resultado = scraper.ejecutar_consulta(
-                cuit_login=cliente.cuit_login,
-                clave_fiscal=decrypt_clave(cliente.clave_fiscal),
-                cuit_consulta=cliente.cuit_consulta,
-                periodo=consulta.periodo,
-                tenant_id=tenant_id,
+def _queue_by_lane(db) -> dict[str, dict]:
+    """
+    prioridad -> {"tenants": {tenant_id: (queued consultas, weight from its plan)},
+    "mas_antigua": encolada_at of its oldest job}.
+    """
+    pesos = plan_weights()
+    rows = db.execute(
+        select(Consulta.prioridad, Consulta.tenant_id, Tenant.plan, func.count(), func.min(Consulta.encolada_at))
+        .join(Tenant, Tenant.id == Consulta.tenant_id)
+        .where(queued())
+        .group_by(Consulta.prioridad, Consulta.tenant_id, Tenant.plan)
+    ).all()
+    cola: dict[str, dict] = {}
+    for prioridad, tenant_id, plan, n, mas_antigua in rows:
+        prioridad = prioridad if prioridad in PRIORIDADES else "normal"
+        lane = cola.setdefault(prioridad, {"tenants": {}, "mas_antigua": mas_antigua})
+        previos, _ = lane["tenants"].get(tenant_id, (0, 0))
+        lane["tenants"][tenant_id] = (previos + n, weight_of(plan, pesos))
+        lane["mas_antigua"] = min(lane["mas_antigua"], mas_antigua)
+    return cola
+
+
+def _queue_snapshot() -> dict[str, dict]:
+    with SyncSession() as db:
+        return _queue_by_lane(db)
+
+
+def _lane_metrics(cola: dict[str, dict]) -> dict:
+    now = utcnow()
+    return {
+        p: {
+            "en_cola": sum(n for n, _ in cola[p]["tenants"].values()) if p in cola else 0,
+            "espera_max_s": round((now - cola[p]["mas_antigua"]).total_seconds()) if p in cola else 0,
+        }
+        for p in PRIORIDADES
+    }
+
+
+def _tenant_position(tenant_id: int, cola: dict[str, dict]) -> dict | None:
+    """Estimated position of the tenant's next and last queued consulta across lanes."""
+    delante = 0
+    resultado = None
+    for p in PRIORIDADES:
+        if p not in cola:
+            continue
+        tenants = cola[p]["tenants"]
+        posicion = estimate_position(tenant_id, tenants)
+        if posicion:
+            if resultado is None:
+                resultado = {"en_cola": 0, "posicion": delante + posicion["posicion"]}
+            resultado["en_cola"] += posicion["en_cola"]
+            resultado["posicion_ultima"] = delante + posicion["posicion_ultima"]
+        delante += sum(n for n, _ in tenants.values())
+    return resultado
+
+
+async def get_runner_status(tenant_id: int | None = None) -> dict:
+    """Queue depth and per-worker state. Jobs of other tenants are anonymized."""
+    workers = []
+    for worker_id in range(settings.SCRAPER_CONCURRENCY):
+        state = dict(_worker_state.get(worker_id) or {"worker": worker_id, "estado": "detenido"})
+        if tenant_id is not None and state.get("tenant_id") != tenant_id:
+            state["consulta_ids"] = []
+        state.pop("tenant_id", None)
+        workers.append(state)
+    cola = await asyncio.to_thread(_queue_snapshot)
+    carriles = _lane_metrics(cola)
+    status = {
+        "concurrencia": settings.SCRAPER_CONCURRENCY,
+        "en_cola": sum(c["en_cola"] for c in carriles.values()),
+        "carriles": carriles,
+        "workers": workers,
+        "limitador": get_throttle().stats(),
+        "cache": get_result_cache().stats(),
+    }
+    if settings.SCRAPER_EJECUCION == "proceso":
+        from app.tasks.process_pool import get_process_pool
+        status["procesos"] = get_process_pool().stats()
+    if tenant_id is not None:
+        # Position of the tenant's next and last queued consulta, and when they should start
+        posicion = _tenant_position(tenant_id, cola)
+        if posicion:
+            por_consulta = _segundos_por_consulta / max(1, settings.SCRAPER_CONCURRENCY)
+            posicion["inicio_estimado_s"] = round((posicion["posicion"] - 1) * por_consulta)
+            posicion["fin_estimado_s"] = round(posicion["posicion_ultima"] * por_consulta)
+        status["mi_cola"] = posicion
+    return status
+
+
+async def shutdown_runner():
+    """Stop workers (app shutdown): let in-flight jobs finish up to a timeout."""
+    global _stopping
+    _stopping = True
+    if _reaper is not None:
+        _reaper.cancel()
+    tasks = [t for t in _workers.values() if not t.done()]
+    for worker_id, task in _workers.items():
+        if _worker_state.get(worker_id, {}).get("estado") != "procesando":
+            task.cancel()
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=settings.SCRAPER_SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+
+    # Queued jobs stay in Postgres; jobs cut off mid-scrape go back to the queue
+    try:
+        await asyncio.to_thread(_release_leases)
+    except Exception as e:
+        logger.warning(f"Error liberando leases: {e}")
+
+    try:
+        if settings.SCRAPER_EJECUCION == "proceso":
+            from app.tasks.process_pool import get_process_pool
+            await get_process_pool().close()
+        else:
+            from app.services.browser_pool import get_browser_pool
+            await get_browser_pool().cerrar()
+    except Exception as e:
+        logger.warning(f"Error cerrando browser pool: {e}")
+
+
+def _release_leases():
+    """Return the consultas leased by this process to the queue (attempt not counted)."""
+    with SyncSession() as db:
+        liberadas = db.execute(
+            update(Consulta)
+            .where(Consulta.estado == "en_proceso", Consulta.lease_owner.startswith(f"{PROCESS_ID}:", autoescape=True))
+            .values(
+                estado="pendiente",
+                encolada_at=func.coalesce(Consulta.encolada_at, func.now()),
+                lease_owner=None,
+                lease_hasta=None,
+                intentos=func.greatest(Consulta.intentos - 1, 0),
             )
+            .returning(Consulta.id)
+        ).scalars().all()
+        db.commit()
+    if liberadas:
+        logger.warning(f"{len(liberadas)} consultas interrumpidas por apagado, devueltas a la cola")
 
-            if resultado["exito"]:
-                consulta.estado = "exitoso"
-                consulta.archivo_csv = resultado.get("archivo")
-                consulta.error_categoria = None
-                logger.info(f"Consulta {consulta_id} exitosa: {resultado.get('archivo')}")
-
-                # Save table data extracted from ARCA screen (skip if already saved for this consulta)
-                tabla_datos = resultado.get("tabla_datos", [])
-                if tabla_datos:
-                    from sqlalchemy import select as sa_select
-                    existing = db.scalar(sa_select(Descarga).where(Descarga.consulta_id == consulta_id))
-                    if existing:
-                        logger.info(f"Consulta {consulta_id} ya tiene registros en descargas, omitiendo inserción")
-                    else:
-                        for row in tabla_datos:
-                            descarga = Descarga(
-                                tenant_id=tenant_id,
-                                consulta_id=consulta_id,
-                                cliente_id=consulta.cliente_id,
-                                estado=row.get("estado", ""),
-                                cuit_cuil=row.get("cuit_cuil", ""),
-                                formulario=row.get("formulario", ""),
-                                periodo=row.get("periodo", ""),
-                                transaccion=row.get("transaccion", ""),
-                                fecha_presentacion=row.get("fecha_presentacion", ""),
-                            )
-                            db.add(descarga)
-                        logger.info(f"Guardados {len(tabla_datos)} registros de tabla ARCA en DB")
-            else:
-                from app.services.scraper import clasificar_error, TRANSIENT_CATEGORIES
-
-                error_msg = resultado.get("error", "Error desconocido")
-                categoria = clasificar_error(error_msg)
-                consulta.error_detalle = error_msg
-                consulta.error_categoria = categoria
-
-                # Auto-retry for transient errors (max 1 retry)
-                if categoria in TRANSIENT_CATEGORIES and consulta.reintentos < 1:
-                    consulta.reintentos += 1
-                    consulta.estado = "pendiente"
-                    db.commit()
-                    logger.info(f"Consulta {consulta_id} error transitorio ({categoria}), reintento #{consulta.reintentos}")
-                    # Re-enqueue
-                    import asyncio
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        asyncio.run_coroutine_threadsafe(enqueue_scraping(consulta_id, tenant_id), loop)
-                    return
-                else:
-                    consulta.estado = "error"
-                    logger.warning(f"Consulta {consulta_id} error definitivo ({categoria}): {error_msg}")
 
-            db.commit()
+async def _scrape_group(worker_id: int, owner: str, claim: dict):
+    """Wait for the throttle, then run a claimed group (see jobs.run_group)."""
+    consulta_ids, tenant_id = claim["consulta_ids"], claim["tenant_id"]
 
-            # Check if batch complete and notify
-            _check_and_notify_batch_complete(db, tenant_id)
+    # Wait for the global / per-credential rate limit and the circuit breaker
+    throttle = get_throttle()
+    _set_state(worker_id, "esperando", consulta_ids, tenant_id)
+    await throttle.acquire(claim["cuit_login"] or "")
+    _set_state(worker_id, "procesando", consulta_ids, tenant_id)
 
-        except Exception as e:
-            consulta.estado = "error"
-            consulta.error_detalle = str(e)[:500]
-            db.commit()
-            logger.error(f"Error en scraping consulta {consulta_id}: {e}", exc_info=True)
+    ejecutar = None
+    if settings.SCRAPER_EJECUCION == "proceso":
+        from app.tasks.process_pool import get_process_pool
 
+        async def ejecutar(job, tenant_id, al_filas, al_terminar):
+            await get_process_pool().slot(worker_id).run_session({**job, "tenant_id": tenant_id}, al_filas, al_terminar)
 
-def _check_and_notify_batch_complete(db, tenant_id: int):
-    """Check if all pending consultations are done and send notification."""
-    pending = db.scalar(
-        select(Consulta).where(
-            Consulta.tenant_id == tenant_id,
-            Consulta.estado.in_(["pendiente", "en_proceso"]),
-        )
-    )
-    if pending is None:
-        try:
-            from app.services.email import notify_batch_complete
-            notify_batch_complete(db, tenant_id)
-        except Exception as e:
-            logger.warning(f"Error enviando notificacion: {e}")
+    resultado = await run_group(claim, owner, throttle, ejecutar)
+    if resultado is None:
+        return
+
+    global _segundos_por_consulta
+    _segundos_por_consulta = 0.8 * _segundos_por_consulta + 0.2 * resultado["segundos_por_consulta"]
+
+    if resultado["reencoladas"]:
+        await _notify_workers()
+
+
+async def run_forever():
+    """Standalone worker node: python -m app.tasks.runner"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    await rehydrate_jobs()
+    start_runner(force=True)
+    try:
+        await asyncio.gather(*_workers.values())
+    finally:
+        await shutdown_runner()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_forever())
@@ -0,0 +1,146 @@
+"""
+Per-tenant fair scheduling for the scraping queue (deficit round-robin).
+
+Tenants with queued consultas take turns. On each turn a tenant earns its
+weight (SCRAPER_PLAN_PESOS by Tenant.plan) as credit and may claim while its
+credit lasts; a claimed group costs one unit per consulta. A tenant firing
+500 clients therefore advances at its weight, interleaved with everyone else,
+instead of blocking the queue until its batch is done.
+
+On top of that, consultas run in priority lanes (PRIORIDADES): the highest
+lane with work is served first. A lower lane whose oldest job has waited
+SCRAPER_PRIORIDAD_AGING_S and that was not served in that long goes first
+once (no starvation). Each lane keeps its own round-robin. Only small
+interactive requests (up to SCRAPER_PRIORIDAD_ALTA_MAX consultas) get the
+alta lane; a client may ask for a lower lane but never a higher one.
+"""
+
+import threading
+import time
+from collections import deque
+
+from app.config import settings
+
+MAX_ROUNDS = 1000
+
+# Interactive runs and retries / bulk batches / background refreshes
+PRIORIDADES = ("alta", "normal", "baja")
+
+
+def plan_weights() -> dict[str, float]:
+    pesos = {}
+    for par in settings.SCRAPER_PLAN_PESOS.split(","):
+        plan, _, peso = par.partition(":")
+        try:
+            pesos[plan.strip()] = max(0.1, float(peso))
+        except ValueError:
+            continue
+    return pesos
+
+
+def weight_of(plan: str | None, pesos: dict[str, float] | None = None) -> float:
+    pesos = plan_weights() if pesos is None else pesos
+    return pesos.get(plan or "", 1.0)
+
+
+class FairScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turn: deque[int] = deque()
+        self._deficit: dict[int, float] = {}
+
+    def order(self, activos: dict[int, float]) -> list[int]:
+        """
+        Tenants to try, in order, for the next claim. activos maps tenant_id to
+        weight for tenants with queued work; the first one has credit to claim.
+        """
+        with self._lock:
+            # DRR: a tenant that drained its queue loses its turn and credit
+            self._turn = deque(t for t in self._turn if t in activos)
+            for t in list(self._deficit):
+                if t not in activos:
+                    del self._deficit[t]
+            for t in sorted(activos):
+                if t not in self._deficit:
+                    self._deficit[t] = 0.0
+                    self._turn.append(t)
+            if not self._turn:
+                return []
+            for _ in range(MAX_ROUNDS * len(self._turn)):
+                t = self._turn[0]
+                if self._deficit[t] >= 1:
+                    break
+                self._deficit[t] += activos[t]
+                if self._deficit[t] < 1:
+                    self._turn.rotate(-1)
+            return list(self._turn)
+
+    def charge(self, tenant_id: int, costo: int):
+        """Charge a claimed group; the turn passes on when the credit runs out."""
+        with self._lock:
+            if tenant_id not in self._deficit:
+                return
+            self._deficit[tenant_id] -= costo
+            if self._deficit[tenant_id] < 1 and self._turn and self._turn[0] == tenant_id:
+                self._turn.rotate(-1)
+
+
+def estimate_position(tenant_id: int, cola: dict[int, tuple[int, float]]) -> dict | None:
+    """
+    Jobs ahead of the first and last queued consulta of tenant_id under DRR.
+    cola maps tenant_id to (queued consultas, weight).
+    """
+    if tenant_id not in cola:
+        return None
+    propios, peso = cola[tenant_id]
+
+    def antes(k: int) -> int:
+        # While tenant_id is served k jobs, each other tenant is served ~k*w_j/w
+        return sum(
+            min(n, -(-k * w // peso))
+            for t, (n, w) in cola.items()
+            if t != tenant_id
+        )
+
+    return {
+        "en_cola": propios,
+        "posicion": int(antes(1)) + 1,
+        "posicion_ultima": int(antes(propios)) + propios,
+    }
+
+
+def lane_for(pedida: str | None, cantidad: int) -> str:
+    """Lane for a request of cantidad new consultas; pedida can only lower it."""
+    automatica = "alta" if cantidad <= settings.SCRAPER_PRIORIDAD_ALTA_MAX else "normal"
+    if pedida not in PRIORIDADES:
+        return automatica
+    return PRIORIDADES[max(PRIORIDADES.index(pedida), PRIORIDADES.index(automatica))]
+
+
+class LaneSelector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._served = {p: time.monotonic() for p in PRIORIDADES}
+
+    def order(self, esperas: dict[str, float]) -> list[str]:
+        """
+        Lanes to try, in order. esperas maps each lane with queued work to the
+        seconds its oldest job has waited; starved lanes (oldest first) go first.
+        """
+        aging = settings.SCRAPER_PRIORIDAD_AGING_S
+        now = time.monotonic()
+        with self._lock:
+            activas = [p for p in PRIORIDADES if p in esperas]
+            hambrientas = sorted(
+                (p for p in activas[1:] if esperas[p] >= aging and now - self._served[p] >= aging),
+                key=lambda p: -esperas[p],
+            )
+        return hambrientas + [p for p in activas if p not in hambrientas]
+
+    def served(self, prioridad: str):
+        with self._lock:
+            self._served[prioridad] = time.monotonic()
+
+
+lanes = LaneSelector()
+schedulers = {prioridad: FairScheduler() for prioridad in PRIORIDADES}
@@ -1,113 +1,79 @@
+import asyncio
 import logging
 import os
+import socket
 
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import select
 
 from app.celery_app import celery
-from app.models.client import Cliente
+from app.config import settings
 from app.models.consultation import Consulta
+from app.tasks.jobs import SyncSession, claim_consulta, heartbeat, run_group
 
 logger = logging.getLogger("scraper")
 
-# Celery tasks use SYNC SQLAlchemy (Celery workers are sync)
-DATABASE_URL = os.environ.get("DATABASE_URL", "postgresql+asyncpg://localhost/ddjj_arca")
-SYNC_DATABASE_URL = DATABASE_URL.replace("+asyncpg", "+psycopg2").replace("postgresql+psycopg2", "postgresql+psycopg2")
-if "asyncpg" in SYNC_DATABASE_URL:
-    SYNC_DATABASE_URL = SYNC_DATABASE_URL.replace("+asyncpg", "")
+# Broker priority per lane (Redis: 0 = first)
+PRIORIDAD_CELERY = {"alta": 0, "normal": 5, "baja": 9}
+REINTENTO_COUNTDOWN_S = 30
 
-sync_engine = create_engine(SYNC_DATABASE_URL)
-SyncSession = sessionmaker(sync_engine)
+
+def dispatch_consultas(consulta_ids: list[int], countdown: float | None = None):
+    """Send one scrape_arca task per queued consulta, with the priority of its lane."""
+    if not consulta_ids:
+        return
+    with SyncSession() as db:
+        rows = db.execute(
+            select(Consulta.id, Consulta.tenant_id, Consulta.prioridad).where(Consulta.id.in_(consulta_ids))
+        ).all()
+    for consulta_id, tenant_id, prioridad in rows:
+        scrape_arca_task.apply_async(
+            (consulta_id, tenant_id),
+            priority=PRIORIDAD_CELERY.get(prioridad, PRIORIDAD_CELERY["normal"]),
+            countdown=countdown,
+        )
+
+
+async def _run_claim(claim: dict, owner: str) -> dict | None:
+    from app.tasks.throttle import get_throttle
+
+    latido = asyncio.create_task(heartbeat(owner, claim["consulta_ids"]))
+    try:
+        throttle = get_throttle()
+        await throttle.acquire(claim["cuit_login"] or "")
+        return await run_group(claim, owner, throttle)
+    finally:
+        latido.cancel()
 
 
 @celery.task(
     bind=True,
     name="scrape_arca",
-    soft_time_limit=300,
-    time_limit=360,
     acks_late=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={"max_retries": 1},
-    retry_backoff=True,
+    time_limit=settings.CELERY_TIME_LIMIT_S,
 )
-def scrape_arca_task(self, consulta_id: int, tenant_id: int):
+def scrape_arca_task(self, consulta_id: int, tenant_id: int | None = None):
     """
-    Celery task for ARCA scraping.
-    Playwright MUST be initialized INSIDE the task (not at module level).
-    Run worker with: celery -A app.celery_app worker --pool=solo --loglevel=info
+    Celery task for ARCA scraping: claims the consulta from the durable queue
+    (plus its queued same-credential siblings) and runs it through the shared
+    job core (app/tasks/jobs.py) on this worker process's persistent event
+    loop, so its browser pool is reused across tasks. A task whose consulta is
+    already claimed or done (duplicate delivery, sibling of another group) is
+    skipped. Failures are retried through the queue, not by Celery.
+    Run worker with: celery -A app.celery_app worker --pool=prefork --concurrency=N
     """
-    with SyncSession() as db:
-        consulta = db.get(Consulta, consulta_id)
-        if not consulta or consulta.tenant_id != tenant_id:
-            logger.error(f"Consulta {consulta_id} no encontrada o no pertenece al tenant {tenant_id}")
-            return {"error": "Consulta no encontrada"}
-
-        cliente = db.get(Cliente, consulta.cliente_id)
-        if not cliente:
-            consulta.estado = "error"
-            consulta.error_detalle = "Cliente no encontrado"
-            db.commit()
-            return {"error": "Cliente no encontrado"}
-
-        # Update status to en_proceso
-        consulta.estado = "en_proceso"
-        db.commit()
-
-        try:
-            # Import and create scraper INSIDE the task
-            from app.services.scraper import ARCAScraper
-
-            download_dir = os.environ.get("DOWNLOAD_DIR", "descargas")
-            scraper = ARCAScraper(
-                headless=True,
-                min_delay=float(os.environ.get("MIN_DELAY", "1.5")),
-                max_delay=float(os.environ.get("MAX_DELAY", "3.5")),
-                download_base_dir=download_dir,
-            )
-
-            resultado = scraper.ejecutar_consulta(
-                cuit_login=cliente.cuit_login,
-                clave_fiscal=cliente.clave_fiscal,
-                cuit_consulta=cliente.cuit_consulta,
-                periodo=consulta.periodo,
-                tenant_id=tenant_id,
-            )
-
-            if resultado["exito"]:
-                consulta.estado = "exitoso"
-                consulta.archivo_csv = resultado.get("archivo")
-            else:
-                consulta.estado = "error"
-                consulta.error_detalle = resultado.get("error", "Error desconocido")
-
-            db.commit()
-
-            # Send email notification if batch is complete
-            _check_and_notify_batch_complete(db, tenant_id)
-
-            return resultado
-
-        except Exception as e:
-            consulta.estado = "error"
-            consulta.error_detalle = str(e)
-            db.commit()
-            logger.error(f"Error en scraping consulta {consulta_id}: {e}", exc_info=True)
-            raise
-
-
-def _check_and_notify_batch_complete(db: Session, tenant_id: int):
-    """Check if all pending consultations are done and send notification."""
-    pending = db.scalar(
-        select(Consulta)
-        .where(
-            Consulta.tenant_id == tenant_id,
-            Consulta.estado.in_(["pendiente", "en_proceso"]),
-        )
-    )
-    if pending is None:
-        # All done - trigger email notification
-        try:
-            from app.services.email import notify_batch_complete
-            notify_batch_complete(db, tenant_id)
-        except Exception as e:
-            logger.warning(f"Error enviando notificacion: {e}")
+    from app.services.scraper import run_sync
+
+    owner = f"celery:{socket.gethostname()}:{os.getpid()}:{self.request.id}"
+    claim = claim_consulta(consulta_id, owner)
+    if claim is None:
+        logger.info(f"Consulta {consulta_id} ya tomada o fuera de la cola, se omite")
+        return {"omitida": True}
+
+    logger.info(f"Celery procesando consultas {claim['consulta_ids']} (tenant {claim['tenant_id']})")
+    resultado = run_sync(_run_claim(claim, owner))
+    if resultado is None:
+        return {"consulta_ids": claim["consulta_ids"], "ejecutada": False}
+
+    if resultado["reencoladas"]:
+        dispatch_consultas(resultado["reencoladas"], countdown=REINTENTO_COUNTDOWN_S)
+    return {"consulta_ids": claim["consulta_ids"], "reencoladas": resultado["reencoladas"]}
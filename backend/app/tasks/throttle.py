@@ -0,0 +1,240 @@
+"""
+Scheduling-side throttle for ARCA sessions.
+
+Every ARCA session (one login, N targets) takes a token from a global bucket
+and from the bucket of its cuit_login before it starts. The global rate
+adapts AIMD-style: +1 session/min per healthy result, halved (at most once
+per DECREASE_EVERY_S) on a transient error (timeout / arca_error). A circuit
+breaker opens when the transient error rate over the last results crosses a
+threshold: dispatch pauses, then a single probe session is let through and
+its result closes the breaker or re-opens it with a longer pause.
+
+All of this state lives in the process that opens the sessions. With several
+such processes (celery prefork children, runner replicas) the configured
+rates (and the +1 step) are split among procesos_arca() of them, so their
+sum stays at the configured global limit. Each breaker only pauses its own
+process, and the cuit_login spacing holds within a process (queued
+consultas of one credential are grouped into one session at claim time).
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from app.config import settings
+
+logger = logging.getLogger("task_runner")
+
+DECREASE_EVERY_S = 10.0
+MAX_CREDENTIAL_BUCKETS = 10000
+POLL_S = 1.0
+PROBE_TIMEOUT_S = 600.0
+
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate = rate_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        # now puede ser anterior a la creacion del bucket (tomado antes por el llamador)
+        if now <= self.updated:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 = available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else POLL_S
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class CircuitBreaker:
+    """cerrado -> abierto (pausa) -> semiabierto (una sesion de prueba) -> cerrado | abierto."""
+
+    def __init__(self, threshold: float, window: int, pause_s: float, max_pause_s: float):
+        self.threshold = threshold
+        self.min_samples = max(1, window // 2)
+        self.pause_s = pause_s
+        self.max_pause_s = max_pause_s
+        self.results: deque[bool] = deque(maxlen=window)  # True = error transitorio
+        self.state = "cerrado"
+        self.current_pause = pause_s
+        self.open_until = 0.0
+        self.probe_since: float | None = None
+
+    def wait_time(self, now: float) -> float:
+        if self.state == "cerrado":
+            return 0.0
+        if self.state == "abierto":
+            if now < self.open_until:
+                return self.open_until - now
+            self.state = "semiabierto"
+            self.probe_since = None
+        # semiabierto: una sola sesion de prueba a la vez (se libera si nunca reporta)
+        if self.probe_since is not None and now - self.probe_since < PROBE_TIMEOUT_S:
+            return POLL_S
+        return 0.0
+
+    def dispatched(self, now: float):
+        if self.state == "semiabierto":
+            self.probe_since = now
+
+    def cancel(self):
+        """A dispatched session did not run: let another probe through."""
+        self.probe_since = None
+
+    def record(self, transient: bool, now: float):
+        if self.state == "semiabierto":
+            if transient:
+                self.current_pause = min(self.current_pause * 2, self.max_pause_s)
+                self._open(now, "la sesion de prueba fallo")
+            else:
+                self.state = "cerrado"
+                self.current_pause = self.pause_s
+                self.results.clear()
+                self.probe_since = None
+                logger.info("[THROTTLE] Circuito cerrado: ARCA respondio a la sesion de prueba")
+            return
+        self.results.append(transient)
+        if self.state == "cerrado" and len(self.results) >= self.min_samples and self.error_rate() >= self.threshold:
+            self._open(now, f"tasa de errores transitorios {self.error_rate():.0%}")
+
+    def _open(self, now: float, motivo: str):
+        self.state = "abierto"
+        self.open_until = now + self.current_pause
+        self.probe_since = None
+        logger.warning(f"[THROTTLE] Circuito abierto por {self.current_pause:.0f}s ({motivo})")
+
+    def error_rate(self) -> float:
+        return sum(self.results) / len(self.results) if self.results else 0.0
+
+
+def procesos_arca() -> int:
+    """Processes that open ARCA sessions, each with its own throttle."""
+    if settings.SCRAPER_PROCESOS_ARCA > 0:
+        return settings.SCRAPER_PROCESOS_ARCA
+    return max(1, settings.CELERY_CONCURRENCY) if settings.TASK_BACKEND == "celery" else 1
+
+
+class AdaptiveThrottle:
+    def __init__(self):
+        self.procesos = procesos_arca()
+        # This process's share of the global rates
+        self.max_rate = settings.SCRAPER_RATE_MAX / self.procesos
+        self.min_rate = min(settings.SCRAPER_RATE_MIN / self.procesos, self.max_rate)
+        self.rate = self.max_rate  # sesiones por minuto
+        self.global_bucket = TokenBucket(self.rate / 60, max(1, settings.SCRAPER_CONCURRENCY))
+        self.credential_interval_s = settings.SCRAPER_RATE_CUIT_S
+        self.credentials: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.breaker = CircuitBreaker(
+            threshold=settings.SCRAPER_BREAKER_UMBRAL,
+            window=settings.SCRAPER_BREAKER_VENTANA,
+            pause_s=settings.SCRAPER_BREAKER_PAUSA_S,
+            max_pause_s=settings.SCRAPER_BREAKER_PAUSA_MAX_S,
+        )
+        self.last_decrease = 0.0
+        self.waiting = 0
+        self.counts = {"sesiones": 0, "ok": 0, "transitorios": 0}
+
+    def _credential(self, cuit_login: str) -> TokenBucket:
+        bucket = self.credentials.get(cuit_login)
+        if bucket is None:
+            rate = 1 / self.credential_interval_s if self.credential_interval_s > 0 else 1e9
+            bucket = self.credentials[cuit_login] = TokenBucket(rate, 1)
+            while len(self.credentials) > MAX_CREDENTIAL_BUCKETS:
+                self.credentials.popitem(last=False)
+        self.credentials.move_to_end(cuit_login)
+        return bucket
+
+    def _try_acquire(self, cuit_login: str) -> float:
+        now = time.monotonic()
+        credential = self._credential(cuit_login)
+        wait = max(
+            self.breaker.wait_time(now),
+            self.global_bucket.wait_time(now),
+            credential.wait_time(now),
+        )
+        if wait > 0:
+            return wait
+        self.global_bucket.take(now)
+        credential.take(now)
+        self.breaker.dispatched(now)
+        self.counts["sesiones"] += 1
+        return 0.0
+
+    async def acquire(self, cuit_login: str):
+        """Wait until an ARCA session for cuit_login may start."""
+        self.waiting += 1
+        try:
+            while (wait := self._try_acquire(cuit_login)) > 0:
+                await asyncio.sleep(min(wait, POLL_S))
+        finally:
+            self.waiting -= 1
+
+    def cancel(self):
+        """The acquired session did not run (e.g. its consultas were gone)."""
+        self.breaker.cancel()
+
+    def record(self, transient: bool):
+        """Feed back the outcome of one consulta (transient = timeout / arca_error)."""
+        now = time.monotonic()
+        self.breaker.record(transient, now)
+        if transient:
+            self.counts["transitorios"] += 1
+            if now - self.last_decrease >= DECREASE_EVERY_S:
+                self.last_decrease = now
+                self._set_rate(self.rate / 2)
+                logger.info(f"[THROTTLE] Error transitorio: ritmo global {self.rate:.1f} sesiones/min")
+        else:
+            self.counts["ok"] += 1
+            self._set_rate(self.rate + 1 / self.procesos)
+
+    def _set_rate(self, rate: float):
+        self.rate = max(self.min_rate, min(self.max_rate, rate))
+        self.global_bucket.rate = self.rate / 60
+
+    def stats(self, detalle: bool = False) -> dict:
+        now = time.monotonic()
+        data = {
+            "ritmo_sesiones_min": round(self.rate, 2),
+            "ritmo_min": self.min_rate,
+            "ritmo_max": self.max_rate,
+            "alcance": "proceso",
+            "procesos": self.procesos,
+            "circuito": self.breaker.state,
+            "reabre_en_s": round(max(0.0, self.breaker.open_until - now)) if self.breaker.state == "abierto" else None,
+            "tasa_errores": round(self.breaker.error_rate(), 3),
+            "esperando": self.waiting,
+            **self.counts,
+        }
+        if detalle:
+            data["credenciales"] = {
+                cuit: round(b.wait_time(now), 1)
+                for cuit, b in self.credentials.items()
+                if not b.full(now)
+            }
+        return data
+
+
+_throttle: AdaptiveThrottle | None = None
+
+
+def get_throttle() -> AdaptiveThrottle:
+    global _throttle
+    if _throttle is None:
+        _throttle = AdaptiveThrottle()
+    return _throttle
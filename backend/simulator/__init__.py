@@ -0,0 +1,8 @@
+"""
+Simulador local de ARCA (login, portal y SETI) para correr el scraper offline.
+
+    uvicorn simulator.app:app --port 8765
+    ARCA_BASE_URL=http://127.0.0.1:8765 ...
+
+Ver simulator/app.py (contratos de DOM) y simulator/benchmark.py.
+"""
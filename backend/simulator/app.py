@@ -0,0 +1,473 @@
+"""
+App FastAPI que reproduce los contratos de DOM de ARCA que usa el scraper:
+
+- /contribuyente_/login.xhtml: #F1:username, #F1:btnSiguiente, #F1:password,
+  #F1:btnIngresar y .form-error.
+- /portal/app/: #buscadorInput con resultados [id*='rbt-menu-item'] y el
+  acceso directo "Presentación de DDJJ y Pagos" (abre SETI en otra pestaña).
+- /setiweb/: modal de juramento (Aceptar), sidebar "Consulta", multi-selects
+  con caret (multi-select-N_caret) y opciones (multi-select-N-multiselect-option-V)
+  asociados por label, "Ver consulta" (XHR JSON), tabla de resultados,
+  EXPORTAR -> CSV (descarga) y logout por div.dropdown -> "Si".
+- Recursos decorativos como los de ARCA (logo, banner, fuente web) que el
+  bloqueo de recursos debe poder abortar sin romper el flujo, y una imagen
+  de captcha que debe pasar siempre.
+
+Configuracion (env o PUT /_sim/config): latencia por request, filas por
+consulta y tasa de fallos inyectados por paso (login, portal, consulta, export).
+"""
+
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+from collections import Counter
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from pydantic import BaseModel, Field
+
+PASOS_CON_FALLO = ("login", "portal", "consulta", "export")
+
+
+class SimConfig(BaseModel):
+    latencia_ms: int = 100
+    filas: int = 20
+    por_pagina: int = 0  # filas por pagina de la tabla; 0 = sin paginar
+    fallos: dict[str, float] = Field(default_factory=dict)
+    cuits: list[str] = Field(default_factory=lambda: [f"2000000000{i}" for i in range(1, 6)])
+
+
+def _config_desde_env() -> SimConfig:
+    fallos = {}
+    for par in os.environ.get("SIM_FALLOS", "").split(","):
+        if "=" in par:
+            paso, tasa = par.split("=", 1)
+            fallos[paso.strip()] = float(tasa)
+    return SimConfig(
+        latencia_ms=int(os.environ.get("SIM_LATENCIA_MS", 100)),
+        filas=int(os.environ.get("SIM_FILAS", 20)),
+        por_pagina=int(os.environ.get("SIM_POR_PAGINA", 0)),
+        fallos=fallos,
+    )
+
+
+app = FastAPI(title="Simulador ARCA")
+app.state.config = _config_desde_env()
+app.state.stats = Counter()
+
+
+def _cfg() -> SimConfig:
+    return app.state.config
+
+
+def _falla(paso: str) -> bool:
+    tasa = _cfg().fallos.get(paso, 0)
+    if tasa and random.random() < tasa:
+        app.state.stats[f"fallo_{paso}"] += 1
+        return True
+    return False
+
+
+@app.middleware("http")
+async def latencia(request: Request, call_next):
+    app.state.stats[request.url.path] += 1
+    if not request.url.path.startswith("/_sim"):
+        await asyncio.sleep(_cfg().latencia_ms * random.uniform(0.5, 1.5) / 1000)
+    return await call_next(request)
+
+
+def _pagina(html: str, **valores) -> HTMLResponse:
+    valores.setdefault("LAT", _cfg().latencia_ms)
+    for clave, valor in valores.items():
+        html = html.replace(f"__{clave}__", json.dumps(valor) if not isinstance(valor, str) else valor)
+    return HTMLResponse(html)
+
+
+def _sesion(request: Request) -> str | None:
+    return request.cookies.get("sim_sesion")
+
+
+# ─── Login ────────────────────────────────────────────────────────────────────
+
+LOGIN_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>ARCA - Acceso con Clave Fiscal</title></head>
+<body>
+<img src="/img/logo-arca.png" alt="ARCA">
+<img src="/captcha/imagen.png" alt="">
+<form id="F1" onsubmit="return false">
+  <div id="paso-cuit">
+    <label for="F1:username">CUIT/CUIL</label>
+    <input id="F1:username" name="F1:username" autocomplete="off">
+    <button type="button" id="F1:btnSiguiente">Siguiente</button>
+  </div>
+  <div id="paso-clave" style="display:none">
+    <label for="F1:password">Clave</label>
+    <input id="F1:password" type="password">
+    <button type="button" id="F1:btnIngresar">Ingresar</button>
+  </div>
+  <div class="form-error" style="display:none"></div>
+</form>
+<script>
+const LAT = __LAT__;
+const $ = (id) => document.getElementById(id);
+function mostrarError(msg) {
+  const e = document.querySelector('.form-error');
+  e.textContent = msg;
+  e.style.display = '';
+}
+$('F1:btnSiguiente').onclick = () => {
+  const cuit = $('F1:username').value.replace(/-/g, '');
+  setTimeout(() => {
+    if (!/^\\d{11}$/.test(cuit)) { mostrarError('El CUIT ingresado es incorrecto'); return; }
+    $('paso-cuit').style.display = 'none';
+    $('paso-clave').style.display = '';
+  }, LAT);
+};
+$('F1:btnIngresar').onclick = async () => {
+  const r = await fetch('/contribuyente_/login', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({cuit: $('F1:username').value.replace(/-/g, ''), clave: $('F1:password').value}),
+  });
+  if (r.ok) { location.href = '/portal/app/'; }
+  else { mostrarError((await r.json()).detail); }
+};
+</script>
+</body></html>"""
+
+
+class _Login(BaseModel):
+    cuit: str
+    clave: str
+
+
+@app.get("/contribuyente_/login.xhtml")
+async def login_page():
+    return _pagina(LOGIN_HTML)
+
+
+@app.post("/contribuyente_/login")
+async def login(payload: _Login):
+    if payload.clave == "mala" or _falla("login"):
+        raise HTTPException(status_code=401, detail="Clave o usuario incorrecto")
+    resp = JSONResponse({"ok": True})
+    resp.set_cookie("sim_sesion", payload.cuit, httponly=True)
+    return resp
+
+
+@app.get("/contribuyente_/logout.xhtml")
+async def logout():
+    resp = HTMLResponse("<!doctype html><html><body><p>Sesion finalizada</p></body></html>")
+    resp.delete_cookie("sim_sesion")
+    return resp
+
+
+# ─── Portal ───────────────────────────────────────────────────────────────────
+
+PORTAL_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Portal ARCA</title>
+<style>
+  @font-face { font-family: Encode; src: url('/fonts/encode-sans.woff2') format('woff2'); }
+  body { font-family: Encode, sans-serif; }
+  #menu a { display: block; } .dropdown { float: right; }
+</style></head>
+<body>
+<header><img src="/img/logo-arca.png" alt="ARCA"><div class="dropdown"><span>__CUIT__</span></div></header>
+<img src="/banners/aviso-vencimientos.png" alt="">
+<input id="buscadorInput" placeholder="¿Qué necesitás hacer?" autocomplete="off">
+<div id="menu" role="listbox"></div>
+<section id="mas-utilizados">
+  <h3>Servicios | Más utilizados</h3>
+  __ACCESOS__
+</section>
+<section id="servicios"><h3>Mis servicios</h3>__LINKS__</section>
+<script>
+const LAT = __LAT__;
+const SERVICIOS = __SERVICIOS__;
+const menu = document.getElementById('menu');
+document.getElementById('buscadorInput').addEventListener('input', (ev) => {
+  const q = ev.target.value.toLowerCase();
+  setTimeout(() => {
+    menu.innerHTML = '';
+    if (!q) return;
+    SERVICIOS.filter(s => s.nombre.toLowerCase().normalize('NFD').replace(/[\\u0300-\\u036f]/g, '')
+      .includes(q.normalize('NFD').replace(/[\\u0300-\\u036f]/g, ''))).forEach((s, i) => {
+      const a = document.createElement('a');
+      a.id = 'rbt-menu-item-' + i;
+      a.href = '#';
+      a.textContent = s.nombre;
+      a.onclick = (e) => { e.preventDefault(); window.open(s.url, '_blank'); };
+      menu.appendChild(a);
+    });
+  }, LAT);
+});
+</script>
+</body></html>"""
+
+SERVICIOS = [
+    {"nombre": "Presentación de DDJJ y Pagos", "url": "/setiweb/"},
+    {"nombre": "DDJJ Ley 17.250", "url": "/otro/"},
+    {"nombre": "Mis Comprobantes", "url": "/otro/"},
+    {"nombre": "Sistema Registral", "url": "/otro/"},
+]
+
+
+@app.get("/portal/app/")
+async def portal(request: Request):
+    cuit = _sesion(request)
+    if not cuit:
+        return RedirectResponse("/contribuyente_/login.xhtml")
+    servicios = [s for s in SERVICIOS if not (s["url"] == "/setiweb/" and _falla("portal"))]
+    accesos = "".join(f'<a href="{s["url"]}" target="_blank">{s["nombre"]}</a><br>' for s in servicios[:2])
+    links = "".join(f'<a href="{s["url"]}" target="_blank">{s["nombre"]}</a><br>' for s in servicios)
+    return _pagina(PORTAL_HTML, CUIT=cuit, ACCESOS=accesos, LINKS=links, SERVICIOS=servicios)
+
+
+# ─── SETI ─────────────────────────────────────────────────────────────────────
+
+SETI_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>SETI - Presentación de DDJJ y Pagos</title>
+<script src="/setiweb/static/app.v1.js"></script>
+<style>
+  .opciones li { cursor: pointer; }
+  .modal { border: 1px solid #333; padding: 1em; }
+  .dropdown { float: right; }
+</style></head>
+<body>
+<header>
+  <img src="/img/logo-arca.png" alt="ARCA">
+  <div class="dropdown"><span>__CUIT__</span>
+    <div id="menu-usuario" style="display:none">¿Desea cerrar la sesión?
+      <button onclick="location.href='/contribuyente_/logout.xhtml'">Si</button>
+    </div>
+  </div>
+</header>
+<nav><a href="#/presentacion/consulta">Consulta</a></nav>
+<div id="juramento" class="modal">
+  Declaro bajo juramento que los datos consignados son correctos.
+  <button id="btn-juramento">Aceptar</button>
+</div>
+<main id="vista"></main>
+<script>
+const LAT = __LAT__;
+const CUITS = __CUITS__;
+const MESES = ['1', '2', '3', '6', '12'];
+const POR_PAGINA = __POR_PAGINA__;
+const estado = {cuits: new Set(), meses: null};
+document.querySelector('.dropdown span').onclick = () => {
+  document.getElementById('menu-usuario').style.display = '';
+};
+document.getElementById('btn-juramento').onclick = () => {
+  setTimeout(() => document.getElementById('juramento').remove(), LAT);
+};
+
+function multiSelect(n) {
+  const base = 'multi-select-' + n;
+  return `<div class="multi-select" id="${base}"><span class="valor"></span>` +
+    `<span id="${base}_caret" class="caret" data-n="${n}">&#9662;</span>` +
+    `<ul class="opciones" id="${base}-lista"></ul></div>`;
+}
+
+function abrir(n, valores, multiple, clave) {
+  const base = 'multi-select-' + n;
+  const lista = document.getElementById(base + '-lista');
+  if (lista.children.length) { lista.innerHTML = ''; return; }
+  setTimeout(() => {
+    lista.innerHTML = '';
+    valores.forEach(v => {
+      const li = document.createElement('li');
+      li.id = `${base}-multiselect-option-${v}`;
+      li.textContent = v;
+      const marcada = multiple ? estado[clave].has(v) : estado[clave] === v;
+      li.setAttribute('aria-selected', marcada ? 'true' : 'false');
+      li.addEventListener('click', () => {
+        if (multiple) {
+          estado[clave].has(v) ? estado[clave].delete(v) : estado[clave].add(v);
+          li.setAttribute('aria-selected', estado[clave].has(v) ? 'true' : 'false');
+        } else {
+          estado[clave] = v;
+          lista.innerHTML = '';
+        }
+        document.querySelector(`#${base} .valor`).textContent =
+          multiple ? Array.from(estado[clave]).join(', ') : estado[clave];
+      });
+      lista.appendChild(li);
+    });
+  }, Math.round(LAT / 2));
+}
+
+function renderConsulta() {
+  document.getElementById('vista').innerHTML = `
+    <h2>Consulta de Declaraciones Juradas</h2>
+    <div class="form-group"><label>Presentada por el Usuario</label>${multiSelect(3)}</div>
+    <div class="form-group"><label>Cuit del Contribuyente</label>${multiSelect(1)}</div>
+    <div class="form-group"><label>Presentadas en los últimos</label>${multiSelect(2)}<span>meses</span></div>
+    <button id="btn-ver">Ver consulta</button>
+    <div id="aviso"></div>
+    <div id="resultados"></div>`;
+  document.getElementById('multi-select-1_caret').onclick = () => abrir(1, CUITS, true, 'cuits');
+  document.getElementById('multi-select-2_caret').onclick = () => abrir(2, MESES, false, 'meses');
+  document.getElementById('multi-select-3_caret').onclick = () => {};
+  document.getElementById('btn-ver').onclick = verConsulta;
+}
+
+async function verConsulta() {
+  const aviso = document.getElementById('aviso');
+  const res = document.getElementById('resultados');
+  res.innerHTML = '';
+  if (!estado.cuits.size || !estado.meses) {
+    aviso.innerHTML = '<div class="modal">Debe seleccionar un CUIT y un período. ' +
+      '<button onclick="document.getElementById(\\'aviso\\').innerHTML=\\'\\'">Aceptar</button></div>';
+    return;
+  }
+  const qs = `cuits=${Array.from(estado.cuits).join(',')}&meses=${estado.meses}`;
+  const r = await fetch('/setiweb/api/consulta?' + qs);
+  if (!r.ok) { aviso.innerHTML = '<div class="modal">Error en plataforma</div>'; return; }
+  const data = await r.json();
+  if (!data.presentaciones.length) { res.innerHTML = '<p>No se encontraron resultados</p>'; return; }
+  res.innerHTML = `<button id="btn-exportar">EXPORTAR</button>
+    <div id="menu-exportar" style="display:none">
+      <a href="/setiweb/api/export.csv?${qs}" download>CSV</a> <span>PDF</span>
+    </div>
+    <table><thead><tr><th>Estado</th><th>CUIT/CUIL</th><th>Formulario</th><th>Período</th>
+    <th>Transacción</th><th>Fecha Presentación</th></tr></thead><tbody></tbody></table>
+    <ul class="pagination"></ul>`;
+  document.getElementById('btn-exportar').onclick = () => {
+    setTimeout(() => { document.getElementById('menu-exportar').style.display = ''; }, Math.round(LAT / 2));
+  };
+  renderPagina(data.presentaciones, 0);
+}
+
+function renderPagina(todas, pagina) {
+  const tam = POR_PAGINA || todas.length;
+  const filas = todas.slice(pagina * tam, (pagina + 1) * tam);
+  document.querySelector('#resultados tbody').innerHTML = filas.map(p =>
+    `<tr><td>${p.estado}</td><td>${p.cuit}</td><td>${p.formulario}</td><td>${p.periodo}</td>` +
+    `<td>${p.nroTransaccion}</td><td>${p.fechaPresentacion}</td></tr>`).join('');
+  const paginador = document.querySelector('#resultados .pagination');
+  if (!POR_PAGINA) return;
+  const ultima = (pagina + 1) * tam >= todas.length;
+  paginador.innerHTML = `<li class="page-item active"><span>Página ${pagina + 1}</span></li>` +
+    `<li class="page-item${ultima ? ' disabled' : ''}"><a class="page-link" href="#" aria-label="Next">&rsaquo;</a></li>`;
+  paginador.querySelector('a[aria-label="Next"]').onclick = (e) => {
+    e.preventDefault();
+    if (!ultima) setTimeout(() => renderPagina(todas, pagina + 1), Math.round(LAT / 2));
+  };
+}
+
+function rutear() {
+  if (location.hash === '#/presentacion/consulta') setTimeout(renderConsulta, LAT);
+}
+window.addEventListener('hashchange', rutear);
+rutear();
+</script>
+</body></html>"""
+
+
+@app.get("/setiweb/")
+async def seti(request: Request):
+    cuit = _sesion(request)
+    if not cuit:
+        return RedirectResponse("/contribuyente_/login.xhtml")
+    cuits = list(dict.fromkeys([cuit, *_cfg().cuits]))
+    return _pagina(SETI_HTML, CUIT=cuit, CUITS=cuits, POR_PAGINA=_cfg().por_pagina)
+
+
+@app.get("/setiweb/static/app.v1.js")
+async def seti_js():
+    return Response("/* version de la SPA */", media_type="application/javascript")
+
+
+def _presentaciones(cuits: list[str], meses: int) -> list[dict]:
+    filas = []
+    formularios = ["F. 931", "F. 2002", "F. 731", "F. 2051"]
+    for cuit in cuits:
+        for i in range(_cfg().filas):
+            anio, mes = divmod(2026 * 12 + 9 - (i % max(meses, 1)), 12)
+            semilla = hashlib.sha1(f"{cuit}-{meses}-{i}".encode()).hexdigest()
+            filas.append({
+                "estado": "Presentada",
+                "cuit": cuit,
+                "formulario": formularios[i % len(formularios)],
+                "periodo": f"{anio}{mes + 1:02d}",
+                "nroTransaccion": str(int(semilla[:8], 16)),
+                "fechaPresentacion": f"{anio}-{mes + 1:02d}-{1 + int(semilla[8:10], 16) % 28:02d}",
+            })
+    return filas
+
+
+def _parametros(request: Request) -> tuple[list[str], int]:
+    cuits = [c for c in request.query_params.get("cuits", "").split(",") if c]
+    return cuits, int(request.query_params.get("meses", "1"))
+
+
+@app.get("/setiweb/api/consulta")
+async def api_consulta(request: Request):
+    if not _sesion(request):
+        raise HTTPException(status_code=401)
+    if _falla("consulta"):
+        # Sin respuesta util dentro del timeout del scraper
+        await asyncio.sleep(60)
+    presentaciones = _presentaciones(*_parametros(request))
+    return {"total": len(presentaciones), "presentaciones": presentaciones}
+
+
+@app.get("/setiweb/api/export.csv")
+async def api_export(request: Request):
+    if not _sesion(request):
+        raise HTTPException(status_code=401)
+    if _falla("export"):
+        raise HTTPException(status_code=500, detail="Error en plataforma")
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=";")
+    writer.writerow(["Estado", "CUIT/CUIL", "Formulario", "Período", "Transacción", "Fecha Presentación"])
+    for p in _presentaciones(*_parametros(request)):
+        writer.writerow([p["estado"], p["cuit"], p["formulario"], p["periodo"], p["nroTransaccion"], p["fechaPresentacion"]])
+    return Response(
+        buf.getvalue().encode("utf-8-sig"),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="consulta_ddjj.csv"'},
+    )
+
+
+@app.get("/otro/")
+async def otro_servicio():
+    return HTMLResponse("<!doctype html><html><body><h1>Otro servicio</h1></body></html>")
+
+
+# Recursos decorativos (contenido irrelevante; importa el Content-Length)
+_RECURSO = b"\x89PNG\r\n\x1a\n" + b"\0" * 2048
+
+
+@app.get("/img/{nombre}")
+@app.get("/banners/{nombre}")
+@app.get("/fonts/{nombre}")
+@app.get("/captcha/{nombre}")
+async def recurso(nombre: str):
+    media_type = "font/woff2" if nombre.endswith(".woff2") else "image/png"
+    return Response(_RECURSO, media_type=media_type)
+
+
+# ─── Control del simulador ────────────────────────────────────────────────────
+
+@app.get("/_sim/config")
+async def get_config():
+    return _cfg()
+
+
+@app.put("/_sim/config")
+async def put_config(config: SimConfig):
+    desconocidos = set(config.fallos) - set(PASOS_CON_FALLO)
+    if desconocidos:
+        raise HTTPException(status_code=422, detail=f"Pasos sin inyeccion de fallos: {sorted(desconocidos)}")
+    app.state.config = config
+    return config
+
+
+@app.get("/_sim/stats")
+async def get_stats():
+    return dict(app.state.stats)
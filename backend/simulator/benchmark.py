@@ -0,0 +1,165 @@
+"""
+Benchmark end-to-end del scraper contra el simulador local.
+
+    cd backend
+    python -m simulator.benchmark --jobs 20 --concurrencia 1,2,4 --latencia-ms 150 --filas 50
+
+Levanta el simulador en un puerto libre y, para cada nivel de concurrencia,
+corre N consultas con el motor async y el pool de navegadores. Reporta
+consultas/hora, p50/p95 por paso (spans de ejecutar_sesion), errores por
+categoria y el pico de RSS del arbol de procesos (driver + Chromium).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Sin persistir la tabla de navegacion ni screenshots: el simulador no debe
+# ensenarle URLs al scraper real
+os.environ.setdefault("NAV_STATS_FILE", "")
+os.environ.setdefault("SCREENSHOT_MODE", "off")
+
+import uvicorn  # noqa: E402
+
+from app.services.browser_pool import BrowserPool, rss_arbol_mb  # noqa: E402
+from app.services.scraper import clasificar_error  # noqa: E402
+from app.services.scraper_async import AsyncARCAScraper  # noqa: E402
+from simulator.app import SimConfig, app as sim_app  # noqa: E402
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _levantar_simulador(puerto: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(sim_app, host="127.0.0.1", port=puerto, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method="inclusive")[int(p) - 1]
+
+
+async def _medir_rss(picos: list[float], parar: asyncio.Event):
+    while not parar.is_set():
+        picos.append(await asyncio.to_thread(rss_arbol_mb, os.getpid()))
+        try:
+            await asyncio.wait_for(parar.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def correr(base_url: str, jobs: int, concurrencia: int, ritmo: str, headless: bool, cuits: list[str]) -> dict:
+    pool = BrowserPool(headless=headless, max_contextos=max(1, concurrencia))
+    semaforo = asyncio.Semaphore(concurrencia)
+    descargas = tempfile.mkdtemp(prefix="bench_")
+    resultados = []
+
+    async def job(i: int):
+        async with semaforo:
+            scraper = AsyncARCAScraper(
+                headless=headless,
+                download_base_dir=descargas,
+                pool=pool,
+                ritmo=ritmo,
+                base_url=base_url,
+            )
+            resultados.append(await scraper.ejecutar_consulta(f"2011111111{i % 10}", "clave", cuits[i % len(cuits)], "3"))
+
+    rss: list[float] = []
+    parar = asyncio.Event()
+    monitor = asyncio.create_task(_medir_rss(rss, parar))
+    inicio = time.perf_counter()
+    try:
+        await asyncio.gather(*(job(i) for i in range(jobs)))
+    finally:
+        duracion = time.perf_counter() - inicio
+        parar.set()
+        await monitor
+        await pool.cerrar()
+
+    pasos = defaultdict(list)
+    for r in resultados:
+        for span in r.get("pasos", []):
+            pasos[span["paso"]].append(span["duracion_ms"])
+    exitosas = sum(1 for r in resultados if r["exito"])
+    return {
+        "concurrencia": concurrencia,
+        "jobs": jobs,
+        "exitosas": exitosas,
+        "duracion_s": round(duracion, 1),
+        "jobs_hora": round(exitosas / duracion * 3600),
+        "rss_pico_mb": round(max(rss, default=0)),
+        "errores": dict(Counter(clasificar_error(r.get("error", "")) for r in resultados if not r["exito"])),
+        "pasos": {
+            paso: {"n": len(v), "p50_ms": round(_percentil(v, 50)), "p95_ms": round(_percentil(v, 95))}
+            for paso, v in pasos.items()
+        },
+    }
+
+
+def _imprimir(reporte: dict):
+    print(
+        f"\nconcurrencia={reporte['concurrencia']}  exitosas={reporte['exitosas']}/{reporte['jobs']}  "
+        f"{reporte['duracion_s']}s  {reporte['jobs_hora']} consultas/h  RSS pico {reporte['rss_pico_mb']} MB"
+    )
+    if reporte["errores"]:
+        print(f"  errores: {reporte['errores']}")
+    for paso, p in reporte["pasos"].items():
+        print(f"  {paso:<22} n={p['n']:<4} p50={p['p50_ms']:>6} ms  p95={p['p95_ms']:>6} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del scraper contra el simulador ARCA")
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--concurrencia", default="1,2,4", help="niveles separados por coma")
+    parser.add_argument("--latencia-ms", type=int, default=100)
+    parser.add_argument("--filas", type=int, default=20)
+    parser.add_argument("--por-pagina", type=int, default=0, help="paginar la tabla de resultados")
+    parser.add_argument("--fallos", default="", help="p.ej. login=0.05,consulta=0.1")
+    parser.add_argument("--ritmo", default="normal", choices=["cautious", "normal", "fast"])
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--json", help="guardar el reporte en este archivo")
+    args = parser.parse_args()
+
+    fallos = {p.split("=")[0]: float(p.split("=")[1]) for p in args.fallos.split(",") if "=" in p}
+    sim_app.state.config = SimConfig(
+        latencia_ms=args.latencia_ms, filas=args.filas, por_pagina=args.por_pagina, fallos=fallos,
+    )
+    puerto = _puerto_libre()
+    server = _levantar_simulador(puerto)
+    base_url = f"http://127.0.0.1:{puerto}"
+    print(f"Simulador en {base_url} (latencia {args.latencia_ms} ms, {args.filas} filas, fallos {fallos or '-'})")
+
+    reportes = []
+    try:
+        for nivel in (int(n) for n in args.concurrencia.split(",")):
+            reporte = asyncio.run(correr(
+                base_url, args.jobs, nivel, args.ritmo, not args.headed, sim_app.state.config.cuits,
+            ))
+            _imprimir(reporte)
+            reportes.append(reporte)
+    finally:
+        server.should_exit = True
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "reportes": reportes}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
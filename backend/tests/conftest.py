@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import pytest
+
+# Sin persistir la tabla de navegacion ni screenshots durante los tests
+os.environ.setdefault("NAV_STATS_FILE", "")
+os.environ.setdefault("SCREENSHOT_MODE", "off")
+
+# Tests contra Postgres: TEST_DATABASE_URL apunta a una base descartable
+# (se recrean las tablas). Sin ella esos tests se saltean.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+@pytest.fixture(scope="session")
+def esquema():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL no configurada")
+    import app.models  # noqa: F401
+    from app.db import Base
+    from app.main import migrar
+    from app.tasks.jobs import sync_engine
+
+    Base.metadata.drop_all(sync_engine)
+    # El mismo esquema que arma el arranque de la API (tablas, columnas e indices)
+    asyncio.run(con_conexion(migrar))
+    return sync_engine
+
+
+async def con_conexion(funcion):
+    """Run funcion(conn) in a transaction on a fresh async engine for this event loop."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+    try:
+        async with engine.begin() as conn:
+            return await funcion(conn)
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def db(esquema):
+    """Sesion sync sobre la base de tests, con las tablas vacias."""
+    from sqlalchemy import text
+
+    from app.db import Base
+    from app.tasks.jobs import SyncSession
+
+    tablas = ", ".join(t.name for t in Base.metadata.sorted_tables)
+    with esquema.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tablas} RESTART IDENTITY CASCADE"))
+    with SyncSession() as session:
+        yield session
@@ -0,0 +1,68 @@
+"""Coalescencia al encolar: una sola consulta activa por cliente y periodo."""
+
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.consultation import Consulta
+from app.routers.consultations import _crear_o_adjuntar, _reactivar
+from tests.conftest import con_conexion
+from tests.test_queue import _cliente, _consulta, _tenant
+
+
+def _en_sesion(funcion):
+    async def correr(conn):
+        return await funcion(AsyncSession(bind=conn))
+
+    return asyncio.run(con_conexion(correr))
+
+
+def test_repeated_requests_attach_to_the_active_consulta(db):
+    cliente = _cliente(db, _tenant(db), "20111111112")
+    db.commit()
+
+    def crear(sesion, periodo="12"):
+        return _crear_o_adjuntar(sesion, cliente.tenant_id, cliente.id, periodo, None)
+
+    consulta_id, coalescida = _en_sesion(crear)
+    assert not coalescida
+    assert _en_sesion(crear) == (consulta_id, True)
+    # Otro periodo es otra consulta
+    assert _en_sesion(lambda sesion: crear(sesion, "3"))[1] is False
+
+    # Terminada la activa, un pedido nuevo vuelve a crear una
+    db.get(Consulta, consulta_id).estado = "exitoso"
+    db.commit()
+    nueva_id, coalescida = _en_sesion(crear)
+    assert not coalescida and nueva_id != consulta_id
+
+
+def test_concurrent_requests_create_a_single_consulta(db):
+    cliente = _cliente(db, _tenant(db), "20111111112")
+    db.commit()
+
+    async def pedir():
+        return await asyncio.gather(*(
+            con_conexion(lambda conn: _crear_o_adjuntar(AsyncSession(bind=conn), cliente.tenant_id, cliente.id, "12", None))
+            for _ in range(6)
+        ))
+
+    resultados = asyncio.run(pedir())
+    assert len({consulta_id for consulta_id, _ in resultados}) == 1
+    assert sorted(coalescida for _, coalescida in resultados) == [False] + [True] * 5
+
+
+def test_retry_attaches_to_an_active_consulta_instead_of_duplicating(db):
+    cliente = _cliente(db, _tenant(db), "20111111112")
+    fallida = _consulta(db, cliente, estado="error", error_detalle="timeout")
+    db.commit()
+
+    assert _en_sesion(lambda s: _reactivar(s, db.get(Consulta, fallida.id))) == (fallida.id, False)
+    db.expire_all()
+    assert (fallida.estado, fallida.error_detalle) == ("pendiente", None)
+
+    otra = _consulta(db, cliente, estado="error")
+    db.commit()
+    assert _en_sesion(lambda s: _reactivar(s, db.get(Consulta, otra.id))) == (fallida.id, True)
+    db.expire_all()
+    assert otra.estado == "error"
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from app.services.ddjj_csv import clave_fila, escribir_csv, extraer_filas, leer_csv
+
+
+def _item(transaccion):
+    return {
+        "descEstado": "Presentada",
+        "cuit": "20-11111111-2",
+        "nroFormulario": "931",
+        "periodoFiscal": "202601",
+        "nroTransaccion": transaccion,
+        "fechaPresentacion": "15/02/2026 10:30:00",
+    }
+
+
+def test_extraer_filas_maps_a_complete_response():
+    payload = {"data": {"totalRegistros": 2, "items": [_item(1), _item(2)]}}
+    filas = extraer_filas(payload)
+    assert [f["transaccion"] for f in filas] == ["1", "2"]
+    assert filas[0] == {
+        "estado": "Presentada",
+        "cuit_cuil": "20-11111111-2",
+        "formulario": "931",
+        "periodo": "202601",
+        "transaccion": "1",
+        "fecha_presentacion": "15/02/2026 10:30:00",
+    }
+
+
+def test_extraer_filas_rejects_partial_or_foreign_lists():
+    # Sin total declarado, o con otro total (p. ej. una pagina de varias)
+    assert extraer_filas({"items": [_item(1)]}) is None
+    assert extraer_filas({"total": 5, "items": [_item(1), _item(2)]}) is None
+    # Objetos que no son presentaciones en la misma lista
+    assert extraer_filas({"total": 2, "items": [_item(1), {"id": 3, "nombre": "x"}]}) is None
+    assert extraer_filas({"total": True, "items": [_item(1)]}) is None
+
+
+def test_csv_round_trip(tmp_path):
+    filas = [
+        {"estado": "Presentada", "cuit_cuil": "20-11111111-2", "formulario": "931",
+         "periodo": f"2026{m:02d}", "transaccion": str(m), "fecha_presentacion": "15/02/2026"}
+        for m in range(1, 6)
+    ]
+    destino = tmp_path / "ddjj.csv"
+    assert escribir_csv(filas, str(destino)) == destino.stat().st_size
+    lotes = list(leer_csv(str(destino), tamano_lote=2))
+    assert [len(l) for l in lotes] == [2, 2, 1]
+    assert [f for l in lotes for f in l] == filas
+
+
+def test_leer_csv_arca_export_in_latin1_with_commas(tmp_path):
+    ruta = tmp_path / "arca.csv"
+    ruta.write_bytes(
+        "Estado,CUIT/CUIL,Formulario,Período,Transacción,Fecha Presentación\n"
+        "Presentada,20111111112,931,202601,123,01/02/2026\n"
+        ",,,,,\n".encode("latin-1")
+    )
+    assert list(leer_csv(str(ruta))) == [[{
+        "estado": "Presentada", "cuit_cuil": "20111111112", "formulario": "931",
+        "periodo": "202601", "transaccion": "123", "fecha_presentacion": "01/02/2026",
+    }]]
+
+
+def test_leer_csv_utf8_with_multibyte_char_at_probe_boundary(tmp_path):
+    encabezado = "Estado;CUIT/CUIL;Formulario;Período;Transacción;Fecha Presentación\n".encode("utf-8")
+    fila = "Presentada;20111111112;931;202601;{};01/02/2026\n"
+    cuerpo = b"".join(fila.format(i).encode("utf-8") for i in range(50))
+    # La "é" (2 bytes) queda partida entre los bytes 4095 y 4096 de la muestra
+    prefijo = b"Presentada;20111111112;931;202601;"
+    relleno = 4095 - len(encabezado) - len(cuerpo) - len(prefijo) - 1
+    ultima = prefijo + b"9" * relleno + ";é\n".encode("utf-8")
+    ruta = tmp_path / "borde.csv"
+    ruta.write_bytes(encabezado + cuerpo + ultima)
+    assert (encabezado + cuerpo + ultima)[4095:4097] == "é".encode("utf-8")
+
+    filas = [f for lote in leer_csv(str(ruta)) for f in lote]
+    assert len(filas) == 51
+    assert filas[-1]["fecha_presentacion"] == "é"
+
+
+def test_leer_csv_rejects_unknown_columns(tmp_path):
+    ruta = tmp_path / "otro.csv"
+    ruta.write_text("a;b;c\n1;2;3\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(leer_csv(str(ruta)))
+
+
+def test_clave_fila_prefers_transaccion():
+    fila = {"cuit_cuil": "20-11111111-2", "formulario": "931", "periodo": "202601",
+            "transaccion": " 123 ", "fecha_presentacion": "01/02/2026"}
+    assert clave_fila(fila) == ("t", "123")
+    sin_transaccion = {**fila, "transaccion": ""}
+    assert clave_fila(sin_transaccion) == clave_fila({**sin_transaccion, "cuit_cuil": "20111111112"})
+    assert clave_fila(sin_transaccion)[0] == "f"
+
+
+def test_unreadable_export_marks_the_leer_csv_step_as_failed(tmp_path):
+    from app.services.scraper_async import AsyncARCAScraper
+
+    (tmp_path / "otro.csv").write_text("a;b;c\n1;2;3\n", encoding="utf-8")
+    scraper = AsyncARCAScraper(download_base_dir=str(tmp_path))
+
+    async def al_filas(lote):
+        pass
+
+    r = asyncio.run(scraper._medir("leer_csv", scraper._entregar_csv("otro.csv", al_filas, 500)))
+    assert not r["exito"]
+    span = scraper._pasos_objetivo[-1]
+    assert (span["paso"], span["resultado"]) == ("leer_csv", "error")
+    assert "CSV no interpretable" in span["error"]
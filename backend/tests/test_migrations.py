@@ -0,0 +1,57 @@
+"""Migraciones del arranque: idempotentes y seguras con varios procesos a la vez."""
+
+import asyncio
+
+from sqlalchemy import select, text
+
+from app.db import Base
+from app.main import migrar
+from app.models.consultation import Consulta
+from tests.conftest import con_conexion
+from tests.test_queue import _cliente, _consulta, _tenant
+
+
+def _arrancar_a_la_vez(n=4):
+    async def arrancar():
+        await asyncio.gather(*(con_conexion(migrar) for _ in range(n)))
+
+    asyncio.run(arrancar())
+
+
+def test_concurrent_first_boots_on_an_empty_database(esquema):
+    Base.metadata.drop_all(esquema)
+    # Sin el lock, los CREATE TABLE concurrentes chocan en pg_class
+    _arrancar_a_la_vez()
+    with esquema.connect() as conn:
+        assert conn.scalar(text("SELECT count(*) FROM pg_indexes WHERE indexname = 'ux_consultas_activa'")) == 1
+
+
+def test_concurrent_boots_dedupe_once_and_create_the_active_index(db):
+    with db.begin():
+        db.execute(text("DROP INDEX IF EXISTS ux_consultas_activa"))
+    tenant = _tenant(db)
+    cliente = _cliente(db, tenant, "20111111112")
+    vieja = _consulta(db, cliente, hace_s=30)
+    repetida = _consulta(db, cliente, hace_s=10)
+    # La que ya esta en proceso gana aunque haya una pendiente mas vieja
+    otro = _cliente(db, tenant, "20111111112", cuit_consulta="30000000002")
+    corriendo = _consulta(db, otro, estado="en_proceso", lease_owner="test:0")
+    pendiente = _consulta(db, otro, hace_s=60)
+    db.commit()
+
+    _arrancar_a_la_vez()
+
+    db.expire_all()
+    activas = db.scalars(select(Consulta.id).where(Consulta.estado.in_(("pendiente", "en_proceso")))).all()
+    assert sorted(activas) == sorted([vieja.id, corriendo.id])
+    for consulta in (repetida, pendiente):
+        assert consulta.estado == "error"
+        assert consulta.error_detalle.startswith("Duplicada")
+    assert db.scalar(text("SELECT count(*) FROM pg_indexes WHERE indexname = 'ux_consultas_activa'")) == 1
+
+    db.rollback()
+
+    # Un arranque posterior no vuelve a tocar nada
+    asyncio.run(con_conexion(migrar))
+    db.expire_all()
+    assert repetida.estado == "error"
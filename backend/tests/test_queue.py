@@ -0,0 +1,184 @@
+"""Cola durable en Postgres: claim con SKIP LOCKED, lease, heartbeat y reaper."""
+
+import asyncio
+import threading
+from datetime import timedelta
+
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.models.client import Cliente
+from app.models.consultation import Consulta
+from app.models.download import Descarga
+from app.models.user import Tenant
+from app.tasks.jobs import _renew_lease, insert_rows, run_group, utcnow
+from app.tasks.runner import _claim_group, _reap_stale
+from app.tasks.throttle import AdaptiveThrottle
+
+
+def _tenant(db):
+    tenant = Tenant(nombre="Estudio", email="estudio@test.local")
+    db.add(tenant)
+    db.flush()
+    return tenant
+
+
+def _cliente(db, tenant, cuit_login, clave="clave", cuit_consulta="20999999990"):
+    cliente = Cliente(
+        tenant_id=tenant.id, nombre=f"Cliente {cuit_consulta}",
+        cuit_login=cuit_login, clave_fiscal=clave, cuit_consulta=cuit_consulta,
+    )
+    db.add(cliente)
+    db.flush()
+    return cliente
+
+
+def _consulta(db, cliente, hace_s=0, **campos):
+    campos.setdefault("estado", "pendiente")
+    if campos["estado"] == "pendiente":
+        campos.setdefault("encolada_at", utcnow() - timedelta(seconds=hace_s))
+    consulta = Consulta(tenant_id=cliente.tenant_id, cliente_id=cliente.id, periodo="12", **campos)
+    db.add(consulta)
+    db.flush()
+    return consulta
+
+
+def test_claim_leases_oldest_job_with_same_credential_siblings(db):
+    tenant = _tenant(db)
+    a = _consulta(db, _cliente(db, tenant, "20111111112", cuit_consulta="30000000001"), hace_s=30)
+    otra_clave = _consulta(db, _cliente(db, tenant, "20111111112", "otra", cuit_consulta="30000000002"), hace_s=25)
+    b = _consulta(db, _cliente(db, tenant, "20222222223", cuit_consulta="30000000003"), hace_s=20)
+    hermana = _consulta(db, _cliente(db, tenant, "20111111112", cuit_consulta="30000000004"), hace_s=10)
+    db.commit()
+
+    claim = _claim_group("test:0")
+    assert claim == {"consulta_ids": [a.id, hermana.id], "tenant_id": tenant.id, "cuit_login": "20111111112"}
+    db.expire_all()
+    for consulta in (a, hermana):
+        assert consulta.estado == "en_proceso"
+        assert consulta.lease_owner == "test:0"
+        assert consulta.lease_hasta > utcnow()
+        assert consulta.intentos == 1
+
+    assert _claim_group("test:1")["consulta_ids"] == [otra_clave.id]
+    assert _claim_group("test:1")["consulta_ids"] == [b.id]
+    assert _claim_group("test:1") is None
+
+
+def test_concurrent_claims_never_share_a_job(db):
+    tenant = _tenant(db)
+    ids = {
+        _consulta(db, _cliente(db, tenant, f"2011111111{i}", cuit_consulta=f"3000000001{i}"), hace_s=i).id
+        for i in range(8)
+    }
+    db.commit()
+
+    barrera = threading.Barrier(8)
+    claims = []
+
+    def worker(n):
+        barrera.wait()
+        claims.append(_claim_group(f"test:{n}"))
+
+    hilos = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    tomadas = [cid for c in claims if c for cid in c["consulta_ids"]]
+    assert len(tomadas) == len(set(tomadas))
+    while (claim := _claim_group("test:resto")) is not None:
+        tomadas += claim["consulta_ids"]
+    assert sorted(tomadas) == sorted(ids)
+
+
+def test_heartbeat_renews_only_the_owned_lease(db):
+    tenant = _tenant(db)
+    vence = utcnow() + timedelta(seconds=5)
+    propia = _consulta(db, _cliente(db, tenant, "20111111112"), estado="en_proceso", lease_owner="test:0", lease_hasta=vence)
+    ajena = _consulta(
+        db, _cliente(db, tenant, "20111111112", cuit_consulta="30000000002"),
+        estado="en_proceso", lease_owner="test:1", lease_hasta=vence,
+    )
+    db.commit()
+
+    _renew_lease("test:0", [propia.id, ajena.id])
+    db.expire_all()
+    assert propia.lease_hasta > vence
+    assert propia.heartbeat_at is not None
+    assert ajena.lease_hasta == vence
+
+
+def test_reaper_requeues_dead_jobs_and_fails_exhausted_ones(db):
+    tenant = _tenant(db)
+    ahora = utcnow()
+    vencido = ahora - timedelta(seconds=1)
+
+    def en_proceso(n, **campos):
+        cliente = _cliente(db, tenant, "20111111112", cuit_consulta=f"3000000000{n}")
+        return _consulta(db, cliente, estado="en_proceso", lease_owner=f"muerto:{n}", **campos)
+
+    viva = en_proceso(1, lease_hasta=ahora + timedelta(seconds=60), intentos=1)
+    expirada = en_proceso(2, lease_hasta=vencido, intentos=1)
+    sin_lease = en_proceso(3, heartbeat_at=ahora - timedelta(seconds=settings.SCRAPER_LEASE_S + 60), intentos=1)
+    agotada = en_proceso(4, lease_hasta=vencido, intentos=settings.SCRAPER_MAX_INTENTOS)
+    db.commit()
+
+    recuperadas, agotadas = _reap_stale()
+    assert sorted(recuperadas) == sorted([expirada.id, sin_lease.id])
+    assert agotadas == 1
+
+    db.expire_all()
+    assert (viva.estado, viva.lease_owner) == ("en_proceso", "muerto:1")
+    for consulta in (expirada, sin_lease):
+        assert consulta.estado == "pendiente"
+        assert consulta.encolada_at is not None
+        assert (consulta.lease_owner, consulta.lease_hasta) == (None, None)
+    assert (agotada.estado, agotada.error_categoria) == ("error", "timeout")
+
+    # Lo re-encolado se vuelve a tomar contando el intento
+    claim = _claim_group("test:0")
+    assert sorted(claim["consulta_ids"]) == sorted([expirada.id, sin_lease.id])
+    db.expire_all()
+    assert expirada.intentos == 2
+
+
+def _fila(transaccion):
+    return {"estado": "Presentada", "cuit_cuil": "20111111112", "formulario": "931",
+            "periodo": "202601", "transaccion": str(transaccion), "fecha_presentacion": "01/02/2026"}
+
+
+def test_insert_rows_requires_the_lease(db):
+    tenant = _tenant(db)
+    cliente = _cliente(db, tenant, "20111111112")
+    consulta = _consulta(db, cliente, estado="en_proceso", lease_owner="nuevo", lease_hasta=utcnow() + timedelta(seconds=60))
+    db.commit()
+
+    assert insert_rows(consulta.id, tenant.id, cliente.id, [_fila(1)], True, "nuevo")
+    # El worker anterior, ya sin lease, no borra ni intercala filas
+    assert not insert_rows(consulta.id, tenant.id, cliente.id, [_fila(2)], True, "viejo")
+    assert db.scalars(select(Descarga.transaccion).where(Descarga.consulta_id == consulta.id)).all() == ["1"]
+
+
+def test_run_group_stops_writing_rows_once_the_lease_is_lost(db):
+    tenant = _tenant(db)
+    cliente = _cliente(db, tenant, "20111111112")
+    consulta = _consulta(db, cliente)
+    db.commit()
+    claim = _claim_group("viejo")
+
+    async def ejecutar(job, tenant_id, al_filas, al_terminar):
+        objetivo = job["objetivos"][0]
+        await al_filas(objetivo, [_fila(1)])
+        # El reaper la re-encola y otro worker la toma y empieza a escribir
+        with db.begin():
+            db.execute(update(Consulta).where(Consulta.id == consulta.id).values(lease_owner="nuevo"))
+        insert_rows(consulta.id, tenant_id, cliente.id, [_fila(9)], True, "nuevo")
+        await al_filas(objetivo, [_fila(2)])
+        await al_terminar(objetivo, {"exito": True, "filas": 2})
+
+    asyncio.run(run_group(claim, "viejo", AdaptiveThrottle(), ejecutar))
+    db.expire_all()
+    assert db.scalars(select(Descarga.transaccion).where(Descarga.consulta_id == consulta.id)).all() == ["9"]
+    assert (consulta.estado, consulta.lease_owner) == ("en_proceso", "nuevo")
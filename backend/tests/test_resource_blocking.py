@@ -0,0 +1,118 @@
+import asyncio
+import tempfile
+
+import pytest
+
+from app.services.resource_blocking import ResourceBlocker, get_resource_blocker
+
+
+def test_default_list_blocks_decorative_resources():
+    bloqueo = ResourceBlocker()
+    assert bloqueo.debe_bloquear("https://www.afip.gob.ar/img/logo.png", "image")
+    assert bloqueo.debe_bloquear("https://www.afip.gob.ar/fonts/encode.woff2", "font")
+    assert bloqueo.debe_bloquear("https://www.google-analytics.com/analytics.js", "script")
+    assert bloqueo.debe_bloquear("https://www.afip.gob.ar/banners/aviso.html", "document")
+
+
+def test_default_list_lets_the_flow_through():
+    bloqueo = ResourceBlocker()
+    for tipo in ("document", "script", "xhr", "fetch", "stylesheet"):
+        assert not bloqueo.debe_bloquear("https://seti.afip.gob.ar/setiweb/app.js", tipo)
+    # El captcha pasa aunque sea una imagen
+    assert not bloqueo.debe_bloquear("https://auth.afip.gob.ar/contribuyente_/captcha/imagen.png", "image")
+
+
+def test_parcial_reports_counters_since_previous_call():
+    bloqueo = ResourceBlocker()
+    bloqueo._stats.update(bloqueadas=3, bytes_bloqueados=300)
+    assert bloqueo.parcial()["bloqueadas"] == 3
+    bloqueo._stats.update(bloqueadas=5, bytes_bloqueados=500)
+    parcial = bloqueo.parcial()
+    assert (parcial["bloqueadas"], parcial["bytes_bloqueados"]) == (2, 200)
+
+
+class _Pedido:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class _Ruta:
+    def __init__(self, url, resource_type):
+        self.request = _Pedido(url, resource_type)
+        self.abortada = False
+
+    async def abort(self, motivo):
+        self.abortada = True
+
+    async def continue_(self):
+        pass
+
+
+class _Respuesta:
+    def __init__(self, url, tamano):
+        self.url = url
+        self.headers = {"content-length": str(tamano)}
+
+
+def test_blocked_bytes_are_unknown_until_calibrated():
+    url = "https://www.afip.gob.ar/img/test-calibracion.png"
+    bloqueo = ResourceBlocker()
+    ruta = _Ruta(url, "image")
+    asyncio.run(bloqueo._rutear(ruta))
+    assert ruta.abortada
+    parcial = bloqueo.parcial()
+    assert (parcial["bloqueadas"], parcial["sin_tamano"], parcial["bytes_bloqueados"]) == (1, 1, None)
+
+    # Corrida de calibracion sin bloqueo: el tamano visto queda para las siguientes
+    ResourceBlocker(habilitado=False)._al_responder(_Respuesta(url, 2048))
+    asyncio.run(bloqueo._rutear(_Ruta(url, "image")))
+    parcial = bloqueo.parcial()
+    assert (parcial["bloqueadas"], parcial["sin_tamano"], parcial["bytes_bloqueados"]) == (1, 0, 2048)
+
+
+def test_flow_against_simulator_with_blocking_on():
+    """Login -> SETI -> Consulta -> CSV completo contra el simulador con el bloqueo por defecto."""
+    from app.services.scraper_async import AsyncARCAScraper
+    from simulator.app import SimConfig, app as sim_app
+    from simulator.benchmark import _levantar_simulador, _puerto_libre
+
+    puerto = _puerto_libre()
+    servidor = _levantar_simulador(puerto)
+    sim_app.state.config = SimConfig(latencia_ms=0, filas=5)
+    sim_app.state.stats.clear()
+    bloqueo = get_resource_blocker()
+    bloqueo.habilitado = True
+
+    async def correr(bloqueo):
+        scraper = AsyncARCAScraper(
+            download_base_dir=tempfile.mkdtemp(prefix="test_bloqueo_"),
+            ritmo="fast",
+            bloqueo=bloqueo,
+            base_url=f"http://127.0.0.1:{puerto}",
+        )
+        return await scraper.ejecutar_consulta("20111111112", "clave", "20000000001", "3")
+
+    try:
+        try:
+            # Calentamiento sin bloqueo: registra el tamano de los recursos decorativos
+            calibracion = get_resource_blocker()
+            calibracion.habilitado = False
+            asyncio.run(correr(calibracion))
+            sim_app.state.stats.clear()
+            resultado = asyncio.run(correr(bloqueo))
+        except Exception as e:
+            pytest.skip(f"No se pudo lanzar Chromium: {e}")
+        if not resultado["exito"] and "Executable doesn't exist" in resultado.get("error", ""):
+            pytest.skip("Chromium de Playwright no instalado")
+    finally:
+        servidor.should_exit = True
+
+    assert resultado["exito"], resultado.get("error")
+    assert len(resultado["tabla_datos"]) == 5
+    pedidos = sim_app.state.stats
+    assert not any(p.startswith(("/img/", "/banners/", "/fonts/")) for p in pedidos)
+    assert pedidos["/captcha/imagen.png"] >= 1
+    assert resultado["recursos"]["bloqueadas"] >= 3
+    assert resultado["recursos"]["sin_tamano"] == 0
+    assert resultado["recursos"]["bytes_bloqueados"] > 0
@@ -0,0 +1,145 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.consultation import Consulta
+from app.models.download import Descarga
+from app.models.user import Tenant
+from app.services.result_cache import FECHA_PRESENTACION, ZONA_ARCA, ResultCache, frescura_min, restar_meses
+from app.tasks.jobs import utcnow
+from tests.conftest import con_conexion
+from tests.test_queue import _cliente, _consulta, _tenant
+
+
+def test_restar_meses_clamps_to_month_end():
+    assert restar_meses(date(2026, 3, 31), 1) == date(2026, 2, 28)
+    assert restar_meses(date(2024, 3, 31), 1) == date(2024, 2, 29)
+    assert restar_meses(date(2026, 1, 15), 1) == date(2025, 12, 15)
+    assert restar_meses(date(2026, 5, 10), 12) == date(2025, 5, 10)
+
+
+def test_zona_arca_is_argentina_time():
+    assert ZONA_ARCA.utcoffset(datetime(2026, 1, 1)) == timedelta(hours=-3)
+
+
+def test_frescura_min_tenant_overrides_setting(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_FRESCURA_MIN", 30)
+    assert frescura_min(None) == 30
+    assert frescura_min(Tenant(frescura_min=None)) == 30
+    assert frescura_min(Tenant(frescura_min=0)) == 0
+    assert frescura_min(Tenant(frescura_min=5)) == 5
+
+
+def test_stats_hit_rate(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_FRESCURA_MIN", 0)
+    cache = ResultCache()
+    assert cache.stats()["tasa_aciertos"] == 0.0
+    cache.counts.update(aciertos=2, derivadas=1, fallos=1)
+    cache.forzada()
+    stats = cache.stats()
+    assert stats["tasa_aciertos"] == 0.75
+    assert stats["forzadas"] == 1
+    assert stats["frescura_min"] == 0
+
+
+def test_resolver_disabled_window_does_not_touch_the_db():
+    cache = ResultCache()
+    assert asyncio.run(cache.resolver(None, None, "3", 0)) is None
+    assert cache.counts["fallos"] == 0
+
+
+def _resolver(cache, cliente, periodo, ventana_min):
+    async def resolver(conn):
+        return await cache.resolver(AsyncSession(bind=conn), cliente, periodo, ventana_min)
+
+    return asyncio.run(con_conexion(resolver))
+
+
+def test_resolver_reuses_the_latest_fresh_success(db):
+    cliente = _cliente(db, _tenant(db), "20111111112")
+    ahora = utcnow()
+    _consulta(db, cliente, estado="exitoso", finalizada_at=ahora - timedelta(minutes=20))
+    reciente = _consulta(db, cliente, estado="exitoso", finalizada_at=ahora - timedelta(minutes=5))
+    _consulta(db, cliente, estado="error", finalizada_at=ahora - timedelta(minutes=1))
+    db.commit()
+
+    cache = ResultCache()
+    assert _resolver(cache, cliente, "12", 10) == (reciente.id, False)
+    # Fuera de la ventana hay que volver a consultar ARCA
+    assert _resolver(cache, cliente, "12", 2) is None
+    assert (cache.counts["aciertos"], cache.counts["fallos"]) == (1, 1)
+
+
+def _descargas(db, consulta, fechas):
+    for n, fecha in enumerate(fechas):
+        db.add(Descarga(
+            tenant_id=consulta.tenant_id, consulta_id=consulta.id, cliente_id=consulta.cliente_id,
+            estado="Presentada", cuit_cuil="20111111112", formulario="931", periodo="202601",
+            transaccion=str(n), fecha_presentacion=fecha,
+        ))
+    db.flush()
+
+
+@pytest.mark.parametrize("texto, esperada", [
+    ("05/03/2026", date(2026, 3, 5)),
+    ("5/3/2026 14:30:00", date(2026, 3, 5)),
+    (" 2026-03-05T14:30:00 ", date(2026, 3, 5)),
+    ("2026-03-05", date(2026, 3, 5)),
+    ("05-03-2026", date(2026, 3, 5)),
+    ("", None),
+    ("marzo 2026", None),
+    ("05.03.2026", None),
+])
+def test_fecha_presentacion_sql(db, texto, esperada):
+    consulta = _consulta(db, _cliente(db, _tenant(db), "20111111112"))
+    _descargas(db, consulta, [texto])
+    assert db.scalar(select(FECHA_PRESENTACION).where(Descarga.consulta_id == consulta.id)) == esperada
+
+
+# Fuente de 12 meses terminada el 14/06/2026 a las 23:00 en Argentina (ya 15/06 en UTC)
+_FIN = datetime(2026, 6, 15, 2, 0, tzinfo=timezone.utc)
+_VENTANA = 10 ** 7
+
+
+def _fuente(db, fechas, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DOWNLOAD_DIR", str(tmp_path))
+    cliente = _cliente(db, _tenant(db), "20111111112")
+    fuente = _consulta(db, cliente, estado="exitoso", finalizada_at=_FIN, filas=len(fechas))
+    _descargas(db, fuente, fechas)
+    db.commit()
+    return cliente, fuente
+
+
+def test_derivar_filters_the_wider_result_by_presentation_date(db, tmp_path, monkeypatch):
+    cliente, fuente = _fuente(
+        db, ["20/03/2026 10:00:00", "2026-03-14", "13-03-2026", "01/01/2026"], tmp_path, monkeypatch,
+    )
+
+    cache = ResultCache()
+    consulta_id, derivada = _resolver(cache, cliente, "3", _VENTANA)
+    assert derivada and cache.counts["derivadas"] == 1
+
+    db.expire_all()
+    consulta = db.get(Consulta, consulta_id)
+    assert (consulta.periodo, consulta.estado, consulta.filas, consulta.finalizada_at) == ("3", "exitoso", 2, _FIN)
+    assert (tmp_path / consulta.archivo_csv).stat().st_size == consulta.bytes
+    copiadas = db.scalars(select(Descarga.fecha_presentacion).where(Descarga.consulta_id == consulta_id).order_by(Descarga.id))
+    # Tres meses desde el dia de ARCA: desde el 14/03 inclusive
+    assert copiadas.all() == ["20/03/2026 10:00:00", "2026-03-14"]
+    assert fuente.filas == 4
+
+
+@pytest.mark.parametrize("fechas", [
+    ["20/03/2026", "sin fecha"],  # no interpretable
+    ["20/03/2026", "31/02/2026"],  # formato valido, fecha invalida
+])
+def test_derivar_gives_up_on_unreadable_dates(db, tmp_path, monkeypatch, fechas):
+    cliente, _ = _fuente(db, fechas, tmp_path, monkeypatch)
+    cache = ResultCache()
+    assert _resolver(cache, cliente, "3", _VENTANA) is None
+    assert cache.counts["fallos"] == 1
+    assert db.scalar(select(Consulta.id).where(Consulta.periodo == "3")) is None
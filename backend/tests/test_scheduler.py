@@ -0,0 +1,98 @@
+import time
+
+from app.config import settings
+from app.tasks.scheduler import FairScheduler, LaneSelector, estimate_position, lane_for, plan_weights, weight_of
+
+
+def test_plan_weights_parses_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_PLAN_PESOS", "free:1, pro:4,roto:x,cero:0")
+    pesos = plan_weights()
+    assert pesos == {"free": 1.0, "pro": 4.0, "cero": 0.1}
+    assert weight_of("pro", pesos) == 4.0
+    assert weight_of(None, pesos) == 1.0
+    assert weight_of("desconocido", pesos) == 1.0
+
+
+def _servir(scheduler, activos, claims):
+    servidos = []
+    for _ in range(claims):
+        tenant = scheduler.order(activos)[0]
+        scheduler.charge(tenant, 1)
+        servidos.append(tenant)
+    return servidos
+
+
+def _rachas(servidos):
+    actual = [servidos[0]]
+    for t in servidos[1:]:
+        if t != actual[-1]:
+            yield actual
+            actual = []
+        actual.append(t)
+    yield actual
+
+
+def test_drr_serves_tenants_in_proportion_to_weight():
+    scheduler = FairScheduler()
+    servidos = _servir(scheduler, {1: 1.0, 2: 2.0, 3: 1.0}, 40)
+    assert (servidos.count(1), servidos.count(2), servidos.count(3)) == (10, 20, 10)
+    # Intercalados: ningun tenant acapara la cola
+    assert max(len(list(g)) for g in _rachas(servidos)) <= 2
+
+
+def test_drr_drops_credit_of_drained_tenants():
+    scheduler = FairScheduler()
+    scheduler.order({1: 4.0, 2: 1.0})
+    assert scheduler.order({2: 1.0}) == [2]
+    assert 1 not in scheduler._deficit
+    # Al volver empieza sin credito acumulado, al final del turno
+    assert scheduler.order({1: 4.0, 2: 1.0})[-1] == 1
+
+
+def test_charge_for_a_group_passes_the_turn():
+    scheduler = FairScheduler()
+    assert scheduler.order({1: 2.0, 2: 2.0})[0] == 1
+    scheduler.charge(1, 5)
+    assert scheduler.order({1: 2.0, 2: 2.0})[0] == 2
+    scheduler.charge(99, 1)  # tenant sin cola: se ignora
+
+
+def test_estimate_position_under_drr():
+    cola = {1: (10, 1.0), 2: (5, 1.0), 3: (4, 2.0)}
+    assert estimate_position(9, cola) is None
+    # Por cada consulta del tenant 2, el 1 avanza una y el 3 dos (hasta vaciar sus 4)
+    assert estimate_position(2, cola) == {"en_cola": 5, "posicion": 4, "posicion_ultima": 14}
+    assert estimate_position(3, cola)["posicion"] == 3
+
+
+def test_lane_order_by_priority(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_PRIORIDAD_AGING_S", 10.0)
+    lanes = LaneSelector()
+    assert lanes.order({"baja": 1.0, "alta": 0.0, "normal": 5.0}) == ["alta", "normal", "baja"]
+    # Espera larga pero el carril se sirvio hace poco: no se adelanta
+    assert lanes.order({"alta": 0.0, "baja": 100.0}) == ["alta", "baja"]
+
+
+def test_lane_aging_lets_a_starved_lane_go_first_once(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_PRIORIDAD_AGING_S", 10.0)
+    lanes = LaneSelector()
+    hace = time.monotonic() - 100
+    lanes._served.update(normal=hace, baja=hace)
+    assert lanes.order({"alta": 0.0, "normal": 20.0, "baja": 50.0}) == ["baja", "normal", "alta"]
+    lanes.served("baja")
+    assert lanes.order({"alta": 0.0, "normal": 20.0, "baja": 50.0}) == ["normal", "alta", "baja"]
+    # El carril mas alto nunca necesita adelantarse
+    lanes._served["alta"] = hace
+    assert lanes.order({"alta": 50.0})[0] == "alta"
+
+
+def test_only_small_batches_get_the_alta_lane(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_PRIORIDAD_ALTA_MAX", 5)
+    assert lane_for(None, 5) == "alta"
+    assert lane_for(None, 6) == "normal"
+    # Un lote grande no puede colarse en el carril alta pidiendolo
+    assert lane_for("alta", 500) == "normal"
+    # Bajar de carril siempre se acepta
+    assert lane_for("normal", 1) == "normal"
+    assert lane_for("baja", 1) == "baja"
+    assert lane_for("baja", 500) == "baja"
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.tasks.throttle import DECREASE_EVERY_S, POLL_S, AdaptiveThrottle, CircuitBreaker, TokenBucket, procesos_arca
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate_per_s=1.0, capacity=2)
+    t0 = bucket.updated
+    assert bucket.wait_time(t0) == 0.0
+    bucket.take(t0)
+    bucket.take(t0)
+    assert bucket.wait_time(t0) == pytest.approx(1.0)
+    assert bucket.wait_time(t0 + 0.5) == pytest.approx(0.5)
+    assert not bucket.full(t0 + 1.5)
+    assert bucket.full(t0 + 10)
+    assert bucket.tokens == 2  # no acumula por encima de la capacidad
+
+
+def test_token_bucket_without_rate_polls():
+    bucket = TokenBucket(rate_per_s=0.0, capacity=1)
+    bucket.take(bucket.updated)
+    assert bucket.wait_time(bucket.updated + 100) == POLL_S
+
+
+def _breaker():
+    return CircuitBreaker(threshold=0.5, window=4, pause_s=10.0, max_pause_s=15.0)
+
+
+def test_breaker_opens_on_transient_error_rate():
+    breaker = _breaker()
+    breaker.record(True, 0.0)
+    assert breaker.state == "cerrado"  # menos de min_samples resultados
+    breaker.record(False, 0.0)
+    assert breaker.state == "abierto"
+    assert breaker.wait_time(4.0) == pytest.approx(6.0)
+
+
+def test_breaker_lets_a_single_probe_and_closes_on_success():
+    breaker = _breaker()
+    breaker.record(True, 0.0)
+    breaker.record(True, 0.0)
+    assert breaker.wait_time(10.0) == 0.0
+    assert breaker.state == "semiabierto"
+    breaker.dispatched(10.0)
+    assert breaker.wait_time(11.0) == POLL_S
+    breaker.record(False, 12.0)
+    assert breaker.state == "cerrado"
+    assert breaker.error_rate() == 0.0
+    assert breaker.wait_time(12.0) == 0.0
+
+
+def test_breaker_reopens_with_longer_capped_pause_when_probe_fails():
+    breaker = _breaker()
+    breaker.record(True, 0.0)
+    breaker.record(True, 0.0)
+    breaker.wait_time(10.0)
+    breaker.dispatched(10.0)
+    breaker.record(True, 10.0)
+    assert (breaker.state, breaker.open_until) == ("abierto", 25.0)
+    breaker.wait_time(25.0)
+    breaker.dispatched(25.0)
+    breaker.record(True, 25.0)
+    assert breaker.open_until == 40.0  # tope max_pause_s
+    breaker.wait_time(40.0)
+    breaker.record(False, 40.0)
+    assert breaker.current_pause == 10.0
+
+
+def test_breaker_cancel_releases_the_probe():
+    breaker = _breaker()
+    breaker.record(True, 0.0)
+    breaker.record(True, 0.0)
+    breaker.wait_time(10.0)
+    breaker.dispatched(10.0)
+    breaker.cancel()
+    assert breaker.wait_time(11.0) == 0.0
+
+
+@pytest.fixture
+def throttle(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_RATE_MAX", 30.0)
+    monkeypatch.setattr(settings, "SCRAPER_RATE_MIN", 2.0)
+    monkeypatch.setattr(settings, "SCRAPER_RATE_CUIT_S", 20.0)
+    monkeypatch.setattr(settings, "SCRAPER_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "SCRAPER_PROCESOS_ARCA", 1)
+    return AdaptiveThrottle()
+
+
+def test_aimd_halves_on_transient_and_adds_one_on_success(throttle):
+    assert throttle.rate == 30.0
+    throttle.record(True)
+    assert throttle.rate == 15.0
+    assert throttle.global_bucket.rate == pytest.approx(15.0 / 60)
+    throttle.record(True)
+    assert throttle.rate == 15.0  # a lo sumo una baja cada DECREASE_EVERY_S
+    throttle.record(False)
+    assert throttle.rate == 16.0
+    for _ in range(50):
+        throttle.record(False)
+    assert throttle.rate == 30.0
+
+
+def test_aimd_never_goes_below_min_rate(throttle):
+    for _ in range(10):
+        throttle.last_decrease -= DECREASE_EVERY_S
+        throttle.record(True)
+    assert throttle.rate == 2.0
+    assert throttle.counts["transitorios"] == 10
+
+
+def test_credentials_are_spaced_independently(throttle):
+    assert throttle._try_acquire("20111111112") == 0.0
+    assert throttle._try_acquire("20111111112") == pytest.approx(20.0, abs=0.1)
+    assert throttle._try_acquire("20222222223") == 0.0
+    assert throttle.counts["sesiones"] == 2
+
+
+def test_acquire_without_credential_interval(throttle):
+    throttle.credential_interval_s = 0
+    asyncio.run(throttle.acquire("20111111112"))
+    asyncio.run(throttle.acquire("20111111112"))
+    assert throttle.counts["sesiones"] == 2
+    assert throttle.waiting == 0
+
+
+def test_rates_are_split_among_processes(monkeypatch):
+    monkeypatch.setattr(settings, "SCRAPER_RATE_MAX", 30.0)
+    monkeypatch.setattr(settings, "SCRAPER_RATE_MIN", 3.0)
+    monkeypatch.setattr(settings, "SCRAPER_PROCESOS_ARCA", 0)
+    monkeypatch.setattr(settings, "CELERY_CONCURRENCY", 3)
+    monkeypatch.setattr(settings, "TASK_BACKEND", "inprocess")
+    assert procesos_arca() == 1
+
+    monkeypatch.setattr(settings, "TASK_BACKEND", "celery")
+    throttle = AdaptiveThrottle()
+    assert (throttle.procesos, throttle.max_rate, throttle.min_rate) == (3, 10.0, 1.0)
+    throttle.record(True)
+    throttle.record(False)
+    assert throttle.rate == pytest.approx(5.0 + 1 / 3)
+    assert throttle.stats()["alcance"] == "proceso"
+
+    monkeypatch.setattr(settings, "SCRAPER_PROCESOS_ARCA", 5)
+    assert AdaptiveThrottle().max_rate == 6.0